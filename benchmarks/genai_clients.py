@@ -0,0 +1,144 @@
+"""
+Latency of a prediction's model call with a new Gemini client per request,
+as the app used to make, and with the client reused from a
+`GenaiClientRegistry`.
+
+The calls go to a local HTTP server that answers like the Gemini API, so
+only the client's own cost is measured: building the client and its HTTP
+connection pool, and opening a connection. Against the real API every new
+connection also costs a TLS handshake, so the saving there is larger.
+
+Usage:
+    python benchmarks/genai_clients.py [--requests 200] [--prompt-rows 100]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google import genai
+from google.genai.types import (
+    GenerateContentConfig,
+    GoogleSearch,
+    HttpOptions,
+    Tool
+)
+
+from employment_flask_app.genai_clients import GenaiClientRegistry
+from employment_flask_app.route_functions import PREDICTION_CONFIG
+
+RESPONSE = json.dumps({
+    'candidates': [{
+        'content': {
+            'role': 'model',
+            'parts': [{'text': '[{"Year": 2024, "Gender": "Male"}]'}]
+        },
+        'finishReason': 'STOP'
+    }]
+}).encode('utf-8')
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """Answers every generateContent call with the same short response."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, Nagle's
+    # algorithm holds the body back on a kept-alive connection
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        FakeGeminiHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def new_client_call(base_url, prompt):
+    """Make a call the way the app used to: a new client and config."""
+    client = genai.Client(
+        api_key='benchmark-key', http_options=HttpOptions(base_url=base_url)
+    )
+    google_search_tool = Tool(google_search=GoogleSearch())
+    return client.models.generate_content(
+        model='gemini-2.0-flash',
+        contents=prompt,
+        config=GenerateContentConfig(
+            tools=[google_search_tool],
+            response_modalities=['TEXT']
+        )
+    )
+
+
+def registry_call(registry, prompt):
+    """Make a call with the registry's client and the shared config."""
+    return registry.get('benchmark-key').models.generate_content(
+        model='gemini-2.0-flash',
+        contents=prompt,
+        config=PREDICTION_CONFIG
+    )
+
+
+def measure(call, requests):
+    """Return the median and mean milliseconds of repeated calls."""
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), statistics.fmean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200,
+                        help='model calls made in each mode')
+    parser.add_argument('--prompt-rows', type=int, default=100,
+                        help='historical rows in the prompt')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGeminiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    prompt = 'Historical data: ' + str([
+        {'RegionName': 'England', 'Year': 2004 + i % 20, 'Gender': 'Male',
+         'EmploymentPercentage': 7.28, 'MarginofErrorPercentage': 0.01}
+        for i in range(args.prompt_rows)
+    ])
+    registry = GenaiClientRegistry(factory=lambda api_key: genai.Client(
+        api_key=api_key, http_options=HttpOptions(base_url=base_url)
+    ))
+
+    results = {}
+    for name, call in (
+        ('new client per request', lambda: new_client_call(base_url, prompt)),
+        ('registry client', lambda: registry_call(registry, prompt))
+    ):
+        # Warm up imports and the registry before timing
+        call()
+        FakeGeminiHandler.connections = 0
+        results[name] = measure(call, args.requests)
+        median, mean = results[name]
+        print(f'{name}:')
+        print(f'  median {median:7.2f} ms, mean {mean:7.2f} ms, '
+              f'{FakeGeminiHandler.connections} connections opened')
+
+    saved = (
+        results['new client per request'][0] - results['registry client'][0]
+    )
+    print(f'\nSaved per prediction (median): {saved:.2f} ms')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Query plans and timings of the app's EmploymentData lookups, with and
+without the composite indexes declared in `models.py`.
+
+The script builds a SQLite database of synthetic employment rows (1M by
+default), runs each lookup the app makes with only the primary key and
+unique constraint in place, then creates the model's indexes and runs them
+again. For every lookup it prints SQLite's `EXPLAIN QUERY PLAN` and the
+median time of several runs. Only the plan steps that read `employment_data`
+or sort are printed; the dimension tables are always read by key.
+
+Usage:
+    python benchmarks/index_plans.py [--rows 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from employment_flask_app.datatable_functions import DATATABLE_COLUMNS
+from employment_flask_app.models import (
+    EMPLOYMENT_DIMENSIONS,
+    EmploymentData,
+    select_employment_rows
+)
+
+REGIONS = [
+    'North East', 'North West', 'Yorkshire and The Humber', 'East Midlands',
+    'West Midlands', 'East', 'London', 'South East', 'South West', 'Wales',
+    'Scotland', 'Northern Ireland'
+]
+YEARS = list(range(2004, 2024))
+GENDERS = ['Male', 'Female']
+OCCUPATIONS = [
+    '1: managers, directors and senior officials',
+    '2: professional occupations',
+    '3: associate prof & tech occupations',
+    '4: administrative and secretarial occupations',
+    '5: skilled trades occupations',
+    '6: caring, leisure and other service occupations',
+    '7: sales and customer service occupations',
+    '8: process, plant and machine operatives',
+    '9: elementary occupations'
+]
+DIMENSION_VALUES = {
+    'RegionName': REGIONS,
+    'Gender': GENDERS,
+    'OccupationType': OCCUPATIONS
+}
+
+
+def build_database(engine, rows, seed=0):
+    """
+    Create the tables without the composite indexes and fill them.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        Engine of the empty benchmark database.
+    rows : int
+        Number of EmploymentData rows to insert.
+    seed : int, optional
+        Seed of the random values, so runs are comparable.
+    """
+    random.seed(seed)
+    EmploymentData.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index in EmploymentData.__table__.indexes:
+            index.drop(connection)
+        for column, (dimension, _) in EMPLOYMENT_DIMENSIONS.items():
+            connection.execute(
+                dimension.__table__.insert(),
+                [{dimension.value_name: value}
+                 for value in DIMENSION_VALUES[column]]
+            )
+
+    insert = (
+        'INSERT INTO employment_data (RegionID, Year, GenderID, '
+        'OccupationTypeID, EmploymentPercentage, MarginofErrorPercentage, '
+        'Longitude, Latitude) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+    )
+    batch_size = 100000
+    with engine.begin() as connection:
+        for start in range(0, rows, batch_size):
+            connection.exec_driver_sql(insert, [
+                (
+                    random.randint(1, len(REGIONS)),
+                    random.choice(YEARS),
+                    random.randint(1, len(GENDERS)),
+                    random.randint(1, len(OCCUPATIONS)),
+                    random.uniform(0, 20),
+                    random.uniform(0, 2),
+                    random.uniform(-8, 2),
+                    random.uniform(50, 59)
+                )
+                for _ in range(start, min(start + batch_size, rows))
+            ])
+        connection.exec_driver_sql('ANALYZE')
+
+
+def lookups(connection):
+    """
+    Return the lookups the app makes, keyed by the call site they come from.
+
+    Parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Connection to the benchmark database, used to pick an existing row
+        for the edit and delete lookups.
+
+    Returns
+    -------
+    dict
+        SQLAlchemy statements keyed by a description of their call site.
+    """
+    row = connection.execute(
+        select_employment_rows(*DATATABLE_COLUMNS)
+        .where(EmploymentData.DataID == 1)
+    ).one()
+    region, year, gender, occupation = row[:4]
+    percentage, margin, longitude, latitude = row[4:]
+
+    return {
+        'predict_employment_data (region, occupation)':
+            select(EmploymentData).filter_by(
+                RegionName=region, OccupationType=occupation
+            ),
+        'dashboard (region, year)':
+            select_employment_rows(*DATATABLE_COLUMNS).where(
+                EmploymentData.RegionName == region,
+                EmploymentData.Year == year
+            ),
+        'dashboard (year, occupation)':
+            select_employment_rows(*DATATABLE_COLUMNS).where(
+                EmploymentData.Year == year,
+                EmploymentData.OccupationType == occupation
+            ),
+        'edit_row (region, year, gender, occupation)':
+            select(EmploymentData).filter_by(
+                RegionName=region, Year=year, Gender=gender,
+                OccupationType=occupation
+            ).limit(1),
+        'delete_row (every column)':
+            select(EmploymentData).filter_by(
+                RegionName=region, Year=year, Gender=gender,
+                OccupationType=occupation, EmploymentPercentage=percentage,
+                MarginofErrorPercentage=margin, Longitude=longitude,
+                Latitude=latitude
+            ).limit(1),
+        'datatable first page (ordered by percentage)':
+            select_employment_rows(*DATATABLE_COLUMNS)
+            .order_by(DATATABLE_COLUMNS[4], EmploymentData.DataID)
+            .limit(10),
+        'datatable filter options (percentage)':
+            select_employment_rows(DATATABLE_COLUMNS[4]).distinct()
+            .order_by(DATATABLE_COLUMNS[4]).limit(201),
+        'datatable row count':
+            select(func.count()).select_from(EmploymentData)
+    }
+
+
+def query_plan(connection, statement):
+    """Return SQLite's query plan of a statement as a list of lines."""
+    sql = str(statement.compile(
+        dialect=connection.dialect, compile_kwargs={'literal_binds': True}
+    ))
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+    return [
+        detail for _, _, _, detail in plan
+        if re.search(r'\bemployment_data\b', detail)
+        or 'TEMP B-TREE' in detail
+    ]
+
+
+def median_time(connection, statement, repeat):
+    """Return the median time in milliseconds to fetch a statement's rows."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(statement).all()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def measure(connection, statements, repeat):
+    """Return the plan and median time of every statement."""
+    return {
+        name: (
+            query_plan(connection, statement),
+            median_time(connection, statement, repeat)
+        )
+        for name, statement in statements.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='number of EmploymentData rows to generate')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs of each lookup, the median is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.sqlite')
+        engine = create_engine(f'sqlite:///{path}')
+
+        start = time.perf_counter()
+        build_database(engine, args.rows)
+        print(f'Built {args.rows} rows in '
+              f'{time.perf_counter() - start:.1f} s\n')
+
+        with engine.connect() as connection:
+            statements = lookups(connection)
+            before = measure(connection, statements, args.repeat)
+
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            for index in EmploymentData.__table__.indexes:
+                index.create(connection)
+            connection.exec_driver_sql('ANALYZE')
+        print(f'Created indexes in {time.perf_counter() - start:.1f} s\n')
+
+        with engine.connect() as connection:
+            after = measure(connection, statements, args.repeat)
+            total = connection.scalar(
+                select(func.count()).select_from(EmploymentData)
+            )
+        engine.dispose()
+
+    for name in statements:
+        plan_before, time_before = before[name]
+        plan_after, time_after = after[name]
+        print(name)
+        print(f'  without indexes: {time_before:9.2f} ms')
+        for line in plan_before:
+            print(f'    {line}')
+        print(f'  with indexes:    {time_after:9.2f} ms')
+        for line in plan_after:
+            print(f'    {line}')
+        print()
+    print(f'{total} rows in employment_data')
+
+
+if __name__ == '__main__':
+    main()
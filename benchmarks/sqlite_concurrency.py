@@ -0,0 +1,139 @@
+"""
+Read and write throughput of the app's SQLite database under several
+worker processes, with and without the SQLite profile in `sqlite_profile.py`.
+
+Each worker builds the app the way a gunicorn worker does and, for a fixed
+time, either serves a datatable page through `datatable_page` or edits a
+random row and bumps the data version, like the datatable's edit endpoint.
+The run is repeated with SQLite's defaults (rollback journal, no pool
+tuning) and with the app's profile, and the reads, writes and "database is
+locked" errors per second are printed for both.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--workers 4] [--seconds 5]
+        [--rows 100000] [--write-ratio 0.2]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.exc import OperationalError
+
+from index_plans import build_database
+
+from employment_flask_app.models import DatasetVersion, EmploymentData
+
+PROFILES = {
+    'SQLite defaults': {
+        'SQLITE_PRAGMAS': {},
+        'SQLALCHEMY_ENGINE_OPTIONS': {
+            # The sqlite3 module's own default lock wait
+            'connect_args': {'timeout': 5}
+        }
+    },
+    'app profile': {}
+}
+
+
+def run_worker(uri, profile, rows, seconds, write_ratio, barrier, results):
+    """Serve reads and writes for a fixed time and report the counts."""
+    from employment_flask_app import create_app, db
+    from employment_flask_app.datatable_functions import datatable_page
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SEED_EMPLOYMENT_DATA': False,
+        **profile
+    })
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    with app.app_context():
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < write_ratio:
+                    data_id = random.randint(1, rows)
+                    db.session.execute(
+                        update(EmploymentData)
+                        .where(EmploymentData.DataID == data_id)
+                        .values(EmploymentPercentage=random.uniform(0, 20))
+                    )
+                    DatasetVersion.bump(db.session, updated=[data_id])
+                    db.session.commit()
+                    counts['writes'] += 1
+                else:
+                    datatable_page(db.session, {
+                        'draw': 1,
+                        'start': random.randint(0, 100) * 10,
+                        'length': 10,
+                        'order[0][column]': 4,
+                        'order[0][dir]': 'asc'
+                    })
+                    db.session.commit()
+                    counts['reads'] += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                counts['locked'] += 1
+    results.put(counts)
+
+
+def measure(uri, profile, args):
+    """Run the workers against a database and return the summed counts."""
+    barrier = multiprocessing.Barrier(args.workers)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(
+            uri, profile, args.rows, args.seconds, args.write_ratio,
+            barrier, results
+        ))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0}
+    for _ in workers:
+        for name, count in results.get().items():
+            totals[name] += count
+    for worker in workers:
+        worker.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of worker processes')
+    parser.add_argument('--seconds', type=float, default=5,
+                        help='how long each run lasts')
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='number of EmploymentData rows to generate')
+    parser.add_argument('--write-ratio', type=float, default=0.2,
+                        help='share of operations that are edits')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for number, (name, profile) in enumerate(PROFILES.items()):
+            path = os.path.join(directory, f'benchmark{number}.sqlite')
+            engine = create_engine(f'sqlite:///{path}')
+            build_database(engine, args.rows)
+            # Create the indexes up front, so the workers find them in place
+            with engine.begin() as connection:
+                for index in EmploymentData.__table__.indexes:
+                    index.create(connection)
+            engine.dispose()
+
+            totals = measure(f'sqlite:///{path}', profile, args)
+            print(f'{name}, {args.workers} workers, '
+                  f'{args.write_ratio:.0%} writes:')
+            for count in ('reads', 'writes', 'locked'):
+                print(f'  {count:>6}/s: {totals[count] / args.seconds:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
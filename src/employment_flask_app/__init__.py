@@ -4,6 +4,19 @@ from flask import Flask, g
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from employment_flask_app.dash_app import init_dash_app
+from employment_flask_app.sqlite_profile import (
+    DEFAULT_SQLITE_MAX_OVERFLOW,
+    DEFAULT_SQLITE_POOL_SIZE,
+    DEFAULT_SQLITE_PRAGMAS,
+    apply_sqlite_pragmas,
+    configure_sqlite_engine
+)
+from employment_flask_app.dataset_store import (
+    build_dataset_cache_command,
+    seed_employment_data,
+    seed_employment_data_command,
+    warm_dataset
+)
 
 
 # Define a base class for the SQLAlchemy ORM models
@@ -30,12 +43,13 @@ def create_app(test_config=None):
         SQLALCHEMY_DATABASE_URI=(
             # SQLite database URI
             "sqlite:///" + os.path.join(app.instance_path, "flaskr.sqlite")
-        )
+        ),
+        # SQLite tuning for concurrent workers (see sqlite_profile.py)
+        SQLITE_PRAGMAS=dict(DEFAULT_SQLITE_PRAGMAS),
+        SQLITE_POOL_SIZE=DEFAULT_SQLITE_POOL_SIZE,
+        SQLITE_MAX_OVERFLOW=DEFAULT_SQLITE_MAX_OVERFLOW
     )
 
-    # Initialize the app with the SQLAlchemy extension
-    db.init_app(app)
-
     if test_config is None:
         # Load the instance configuration if it exists and not in testing mode
         app.config.from_pyfile('config.py', silent=True)
@@ -43,6 +57,13 @@ def create_app(test_config=None):
         # Load the test configuration if provided
         app.config.from_mapping(test_config)
 
+    # Initialize the app with the SQLAlchemy extension, once the
+    # configuration is complete so the engine sees all of it
+    configure_sqlite_engine(app)
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
     # Ensure the instance folder exists
     try:
         os.makedirs(app.instance_path)
@@ -52,11 +73,32 @@ def create_app(test_config=None):
     # Import and register the routes blueprint
     from . import routes
     app.register_blueprint(routes.bp)
+    from .prediction_cache import clear_prediction_cache_command
+    app.cli.add_command(clear_prediction_cache_command)
+    from .prediction_batch import predict_employment_batch_command
+    app.cli.add_command(predict_employment_batch_command)
+
+    # Parse the bundled dataset once for this process before serving requests
+    warm_dataset()
+    app.cli.add_command(build_dataset_cache_command)
+    app.cli.add_command(seed_employment_data_command)
 
     # Create database tables and initialize the Dash app within the
     # Flask app context
+    from .migrations import (
+        create_employment_indexes,
+        upgrade_employment_dimensions
+    )
     with app.app_context():
+        # Bring databases created by older versions up to date first
+        with db.engine.begin() as connection:
+            upgrade_employment_dimensions(connection)
         db.create_all()  # Create all database tables
+        with db.engine.begin() as connection:
+            create_employment_indexes(connection)
+        # Seed an empty employment table now, so requests never have to
+        if app.config.get('SEED_EMPLOYMENT_DATA', True):
+            seed_employment_data()
         g.cur_app = app  # Store the current app in the global context
         # Initialize the Dash app with a specific URL path
         app = init_dash_app.init_app('/dashboard/')
@@ -9,9 +9,32 @@ from employment_flask_app.dash_app.charts import (
     create_disparity_map,
     create_area_chart
 )
-from employment_flask_app.dash_app.filter_data_functions import filter_dataframe, prepare_disparity_df
+from employment_flask_app.dash_app.filter_data_functions import (
+    filter_dataframe,
+    get_disparity_df
+)
+from employment_flask_app.dash_app.disparity_cube import get_disparity_cube
 import json
 
+# Outputs of the batched summary statistics callback, in return order
+SUMMARY_STATS_OUTPUTS = [
+    ("gen-selected-region", "children"),
+    ("gen-selected-year", "children"),
+    ("occ-selected-region", "children"),
+    ("occ-selected-year", "children"),
+    ("selected-occupation-type", "children"),
+    ("highest-disparity-region", "children"),
+    ("highest-disparity-percentage", "children"),
+    ("highest-disparity-occupation", "children"),
+    ("highest-disparity-occupation-percentage", "children"),
+    ("highest-employment-occupation", "children"),
+    ("highest-employment-percentage", "children"),
+    ("highest-male-employment-occupation", "children"),
+    ("highest-male-employment-percentage", "children"),
+    ("highest-female-employment-occupation", "children"),
+    ("highest-female-employment-percentage", "children"),
+]
+
 
 def toggle_data_attribution(n_clicks, is_open):
     """
@@ -251,7 +274,9 @@ def update_selected_filters_for_occ_stats(
     )
 
 
-def update_highest_disparity_region(selected_occupation, selected_year):
+def update_highest_disparity_region(
+    selected_occupation, selected_year, cube=None
+):
     """
     Update the highest disparity region based on the selected occupation
     and year.
@@ -262,6 +287,8 @@ def update_highest_disparity_region(selected_occupation, selected_year):
         Selected occupation.
     selected_year : int
         Selected year.
+    cube : DisparityCube, optional
+        Cube to look the value up in (defaults to the current one).
 
     Returns
     -------
@@ -272,31 +299,24 @@ def update_highest_disparity_region(selected_occupation, selected_year):
         # Prevent update if occupation or year is not selected
         raise PreventUpdate
 
-    # Prepare the occupation prefix for filtering
-    occupation_prefix = f"{selected_occupation}:"
+    if cube is None:
+        cube = get_disparity_cube()
 
-    # Filter the dataframe based on the selected year and occupation prefix
-    filtered_df = filter_dataframe(
-        year=selected_year, occupation_prefix=occupation_prefix
+    # Look up the region with the highest disparity in the disparity cube
+    highest = cube.highest_disparity_region(
+        f"{selected_occupation}:", selected_year
     )
-
-    # Prepare the disparity dataframe
-    disparity_df = prepare_disparity_df(filtered_df)
-
-    # Find the highest disparity percentage and its index
-    highest_disparity_percentage = disparity_df['Disparity'].max()
-    highest_disparity_perc_idx = disparity_df['Disparity'].idxmax()
-
-    # Get the region with the highest disparity
-    highest_disparity_region = disparity_df['Region'][
-        highest_disparity_perc_idx]
+    if highest is None:
+        # Prevent update if there is no data for the selection
+        raise PreventUpdate
+    highest_disparity_region, highest_disparity_percentage = highest
 
     # Return the highest disparity region and percentage
     return highest_disparity_region, f"{highest_disparity_percentage:.2f}%"
 
 
 def update_highest_disparity_occupation_for_selected_region(
-    selected_region, selected_year
+    selected_region, selected_year, cube=None
 ):
     """
     Update the highest disparity occupation based on the selected region
@@ -308,6 +328,8 @@ def update_highest_disparity_occupation_for_selected_region(
         Selected region.
     selected_year : int
         Selected year.
+    cube : DisparityCube, optional
+        Cube to look the value up in (defaults to the current one).
 
     Returns
     -------
@@ -318,25 +340,25 @@ def update_highest_disparity_occupation_for_selected_region(
         # Prevent update if region or year is not selected
         raise PreventUpdate
 
-    # Filter the dataframe based on the selected region and year
-    filtered_df = filter_dataframe(region=selected_region, year=selected_year)
+    if cube is None:
+        cube = get_disparity_cube()
 
-    # Prepare the disparity dataframe
-    disparity_df = prepare_disparity_df(filtered_df)
-
-    # Find the highest disparity percentage and its index
-    highest_disparity_percentage = disparity_df['Disparity'].max()
-    highest_disparity_perc_idx = disparity_df['Disparity'].idxmax()
-
-    # Get the occupation with the highest disparity
-    highest_disparity_occupation = disparity_df['Occupation Type'][
-        highest_disparity_perc_idx]
+    # Look up the occupation with the highest disparity in the disparity cube
+    highest = cube.highest_disparity_occupation(
+        selected_region, selected_year
+    )
+    if highest is None:
+        # Prevent update if there is no data for the selection
+        raise PreventUpdate
+    highest_disparity_occupation, highest_disparity_percentage = highest
 
     # Return the highest disparity occupation and percentage
     return highest_disparity_occupation, f"{highest_disparity_percentage:.2f}%"
 
 
-def update_highest_male_employment_occupation(selected_region, selected_year):
+def update_highest_male_employment_occupation(
+    selected_region, selected_year, cube=None
+):
     """
     Update the highest male employment occupation based on the selected region
     and year.
@@ -347,6 +369,8 @@ def update_highest_male_employment_occupation(selected_region, selected_year):
         Selected region.
     selected_year : int
         Selected year.
+    cube : DisparityCube, optional
+        Cube to look the value up in (defaults to the current one).
 
     Returns
     -------
@@ -357,23 +381,18 @@ def update_highest_male_employment_occupation(selected_region, selected_year):
         # Prevent update if region or year is not selected
         raise PreventUpdate
 
-    # Filter the dataframe based on the selected region, year, and
-    # gender (Male)
-    male_df = filter_dataframe(
-        region=selected_region, year=selected_year, gender='Male'
-    )
-
-    # Find the highest male employment percentage and its index
-    highest_male_employment_percentage = male_df[
-        'Percentage Employed (Relative to Total Employment in the Year)'
-    ].max()
-    highest_male_employ_perc_idx = male_df[
-        'Percentage Employed (Relative to Total Employment in the Year)'
-    ].idxmax()
+    if cube is None:
+        cube = get_disparity_cube()
 
-    # Get the occupation with the highest male employment
-    highest_male_employment_occupation = male_df['Occupation Type'][
-        highest_male_employ_perc_idx]
+    # Look up the occupation with the highest male employment
+    highest = cube.highest_employment_occupation(
+        selected_region, selected_year, 'Male'
+    )
+    if highest is None:
+        # Prevent update if there is no data for the selection
+        raise PreventUpdate
+    (highest_male_employment_occupation,
+     highest_male_employment_percentage) = highest
 
     # Return the highest male employment occupation and percentage
     return highest_male_employment_occupation, \
@@ -381,7 +400,7 @@ def update_highest_male_employment_occupation(selected_region, selected_year):
 
 
 def update_highest_female_employment_occupation(
-    selected_region, selected_year
+    selected_region, selected_year, cube=None
 ):
     """
     Update the highest female employment occupation based on the selected
@@ -393,6 +412,8 @@ def update_highest_female_employment_occupation(
         Selected region.
     selected_year : int
         Selected year.
+    cube : DisparityCube, optional
+        Cube to look the value up in (defaults to the current one).
 
     Returns
     -------
@@ -403,24 +424,18 @@ def update_highest_female_employment_occupation(
         # Prevent update if region or year is not selected
         raise PreventUpdate
 
-    # Filter the dataframe based on the selected region, year, and
-    # gender (Female)
-    female_df = filter_dataframe(region=selected_region,
-                                 year=selected_year,
-                                 gender='Female')
-
-    # Find the highest female employment percentage and its index
-    highest_female_employment_percentage = female_df[
-        'Percentage Employed (Relative to Total Employment in the Year)'
-    ].max()
-    highest_female_employ_perc_idx = female_df[
-        'Percentage Employed (Relative to Total Employment in the Year)'
-    ].idxmax()
-
-    # Get the occupation with the highest female employment
-    highest_female_employment_occupation = female_df[
-        'Occupation Type'
-    ][highest_female_employ_perc_idx]
+    if cube is None:
+        cube = get_disparity_cube()
+
+    # Look up the occupation with the highest female employment
+    highest = cube.highest_employment_occupation(
+        selected_region, selected_year, 'Female'
+    )
+    if highest is None:
+        # Prevent update if there is no data for the selection
+        raise PreventUpdate
+    (highest_female_employment_occupation,
+     highest_female_employment_percentage) = highest
 
     # Return the highest female employment occupation and percentage
     return highest_female_employment_occupation, \
@@ -428,7 +443,7 @@ def update_highest_female_employment_occupation(
 
 
 def update_highest_overall_employment_occupation(
-    selected_region, selected_year
+    selected_region, selected_year, cube=None
 ):
     """
     Update the highest overall employment occupation based on the selected
@@ -440,6 +455,8 @@ def update_highest_overall_employment_occupation(
         Selected region.
     selected_year : int
         Selected year.
+    cube : DisparityCube, optional
+        Cube to look the value up in (defaults to the current one).
 
     Returns
     -------
@@ -450,19 +467,17 @@ def update_highest_overall_employment_occupation(
         # Prevent update if region or year is not selected
         raise PreventUpdate
 
-    # Filter the dataframe based on the selected region and year
-    filtered_df = filter_dataframe(region=selected_region, year=selected_year)
-
-    # Prepare the disparity dataframe
-    disparity_df = prepare_disparity_df(filtered_df)
-
-    # Find the highest overall employment percentage and its index
-    highest_employment_percentage = disparity_df['Total Employment'].max()
-    highest_employ_perc_idx = disparity_df['Total Employment'].idxmax()
+    if cube is None:
+        cube = get_disparity_cube()
 
-    # Get the occupation with the highest overall employment
-    highest_employment_occupation = disparity_df['Occupation Type'][
-        highest_employ_perc_idx]
+    # Look up the occupation with the highest overall employment
+    highest = cube.highest_total_employment_occupation(
+        selected_region, selected_year
+    )
+    if highest is None:
+        # Prevent update if there is no data for the selection
+        raise PreventUpdate
+    highest_employment_occupation, highest_employment_percentage = highest
 
     # Return the highest overall employment occupation and percentage
     return (
@@ -471,6 +486,65 @@ def update_highest_overall_employment_occupation(
     )
 
 
+def update_summary_stats(
+    selected_region, selected_year, selected_occupation
+):
+    """
+    Update every card of the summary statistics panel in one pass.
+
+    The disparity cube is fetched once and shared by all cards. A card whose
+    filters are incomplete, or which has no data for the selection, keeps
+    its current value.
+
+    Parameters
+    ----------
+    selected_region : str
+        Selected region.
+    selected_year : int
+        Selected year.
+    selected_occupation : str
+        Selected occupation.
+
+    Returns
+    -------
+    tuple
+        The values of `SUMMARY_STATS_OUTPUTS`, in order.
+    """
+    if not selected_year:
+        # Every card depends on the year
+        raise PreventUpdate
+
+    cube = get_disparity_cube()
+    sections = [
+        (update_selected_filters_for_gender_stats,
+         (selected_region, selected_year), {}, 2),
+        (update_selected_filters_for_occ_stats,
+         (selected_region, selected_year, selected_occupation), {}, 3),
+        (update_highest_disparity_region,
+         (selected_occupation, selected_year), {'cube': cube}, 2),
+        (update_highest_disparity_occupation_for_selected_region,
+         (selected_region, selected_year), {'cube': cube}, 2),
+        (update_highest_overall_employment_occupation,
+         (selected_region, selected_year), {'cube': cube}, 2),
+        (update_highest_male_employment_occupation,
+         (selected_region, selected_year), {'cube': cube}, 2),
+        (update_highest_female_employment_occupation,
+         (selected_region, selected_year), {'cube': cube}, 2),
+    ]
+
+    values = []
+    for update, args, kwargs, n_outputs in sections:
+        try:
+            values.extend(update(*args, **kwargs))
+        except PreventUpdate:
+            # Leave this card unchanged without blocking the others
+            values.extend([no_update] * n_outputs)
+
+    if all(value is no_update for value in values):
+        raise PreventUpdate
+    return tuple(values)
+
+
 def register_callbacks(app):
     """
     Register all callbacks for the Dash app.
@@ -716,12 +790,11 @@ def register_callbacks(app):
                 )
             ])
         else:
-            # Filter the dataframe based on the selected region and year
-            filtered_df = filter_dataframe(
+            # Get the shared disparity dataframe for the selected region
+            # and year
+            disparity_df = get_disparity_df(
                 region=selected_region, year=selected_year
             )
-            # Prepare the disparity dataframe
-            disparity_df = prepare_disparity_df(filtered_df)
             # Create the pie chart figure
             pie_chart_figure = create_pie_chart(
                 disparity_df, selected_region, selected_year
@@ -764,13 +837,11 @@ def register_callbacks(app):
         else:
             # Prepare the occupation prefix for filtering
             occupation_prefix = f"{selected_occupation}:"
-            # Filter the dataframe based on the selected year and occupation
-            # prefix
-            filtered_df = filter_dataframe(
+            # Get the shared disparity dataframe for the selected year and
+            # occupation prefix
+            disparity_df = get_disparity_df(
                 year=selected_year, occupation_prefix=occupation_prefix
             )
-            # Prepare the disparity dataframe
-            disparity_df = prepare_disparity_df(filtered_df)
             # Create the disparity map figure
             disparity_map_figure = create_disparity_map(
                 disparity_df, selected_year
@@ -809,10 +880,8 @@ def register_callbacks(app):
                 )
             ])
         else:
-            # Filter the dataframe based on the selected region
-            filtered_df = filter_dataframe(region=selected_region)
-            # Prepare the disparity dataframe
-            disparity_df = prepare_disparity_df(filtered_df)
+            # Get the shared disparity dataframe for the selected region
+            disparity_df = get_disparity_df(region=selected_region)
             # Create the area chart figure
             area_chart_figure = create_area_chart(
                 disparity_df, selected_region
@@ -820,103 +889,17 @@ def register_callbacks(app):
             # Return the area chart as a dcc.Graph component
             return dcc.Graph(id="stacked-area-chart", figure=area_chart_figure)
 
-    # Update selected region and year for gender occupation statistics card
+    # Update every summary statistics card from a single disparity cube
     @app.callback(
-        Output("gen-selected-region", "children"),
-        Output("gen-selected-year", "children"),
+        [Output(component_id, prop)
+         for component_id, prop in SUMMARY_STATS_OUTPUTS],
         Input("region-dropdown", "value"),
         Input("year-dropdown", "value"),
+        Input("occupation-type-slider", "value"),
     )
-    def wrapped_update_selected_filters_for_gender_stats(
-        selected_region, selected_year
-    ):
-        return update_selected_filters_for_gender_stats(
-            selected_region, selected_year
-        )
-
-    # Update selected region and year for occupation type statistics card
-    @app.callback(
-        Output("occ-selected-region", "children"),
-        Output("occ-selected-year", "children"),
-        Output('selected-occupation-type', 'children'),
-        Input("region-dropdown", "value"),
-        Input("year-dropdown", "value"),
-        Input('occupation-type-slider', 'value')
-    )
-    def wrapped_update_selected_filters_for_occ_stats(
+    def wrapped_update_summary_stats(
         selected_region, selected_year, selected_occupation
     ):
-        return update_selected_filters_for_occ_stats(
+        return update_summary_stats(
             selected_region, selected_year, selected_occupation
         )
-
-    # Update highest disparity region and percentage
-    @app.callback(
-        Output("highest-disparity-region", "children"),
-        Output("highest-disparity-percentage", "children"),
-        Input("occupation-type-slider", "value"),
-        Input("year-dropdown", "value"),
-    )
-    def wrapped_update_highest_disparity_region(
-        selected_occupation, selected_year
-    ):
-        return update_highest_disparity_region(
-            selected_occupation, selected_year
-        )
-
-    # Update highest disparity occupation and percentage
-    @app.callback(
-        Output("highest-disparity-occupation", "children"),
-        Output("highest-disparity-occupation-percentage", "children"),
-        Input("region-dropdown", "value"),
-        Input("year-dropdown", "value"),
-        allow_duplicate=True
-    )
-    def wrapped_update_highest_disparity_occupation_for_selected_region(
-        selected_region, selected_year
-    ):
-        return update_highest_disparity_occupation_for_selected_region(
-            selected_region, selected_year
-        )
-
-    # Update highest overall employment occupation and percentage
-    @app.callback(
-        Output("highest-employment-occupation", "children"),
-        Output("highest-employment-percentage", "children"),
-        Input("region-dropdown", "value"),
-        Input("year-dropdown", "value")
-    )
-    def wrapped_update_highest_overall_employment_occupation(
-        selected_region, selected_year
-    ):
-        return update_highest_overall_employment_occupation(
-            selected_region, selected_year
-        )
-
-    # Update highest male employment occupation and percentage
-    @app.callback(
-        Output("highest-male-employment-occupation", "children"),
-        Output("highest-male-employment-percentage", "children"),
-        Input("region-dropdown", "value"),
-        Input("year-dropdown", "value")
-    )
-    def wrapped_update_highest_male_employment_occupation(
-        selected_region, selected_year
-    ):
-        return update_highest_male_employment_occupation(
-            selected_region, selected_year
-        )
-
-    # Update highest female employment occupation and percentage
-    @app.callback(
-        Output("highest-female-employment-occupation", "children"),
-        Output("highest-female-employment-percentage", "children"),
-        Input("region-dropdown", "value"),
-        Input("year-dropdown", "value")
-    )
-    def wrapped_update_highest_female_employment_occupation(
-        selected_region, selected_year
-    ):
-        return update_highest_female_employment_occupation(
-            selected_region, selected_year
-        )
@@ -1,7 +1,5 @@
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-import pandas as pd
-from pathlib import Path
 from employment_flask_app.dash_app.filter_data_functions import (
     highest_m_year_disparity_percentage,
     highest_m_year_disparity_occupation,
@@ -40,10 +38,6 @@ def get_metric_style(value):
     return {"color": "danger", "icon": "bi-arrow-down"}
 
 
-# Create dataframe
-data_path = Path(__file__).parent.parent / "data" / "employment_prepared.xlsx"
-df = pd.read_excel(data_path)
-
 # Navigation bar
 navigation_bar = dbc.NavbarSimple(
     children=[
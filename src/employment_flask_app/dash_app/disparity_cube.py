@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from employment_flask_app.dash_app.filter_data_functions import (
+    occupation_code_prefix
+)
+from employment_flask_app.dataset_store import get_dashboard_snapshot
+
+PERC_COL = "Percentage Employed (Relative to Total Employment in the Year)"
+
+# Gender axis of the cube
+GENDERS = ('Male', 'Female')
+
+
+class DisparityCube:
+    """
+    Dense employment cube with precomputed summary statistics.
+
+    The cube has one cell per region x year x occupation type x location
+    (latitude, longitude) and holds the male and female employment
+    percentages of each cell, averaged and zero-filled exactly like the
+    gender pivot in `prepare_disparity_df`. Totals and disparities are
+    derived from it, and every summary card value is resolved once when the
+    cube is built so callbacks only do a dictionary lookup.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataset to summarize. It is not modified.
+    """
+
+    def __init__(self, df):
+        # Axes are sorted the same way pivot_table sorts its index, so that
+        # argmax ties resolve to the same row idxmax would pick
+        region_idx, self.regions = pd.factorize(df['Region'], sort=True)
+        year_idx, self.years = pd.factorize(df['Year'], sort=True)
+        occupation_idx, self.occupations = pd.factorize(
+            df['Occupation Type'], sort=True
+        )
+        self.locations, location_idx = np.unique(
+            np.column_stack([df['Latitude'], df['Longitude']]),
+            axis=0,
+            return_inverse=True
+        )
+        location_idx = location_idx.ravel()
+
+        shape = (len(self.regions), len(self.years), len(self.occupations),
+                 len(self.locations))
+        cell = (region_idx, year_idx, occupation_idx, location_idx)
+
+        # A cell exists if it has any row, whatever the gender
+        self.present = np.zeros(shape, dtype=bool)
+        self.present[cell] = True
+
+        # Mean percentage per cell and gender, 0 where a gender is missing
+        shares = np.zeros(shape + (len(GENDERS),))
+        values = df[PERC_COL].to_numpy(dtype=float)
+        gender_values = df['Gender'].to_numpy()
+        for g, gender in enumerate(GENDERS):
+            rows = gender_values == gender
+            sums = np.zeros(shape)
+            counts = np.zeros(shape)
+            gender_cell = tuple(axis[rows] for axis in cell)
+            np.add.at(sums, gender_cell, values[rows])
+            np.add.at(counts, gender_cell, 1)
+            np.divide(sums, counts, out=shares[..., g], where=counts > 0)
+
+        self.male = shares[..., 0]
+        self.female = shares[..., 1]
+        self.total = self.male + self.female
+        self.disparity = np.abs(self.male - self.female)
+
+        self._by_region_year = self._summarize_region_years()
+        self._by_occupation_year = self._summarize_occupation_years()
+        self._by_gender = self._summarize_genders(df)
+
+    def _argmax(self, values, present, labels):
+        """Return (label, value) of the first maximum among present cells."""
+        if not present.any():
+            return None
+        flat = np.where(present, values, -np.inf).ravel()
+        best = int(np.argmax(flat))
+        return labels[np.unravel_index(best, values.shape)[0]], flat[best]
+
+    def _summarize_region_years(self):
+        """Highest disparity and total employment occupation per region and
+        year."""
+        summary = {}
+        for r, region in enumerate(self.regions):
+            for y, year in enumerate(self.years):
+                present = self.present[r, y]
+                summary[(region, int(year))] = {
+                    'disparity': self._argmax(
+                        self.disparity[r, y], present, self.occupations
+                    ),
+                    'total': self._argmax(
+                        self.total[r, y], present, self.occupations
+                    ),
+                }
+        return summary
+
+    def _summarize_occupation_years(self):
+        """Highest disparity region per occupation code prefix and year."""
+        codes = pd.Series(
+            np.asarray(self.occupations, dtype=object)
+        ).map(occupation_code_prefix)
+        summary = {}
+        for code, positions in codes.groupby(codes.to_numpy()).indices.items():
+            for y, year in enumerate(self.years):
+                # Slices are (region, occupation, location), which flattens
+                # in the pivot's row order
+                disparity = self.disparity[:, y][:, positions]
+                present = self.present[:, y][:, positions]
+                summary[(code, int(year))] = self._argmax(
+                    disparity, present, self.regions
+                )
+        return summary
+
+    def _summarize_genders(self, df):
+        """Highest employment occupation per region, year and gender.
+
+        Resolved from the raw rows so duplicates and ties behave like
+        `idxmax` on the filtered dataframe.
+        """
+        best_rows = df.groupby(
+            ['Region', 'Year', 'Gender'], observed=True, sort=False
+        )[PERC_COL].idxmax()
+        return {
+            (region, int(year), gender): (
+                df.at[label, 'Occupation Type'], df.at[label, PERC_COL]
+            )
+            for (region, year, gender), label in best_rows.items()
+        }
+
+    def highest_disparity_region(self, occupation_prefix, year):
+        """Return (region, disparity) for an occupation prefix and year."""
+        return self._by_occupation_year.get((occupation_prefix, int(year)))
+
+    def highest_disparity_occupation(self, region, year):
+        """Return (occupation, disparity) for a region and year."""
+        summary = self._by_region_year.get((region, int(year)))
+        return summary['disparity'] if summary else None
+
+    def highest_total_employment_occupation(self, region, year):
+        """Return (occupation, total employment) for a region and year."""
+        summary = self._by_region_year.get((region, int(year)))
+        return summary['total'] if summary else None
+
+    def highest_employment_occupation(self, region, year, gender):
+        """Return (occupation, employment) for a region, year and gender."""
+        return self._by_gender.get((region, int(year), gender))
+
+
+def get_disparity_cube():
+    """
+    Return the disparity cube for the current data version.
+
+    Returns
+    -------
+    DisparityCube
+        The cube, built at most once per dataset snapshot.
+    """
+    return get_dashboard_snapshot().derive('disparity_cube', DisparityCube)
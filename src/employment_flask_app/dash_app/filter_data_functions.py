@@ -1,19 +1,119 @@
-import pandas as pd
-from pathlib import Path
+from functools import lru_cache
 
-# Create dataframe
-data_path = Path(__file__).parent.parent / 'data' / 'employment_prepared.xlsx'
-df = pd.read_excel(data_path)
+import numpy as np
+from employment_flask_app.dataset_store import (
+    get_dataset,
+    get_dashboard_snapshot
+)
 
+# Shared view of the bundled dataset, used for the static summary cards
+df = get_dataset()
 
-def filter_dataframe(region=None, year=None,
-                     occupation_prefix=None, gender=None):
+# Row positions returned when a filter value is not in the index
+EMPTY_POSITIONS = np.array([], dtype=np.intp)
+
+# Number of disparity pivots kept per data version
+DISPARITY_CACHE_SIZE = 128
+
+
+def occupation_code_prefix(occupation):
+    """
+    Return the "<code>:" prefix of an occupation type, or None.
+
+    Parameters
+    ----------
+    occupation : str
+        An occupation type such as "1: managers, directors and senior
+        officials".
+
+    Returns
+    -------
+    str or None
+        The text up to and including the first colon, or None if the
+        occupation type has no colon.
+    """
+    code, colon, _ = str(occupation).partition(':')
+    return f"{code}:" if colon else None
+
+
+def build_filter_index(df):
+    """
+    Build row-position lookups for the columns `filter_dataframe` filters on.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataset to index.
+
+    Returns
+    -------
+    dict
+        Maps 'region', 'year', 'occupation' and 'gender' to dictionaries of
+        column value (occupation code prefix for 'occupation') to sorted
+        arrays of row positions.
     """
-    Filter the dataframe based on the provided region, year, occupation prefix,
-    and gender.
+    occupation_codes = df['Occupation Type'].map(occupation_code_prefix)
+    index = {}
+    for name, keys in (
+        ('region', df['Region']),
+        ('year', df['Year']),
+        ('occupation', occupation_codes),
+        ('gender', df['Gender']),
+    ):
+        # groupby().indices gives the ascending row positions of each value
+        index[name] = {
+            key: positions.astype(np.intp)
+            for key, positions in keys.groupby(
+                keys.to_numpy(), sort=False
+            ).indices.items()
+        }
+    return index
+
+
+def normalize_filters(region=None, year=None,
+                      occupation_prefix=None, gender=None):
+    """
+    Normalize filter values so equivalent selections share a cache key.
 
     Parameters
     ----------
+    region : str, optional
+        The region to filter by.
+    year : int or str, optional
+        The year to filter by.
+    occupation_prefix : str, optional
+        The occupation prefix to filter by.
+    gender : str, optional
+        The gender to filter by.
+
+    Returns
+    -------
+    tuple
+        (region, year, occupation_prefix, gender) with unset filters as None
+        and the year as an int.
+    """
+    return (
+        region or None,
+        int(year) if year else None,
+        occupation_prefix or None,
+        gender or None,
+    )
+
+
+def filter_snapshot(snapshot, region=None, year=None,
+                    occupation_prefix=None, gender=None):
+    """
+    Filter a dataset snapshot based on the provided region, year,
+    occupation prefix, and gender.
+
+    Row positions for each filter come from an index built once per
+    snapshot, so a lookup intersects a few small arrays and takes only the
+    matching rows instead of copying and masking the whole dataset.
+
+    Parameters
+    ----------
+    snapshot : DatasetSnapshot
+        The snapshot to filter.
     region : str, optional
         The region to filter by.
     year : int, optional
@@ -28,31 +128,71 @@ def filter_dataframe(region=None, year=None,
     pd.DataFrame
         The filtered dataframe.
     """
-    # Create a copy of the dataframe to avoid modifying the original
-    filtered_df = df.copy()
+    index = snapshot.derive('filter_index', build_filter_index)
 
-    # Filter by region if specified
+    # Look up the row positions of every filter that is specified
+    lookups = []
     if region:
-        filtered_df = filtered_df[filtered_df['Region'] == region]
-
-    # Filter by year if specified
+        lookups.append(index['region'].get(region, EMPTY_POSITIONS))
     if year:
-        filtered_df = filtered_df[filtered_df['Year'] == int(year)]
+        lookups.append(index['year'].get(int(year), EMPTY_POSITIONS))
+    if gender:
+        lookups.append(index['gender'].get(gender, EMPTY_POSITIONS))
+
+    # Only "<code>:" prefixes are indexed; other prefixes are masked below
+    indexed_occupation = (
+        occupation_prefix
+        and occupation_code_prefix(occupation_prefix) == occupation_prefix
+    )
+    if indexed_occupation:
+        lookups.append(
+            index['occupation'].get(occupation_prefix, EMPTY_POSITIONS)
+        )
 
-    # Filter by occupation prefix if specified
-    if occupation_prefix:
+    if not lookups:
+        filtered_df = snapshot.frame.copy(deep=False)
+    else:
+        positions = lookups[0]
+        for other in lookups[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        filtered_df = snapshot.frame.take(positions)
+
+    if occupation_prefix and not indexed_occupation:
         filtered_df = filtered_df[
             filtered_df['Occupation Type'].str.startswith(occupation_prefix)
         ]
 
-    # Filter by gender if specified
-    if gender:
-        filtered_df = filtered_df[filtered_df['Gender'] == gender]
-
     # Return the filtered dataframe
     return filtered_df
 
 
+def filter_dataframe(region=None, year=None,
+                     occupation_prefix=None, gender=None):
+    """
+    Filter the dashboard dataset based on the provided region, year,
+    occupation prefix, and gender.
+
+    Parameters
+    ----------
+    region : str, optional
+        The region to filter by.
+    year : int, optional
+        The year to filter by.
+    occupation_prefix : str, optional
+        The occupation prefix to filter by.
+    gender : str, optional
+        The gender to filter by.
+
+    Returns
+    -------
+    pd.DataFrame
+        The filtered dataframe.
+    """
+    return filter_snapshot(
+        get_dashboard_snapshot(), region, year, occupation_prefix, gender
+    )
+
+
 def prepare_year_pivot_df(disparity_df):
     """
     Prepare a pivot table of the disparity dataframe by year.
@@ -72,7 +212,8 @@ def prepare_year_pivot_df(disparity_df):
         index=['Region', 'Occupation Type', 'Latitude', 'Longitude'],
         columns='Year',
         values='Total Employment',
-        fill_value=0
+        fill_value=0,
+        observed=True
     ).reset_index()
 
     # Calculate the disparity between the years 2023 and 2021
@@ -106,9 +247,16 @@ def prepare_disparity_df(filtered_df):
         index=['Region', 'Year', 'Occupation Type', 'Latitude', 'Longitude'],
         columns='Gender',
         values=perc_col,
-        fill_value=0
+        fill_value=0,
+        observed=True
     ).reset_index()
 
+    # Rows edited through the datatable may leave a selection with only one
+    # gender; treat the missing gender as 0% employment
+    for gender in ('Male', 'Female'):
+        if gender not in disparity_df:
+            disparity_df[gender] = 0.0
+
     # Calculate the total employment by summing male and female employment
     disparity_df['Total Employment'] = (
         disparity_df['Male'] + disparity_df['Female']
@@ -123,6 +271,61 @@ def prepare_disparity_df(filtered_df):
     return disparity_df
 
 
+def build_disparity_cache(snapshot):
+    """
+    Create the memoized disparity pivot lookup for one snapshot.
+
+    Parameters
+    ----------
+    snapshot : DatasetSnapshot
+        The snapshot the pivots are computed from.
+
+    Returns
+    -------
+    callable
+        An LRU-cached function of the normalized filter tuple.
+    """
+    @lru_cache(maxsize=DISPARITY_CACHE_SIZE)
+    def cached_disparity_df(*filters):
+        return prepare_disparity_df(filter_snapshot(snapshot, *filters))
+    return cached_disparity_df
+
+
+def get_disparity_df(region=None, year=None,
+                     occupation_prefix=None, gender=None):
+    """
+    Return the disparity pivot for a filter selection, memoized.
+
+    Pivots are cached in a bounded LRU keyed on the normalized filters. The
+    cache belongs to the current data version's snapshot, so it is dropped
+    as soon as the data changes. Every callback asking for the same selection
+    gets the same frame back and must not modify it.
+
+    Parameters
+    ----------
+    region : str, optional
+        The region to filter by.
+    year : int, optional
+        The year to filter by.
+    occupation_prefix : str, optional
+        The occupation prefix to filter by.
+    gender : str, optional
+        The gender to filter by.
+
+    Returns
+    -------
+    pd.DataFrame
+        The shared disparity dataframe.
+    """
+    snapshot = get_dashboard_snapshot()
+    cached_disparity_df = snapshot.derive(
+        'disparity_cache', lambda frame: build_disparity_cache(snapshot)
+    )
+    return cached_disparity_df(
+        *normalize_filters(region, year, occupation_prefix, gender)
+    )
+
+
 def find_highest_dis_by_gender(df, gender, region=None):
     """
     Find the highest year disparity percentage for a specific gender.
@@ -0,0 +1,472 @@
+"""
+Process-wide store for the bundled employment dataset.
+
+The prepared workbook is parsed at most once per process and shared by the
+Flask routes (seeding the database) and the Dash app (filtering and summary
+statistics). The store can be warmed eagerly, e.g. from `create_app`, or left
+to load lazily on first access.
+
+Parsing the workbook through openpyxl is slow, so the first load writes a
+columnar NumPy sidecar (`.npz`) next to the workbook, named after a hash of
+the workbook's contents. Later loads read the sidecar and only fall back to
+the workbook when the sidecar is missing, stale or unreadable.
+
+An empty `EmploymentData` table is seeded from the dataset once, when the app
+starts or through the `seed-employment-data` command, never while serving a
+request.
+
+The dashboard reads the live `EmploymentData` table through
+`get_dashboard_snapshot`, which caches the table per app and reloads it only
+when the shared `DatasetVersion` counter changes.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+
+import click
+from flask.cli import with_appcontext
+import numpy as np
+import pandas as pd
+from flask import current_app, has_app_context
+
+data_path = Path(__file__).parent / 'data' / 'employment_prepared.xlsx'
+
+# Bump when the sidecar layout changes so old caches are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Column names used by the bundled dataset
+REGION_COL = 'Region'
+YEAR_COL = 'Year'
+GENDER_COL = 'Gender'
+OCCUPATION_COL = 'Occupation Type'
+PERCENTAGE_COL = (
+    'Percentage Employed (Relative to Total Employment in the Year)'
+)
+MARGIN_COL = 'Margin of Error (%)'
+LATITUDE_COL = 'Latitude'
+LONGITUDE_COL = 'Longitude'
+
+# Dtypes enforced on load so every consumer sees the same schema
+DATASET_DTYPES = {
+    REGION_COL: 'category',
+    YEAR_COL: 'int64',
+    GENDER_COL: 'category',
+    OCCUPATION_COL: 'category',
+    PERCENTAGE_COL: 'float64',
+    MARGIN_COL: 'float64',
+    LATITUDE_COL: 'float64',
+    LONGITUDE_COL: 'float64',
+}
+
+# Dataset columns and the EmploymentData attributes they are stored in
+TABLE_COLUMNS = {
+    REGION_COL: 'RegionName',
+    YEAR_COL: 'Year',
+    GENDER_COL: 'Gender',
+    OCCUPATION_COL: 'OccupationType',
+    PERCENTAGE_COL: 'EmploymentPercentage',
+    MARGIN_COL: 'MarginofErrorPercentage',
+    LATITUDE_COL: 'Latitude',
+    LONGITUDE_COL: 'Longitude',
+}
+
+_lock = threading.Lock()
+_dataset = None
+_bundled_snapshot = None
+
+# Databases this process has seeded, or found already seeded
+_seeded_databases = set()
+_seed_lock = threading.Lock()
+
+
+def read_workbook(path=data_path):
+    """
+    Read the employment workbook from disk and apply the dataset dtypes.
+
+    Parameters
+    ----------
+    path : pathlib.Path, optional
+        Location of the workbook (defaults to the bundled file).
+
+    Returns
+    -------
+    pd.DataFrame
+        The parsed dataset.
+    """
+    return pd.read_excel(path).astype(DATASET_DTYPES)
+
+
+def cache_path_for(path=data_path):
+    """
+    Return the sidecar location for a workbook, keyed on its contents.
+
+    Parameters
+    ----------
+    path : pathlib.Path, optional
+        Location of the workbook (defaults to the bundled file).
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the `.npz` sidecar for the current workbook contents.
+    """
+    digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+    return Path(path).with_name(
+        f"{Path(path).stem}.v{CACHE_FORMAT_VERSION}.{digest}.npz"
+    )
+
+
+def write_cache(df, cache_path):
+    """
+    Write a dataset to a columnar `.npz` sidecar.
+
+    Categorical columns are stored as integer codes plus their categories,
+    other text columns as fixed-width unicode arrays, so the file can be
+    loaded without pickle. The file is written atomically.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataset to store.
+    cache_path : pathlib.Path
+        Destination of the sidecar.
+    """
+    arrays = {'columns': np.array(df.columns, dtype=str)}
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            arrays[f'codes_{i}'] = series.cat.codes.to_numpy()
+            arrays[f'categories_{i}'] = np.array(
+                series.cat.categories, dtype=str
+            )
+        elif series.dtype == object:
+            arrays[f'text_{i}'] = series.to_numpy(dtype=str)
+        else:
+            arrays[f'values_{i}'] = series.to_numpy()
+
+    fd, tmp_name = tempfile.mkstemp(
+        dir=Path(cache_path).parent, suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_name, cache_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def read_cache(cache_path):
+    """
+    Read a dataset from a columnar `.npz` sidecar.
+
+    Parameters
+    ----------
+    cache_path : pathlib.Path
+        Location of the sidecar.
+
+    Returns
+    -------
+    pd.DataFrame
+        The cached dataset.
+    """
+    with np.load(cache_path, allow_pickle=False) as arrays:
+        data = {}
+        for i, column in enumerate(arrays['columns'].tolist()):
+            if f'codes_{i}' in arrays:
+                data[column] = pd.Categorical.from_codes(
+                    arrays[f'codes_{i}'],
+                    categories=arrays[f'categories_{i}'].astype(object)
+                )
+            elif f'text_{i}' in arrays:
+                data[column] = arrays[f'text_{i}'].astype(object)
+            else:
+                data[column] = arrays[f'values_{i}']
+    return pd.DataFrame(data)
+
+
+def remove_stale_caches(cache_path):
+    """
+    Delete sidecars left behind by older workbook contents or formats.
+
+    Parameters
+    ----------
+    cache_path : pathlib.Path
+        The current sidecar, which is kept.
+    """
+    stem = Path(cache_path).name.split('.')[0]
+    for stale in Path(cache_path).parent.glob(f'{stem}.v*.npz'):
+        if stale != Path(cache_path):
+            stale.unlink()
+
+
+def load_dataset(path=data_path):
+    """
+    Load the dataset from its sidecar, falling back to the workbook.
+
+    When the sidecar is missing or unreadable the workbook is parsed and a
+    fresh sidecar is written for the next process. Failing to write the
+    sidecar (e.g. on a read-only install) is not an error.
+
+    Parameters
+    ----------
+    path : pathlib.Path, optional
+        Location of the workbook (defaults to the bundled file).
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataset.
+    """
+    cache_path = cache_path_for(path)
+    try:
+        return read_cache(cache_path)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    df = read_workbook(path)
+    try:
+        write_cache(df, cache_path)
+        remove_stale_caches(cache_path)
+    except OSError:
+        pass
+    return df
+
+
+def get_dataset():
+    """
+    Return a read-only view of the shared employment dataset.
+
+    The dataset is loaded on first use and cached for the lifetime of the
+    process. The returned frame is a shallow copy, so adding or replacing
+    columns does not leak into other consumers; callers must still not
+    modify values in place.
+
+    Returns
+    -------
+    pd.DataFrame
+        A view of the cached dataset.
+    """
+    global _dataset
+    if _dataset is None:
+        with _lock:
+            # Re-check inside the lock so concurrent first calls parse once
+            if _dataset is None:
+                _dataset = load_dataset()
+    return _dataset.copy(deep=False)
+
+
+def warm_dataset():
+    """Load the dataset eagerly so the first request does not pay for it."""
+    get_dataset()
+
+
+def clear_dataset():
+    """Drop the cached dataset; the next access reloads it from disk."""
+    global _dataset, _bundled_snapshot
+    with _lock:
+        _dataset = None
+        _bundled_snapshot = None
+
+
+def seed_employment_data(force=False):
+    """
+    Load the bundled dataset into the EmploymentData table if it is empty.
+
+    Runs in an app context. Each process checks a database once and
+    remembers the outcome. The check runs inside a write transaction, so
+    when several workers start together the first one seeds the table and
+    the others wait for it and then find the rows.
+
+    Parameters
+    ----------
+    force : bool, optional
+        Check the table even if this process has already seen it seeded.
+
+    Returns
+    -------
+    int
+        The number of rows inserted, 0 if the table already had rows.
+    """
+    from sqlalchemy import select
+
+    from employment_flask_app import db
+    from employment_flask_app.models import DatasetVersion, EmploymentData
+    from employment_flask_app.route_functions import (
+        insert_new_employment_chunks
+    )
+
+    database = str(db.engine.url)
+    with _seed_lock:
+        if database in _seeded_databases and not force:
+            return 0
+        # Writers queue on SQLite's lock, so other workers wait here until
+        # this transaction has seeded the table or found it seeded
+        DatasetVersion.lock(db.session)
+        if db.session.scalar(select(EmploymentData.DataID).limit(1)) is None:
+            inserted = insert_new_employment_chunks(
+                [get_dataset()], db, EmploymentData
+            )
+        else:
+            db.session.rollback()
+            inserted = 0
+        _seeded_databases.add(database)
+    return inserted
+
+
+def load_employment_table(session):
+    """
+    Read the EmploymentData table into a frame with the dataset schema.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to read through.
+
+    Returns
+    -------
+    pd.DataFrame
+        The table contents, using the bundled dataset's column names.
+    """
+    # Imported here because this module is loaded before the db object exists
+    from employment_flask_app.models import (
+        EMPLOYMENT_COLUMNS,
+        EmploymentData,
+        select_employment_rows
+    )
+
+    statement = select_employment_rows(
+        *(
+            EMPLOYMENT_COLUMNS[attribute].label(column)
+            for column, attribute in TABLE_COLUMNS.items()
+        )
+    ).order_by(EmploymentData.DataID)
+    return pd.read_sql(statement, session.connection()).astype(DATASET_DTYPES)
+
+
+class DatasetSnapshot:
+    """
+    One loaded version of the dashboard dataset.
+
+    Besides the frame itself, a snapshot caches values derived from it (such
+    as filter indexes) so they are built once per data version and shared by
+    every callback that reads the same version.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The dataset. It is shared and must not be modified.
+    version : int or None
+        The `DatasetVersion` the frame was loaded at, or None for the bundled
+        dataset outside an app context.
+    """
+
+    def __init__(self, frame, version):
+        self.frame = frame
+        self.version = version
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derive(self, name, build):
+        """
+        Return `build(frame)`, computing it at most once per snapshot.
+
+        Parameters
+        ----------
+        name : str
+            Key the derived value is cached under.
+        build : callable
+            Function taking the snapshot's frame and returning the value.
+
+        Returns
+        -------
+        object
+            The cached derived value.
+        """
+        if name not in self._derived:
+            with self._lock:
+                if name not in self._derived:
+                    self._derived[name] = build(self.frame)
+        return self._derived[name]
+
+
+def get_dashboard_snapshot():
+    """
+    Return the snapshot of the dataset the dashboard should display.
+
+    Inside an app context this is the live EmploymentData table, cached on
+    the app and reloaded only when `DatasetVersion` has changed since the
+    last load. Outside an app context, or while the table is still empty,
+    the bundled dataset is used instead.
+
+    Returns
+    -------
+    DatasetSnapshot
+        The current snapshot.
+    """
+    global _bundled_snapshot
+    if not has_app_context():
+        if _bundled_snapshot is None:
+            _bundled_snapshot = DatasetSnapshot(get_dataset(), None)
+        return _bundled_snapshot
+
+    from employment_flask_app import db
+    from employment_flask_app.models import DatasetVersion
+
+    cache = current_app.extensions.setdefault(
+        'employment_dataset', {'lock': threading.Lock(), 'snapshot': None}
+    )
+    version = DatasetVersion.current(db.session)
+    snapshot = cache['snapshot']
+    if snapshot is None or snapshot.version != version:
+        with cache['lock']:
+            snapshot = cache['snapshot']
+            if snapshot is None or snapshot.version != version:
+                # The version is read before the rows, so a concurrent write
+                # at worst causes one extra reload on the next call
+                frame = load_employment_table(db.session)
+                if frame.empty:
+                    frame = get_dataset()
+                snapshot = DatasetSnapshot(frame, version)
+                cache['snapshot'] = snapshot
+    return snapshot
+
+
+def get_dashboard_dataset():
+    """
+    Return a view of the dataset the dashboard should display.
+
+    See `get_dashboard_snapshot` for where the data comes from. The data
+    version is exposed as `df.attrs['version']`.
+
+    Returns
+    -------
+    pd.DataFrame
+        A shallow copy of the snapshot's frame.
+    """
+    snapshot = get_dashboard_snapshot()
+    frame = snapshot.frame.copy(deep=False)
+    frame.attrs['version'] = snapshot.version
+    return frame
+
+
+@click.command('seed-employment-data')
+@with_appcontext
+def seed_employment_data_command():
+    """Load the bundled dataset into an empty employment table."""
+    inserted = seed_employment_data(force=True)
+    if inserted:
+        click.echo(f'Seeded {inserted} employment rows.')
+    else:
+        click.echo('The employment table already has rows.')
+
+
+@click.command('build-dataset-cache')
+def build_dataset_cache_command():
+    """Convert the bundled workbook into its columnar sidecar."""
+    cache_path = cache_path_for()
+    write_cache(read_workbook(), cache_path)
+    click.echo(f'Wrote dataset cache to {cache_path}.')
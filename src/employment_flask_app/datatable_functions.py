@@ -0,0 +1,563 @@
+"""
+Server-side processing for the employment datatable.
+
+The datatable page no longer embeds every row. DataTables requests one page at
+a time, and `datatable_page` answers each request with a single filtered,
+ordered `LIMIT`/`OFFSET` query. The request and response follow the DataTables
+server-side processing protocol:
+https://datatables.net/manual/server-side
+
+Edits, additions and deletions made on the page can be sent together to
+`apply_datatable_batch`, which applies them with one bulk statement per kind
+of operation inside the caller's transaction. Every change moves the data
+version on, and `datatable_changes` tells a page which rows changed since
+the version it last saw, so it can patch them in place.
+
+Exports stream the table in batches through `yield_per`, so memory use does
+not grow with the number of rows. CSV is streamed straight to the client;
+XLSX is written with openpyxl's write-only mode into a temporary file.
+"""
+import csv
+import io
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from sqlalchemy import String, cast, delete, func, insert, or_, select, update
+
+from employment_flask_app.models import (
+    CHANGE_LOG_VERSIONS,
+    EMPLOYMENT_COLUMNS,
+    EMPLOYMENT_DIMENSIONS,
+    DatasetVersion,
+    EmploymentChange,
+    EmploymentData,
+    select_employment_rows
+)
+
+# Table columns in display order, matching `EmploymentData.to_array`
+DATATABLE_COLUMNS = list(EMPLOYMENT_COLUMNS.values())
+
+# Page sizes are capped so a single request cannot pull the whole table
+DEFAULT_PAGE_LENGTH = 10
+MAX_PAGE_LENGTH = 1000
+
+# Rows fetched per batch when exporting the table
+EXPORT_BATCH_SIZE = 1000
+
+# Columns with more distinct values than this get a text filter instead of a
+# dropdown in the table footer
+FILTER_OPTION_LIMIT = 200
+
+# Largest number of operations accepted in one batch of changes
+MAX_BATCH_OPERATIONS = 1000
+
+
+def _int_arg(args, name, default):
+    """Return an integer request argument, or the default if it is invalid."""
+    try:
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_datatable_request(args):
+    """
+    Parse the query string sent by DataTables in server-side mode.
+
+    Parameters
+    ----------
+    args : werkzeug.datastructures.MultiDict
+        The request arguments.
+
+    Returns
+    -------
+    dict
+        The draw counter, paging window, ordering, global search value and
+        per-column search values.
+    """
+    length = _int_arg(args, 'length', DEFAULT_PAGE_LENGTH)
+    if length < 1 or length > MAX_PAGE_LENGTH:
+        # DataTables sends -1 for "all rows", which is capped as well
+        length = MAX_PAGE_LENGTH
+
+    order = []
+    i = 0
+    while f'order[{i}][column]' in args:
+        column = _int_arg(args, f'order[{i}][column]', -1)
+        if 0 <= column < len(DATATABLE_COLUMNS):
+            descending = args.get(f'order[{i}][dir]') == 'desc'
+            order.append((column, descending))
+        i += 1
+
+    column_search = {}
+    for column in range(len(DATATABLE_COLUMNS)):
+        value = args.get(f'columns[{column}][search][value]', '')
+        if value:
+            column_search[column] = value
+
+    return {
+        'draw': _int_arg(args, 'draw', 0),
+        'start': max(_int_arg(args, 'start', 0), 0),
+        'length': length,
+        'order': order,
+        'search': args.get('search[value]', '').strip(),
+        'column_search': column_search
+    }
+
+
+def apply_datatable_filters(statement, search, column_search):
+    """
+    Restrict a select to the rows matching the datatable searches.
+
+    The global search matches any column containing the value; column
+    searches come from the footer filters and match values exactly.
+
+    Parameters
+    ----------
+    statement : sqlalchemy.Select
+        The statement to filter.
+    search : str
+        The global search value (ignored when empty).
+    column_search : dict
+        Exact values keyed by column index.
+
+    Returns
+    -------
+    sqlalchemy.Select
+        The filtered statement.
+    """
+    if search:
+        statement = statement.where(or_(*(
+            cast(column, String).contains(search, autoescape=True)
+            for column in DATATABLE_COLUMNS
+        )))
+    for index, value in column_search.items():
+        statement = statement.where(DATATABLE_COLUMNS[index] == value)
+    return statement
+
+
+def datatable_page(session, args):
+    """
+    Build the response to a DataTables server-side processing request.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    args : werkzeug.datastructures.MultiDict
+        The request arguments sent by DataTables.
+
+    Returns
+    -------
+    dict
+        The draw counter, the data version the page was read at, total and
+        filtered row counts and the rows of the requested page as arrays,
+        each followed by the row's `DataID`.
+    """
+    params = parse_datatable_request(args)
+
+    version = DatasetVersion.current(session)
+    records_total = session.scalar(
+        select(func.count()).select_from(EmploymentData)
+    )
+    filtered = apply_datatable_filters(
+        select_employment_rows(EmploymentData.DataID),
+        params['search'],
+        params['column_search']
+    )
+    if params['search'] or params['column_search']:
+        records_filtered = session.scalar(
+            select(func.count()).select_from(filtered.subquery())
+        )
+    else:
+        records_filtered = records_total
+
+    # Each row ends with its DataID, which edits and deletes are keyed on
+    page = apply_datatable_filters(
+        select_employment_rows(*DATATABLE_COLUMNS, EmploymentData.DataID),
+        params['search'],
+        params['column_search']
+    )
+    order_by = [
+        DATATABLE_COLUMNS[column].desc() if descending
+        else DATATABLE_COLUMNS[column].asc()
+        for column, descending in params['order']
+    ]
+    # The primary key breaks ties so pages never overlap or skip rows
+    page = page.order_by(*order_by, EmploymentData.DataID)
+    page = page.limit(params['length']).offset(params['start'])
+
+    return {
+        'draw': params['draw'],
+        'version': version,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': [list(row) for row in session.execute(page)]
+    }
+
+
+def datatable_rows(session, data_ids):
+    """
+    Return rows as `datatable_page` sends them, looked up by DataID.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    data_ids : list
+        The DataIDs of the rows. Rows that no longer exist are left out.
+
+    Returns
+    -------
+    list
+        The rows as arrays, each followed by its `DataID`, in DataID order.
+    """
+    if not data_ids:
+        return []
+    rows = session.execute(
+        select_employment_rows(*DATATABLE_COLUMNS, EmploymentData.DataID)
+        .where(EmploymentData.DataID.in_(data_ids))
+        .order_by(EmploymentData.DataID)
+    )
+    return [list(row) for row in rows]
+
+
+def datatable_changes(session, since):
+    """
+    Return the rows changed since a data version, from the change log.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    since : int
+        The data version the client last saw.
+
+    Returns
+    -------
+    dict
+        The current `version`; `reset`, True when the changes are not known
+        (the client is too far behind, or rows were imported) and the client
+        should reload what it shows; otherwise the current `rows` that were
+        added or edited, as in `datatable_rows`, and the DataIDs `deleted`.
+    """
+    version = DatasetVersion.current(session)
+    response = {'version': version, 'reset': False, 'rows': [], 'deleted': []}
+    if since == version:
+        return response
+    if since > version or since < version - CHANGE_LOG_VERSIONS:
+        response['reset'] = True
+        return response
+
+    # Keep the last action on each row
+    latest = {}
+    for data_id, action in session.execute(
+        select(EmploymentChange.DataID, EmploymentChange.Action)
+        .where(EmploymentChange.Version > since)
+        .order_by(EmploymentChange.ChangeID)
+    ):
+        if action == 'reset':
+            response['reset'] = True
+            return response
+        latest[data_id] = action
+
+    response['rows'] = datatable_rows(session, [
+        data_id for data_id, action in latest.items() if action == 'update'
+    ])
+    response['deleted'] = [
+        data_id for data_id, action in latest.items() if action == 'delete'
+    ]
+    return response
+
+
+def datatable_filter_options(session):
+    """
+    Return the values offered by each footer filter of the datatable.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+
+    Returns
+    -------
+    list
+        One entry per column: the sorted distinct values, or None when the
+        column has more than `FILTER_OPTION_LIMIT` of them.
+    """
+    options = []
+    for column in DATATABLE_COLUMNS:
+        values = session.scalars(
+            select_employment_rows(column).distinct().order_by(column)
+            .limit(FILTER_OPTION_LIMIT + 1)
+        ).all()
+        options.append(values if len(values) <= FILTER_OPTION_LIMIT else None)
+    return options
+
+
+def employment_table_values(session, rows):
+    """
+    Convert rows keyed by column name to values of the `employment_data`
+    table, swapping text values for their dimension keys.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to look keys up through. New text values are added to
+        their dimension table.
+    rows : list
+        Dicts of column values keyed by `EMPLOYMENT_COLUMNS` names.
+
+    Returns
+    -------
+    list
+        One dict per row keyed by EmploymentData attribute, e.g. `RegionID`
+        instead of `RegionName`.
+    """
+    keys = {
+        column: dimension.keys_for(session, [
+            row[column] for row in rows if row.get(column) is not None
+        ])
+        for column, (dimension, _) in EMPLOYMENT_DIMENSIONS.items()
+    }
+    table_rows = []
+    for row in rows:
+        values = {}
+        for column, value in row.items():
+            if column in EMPLOYMENT_DIMENSIONS:
+                key = EMPLOYMENT_DIMENSIONS[column][1]
+                values[key] = keys[column].get(value)
+            else:
+                values[column] = value
+        table_rows.append(values)
+    return table_rows
+
+
+def apply_datatable_batch(session, operations):
+    """
+    Apply a batch of datatable changes inside the caller's transaction.
+
+    Each operation is a dict with an `op` of 'add', 'edit' or 'delete':
+    an add carries the new row's columns in `row`, an edit the `DataID` of
+    a row and its new column values in `values`, and a delete the `DataID`
+    of a row. Additions are inserted first, then edits and deletions are
+    applied, each kind as a single bulk statement, and the changed rows are
+    logged under a new data version. The caller commits, and should roll
+    back if an IntegrityError is raised.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to apply the changes through.
+    operations : list
+        The operations, in the order the client made them.
+
+    Returns
+    -------
+    tuple
+        One result per operation: a dict with a `status` of 'success', and
+        the `DataID` of the row, or 'error' with an `error` message for
+        operations that were invalid or refer to a missing row. Then the new
+        data version, or None if nothing was changed.
+    """
+    results = [None] * len(operations)
+    adds, edits, deletes = [], [], []
+
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            operation = {}
+        op = operation.get('op')
+        data_id = operation.get('DataID')
+        if op == 'add':
+            row = operation.get('row') or {}
+            missing = [
+                column for column in EMPLOYMENT_COLUMNS
+                if row.get(column) is None
+            ]
+            if missing:
+                results[index] = {
+                    'status': 'error',
+                    'error': f'Missing fields: {", ".join(missing)}'
+                }
+            else:
+                adds.append((index, {
+                    column: row[column] for column in EMPLOYMENT_COLUMNS
+                }))
+        elif op in ('edit', 'delete') and not isinstance(data_id, int):
+            results[index] = {'status': 'error', 'error': 'Missing DataID'}
+        elif op == 'edit':
+            values = {
+                column: value
+                for column, value in (operation.get('values') or {}).items()
+                if column in EMPLOYMENT_COLUMNS
+            }
+            if values:
+                edits.append((index, data_id, values))
+            else:
+                results[index] = {
+                    'status': 'error', 'error': 'No columns to edit'
+                }
+        elif op == 'delete':
+            deletes.append((index, data_id))
+        else:
+            results[index] = {
+                'status': 'error', 'error': f'Unknown operation: {op!r}'
+            }
+
+    # Check every referenced row exists with one query
+    referenced = [data_id for _, data_id, _ in edits]
+    referenced += [data_id for _, data_id in deletes]
+    existing = set(session.scalars(
+        select(EmploymentData.DataID)
+        .where(EmploymentData.DataID.in_(referenced))
+    )) if referenced else set()
+    for index, data_id in [(i, d) for i, d, _ in edits] + deletes:
+        results[index] = (
+            {'status': 'success', 'DataID': data_id} if data_id in existing
+            else {'status': 'error', 'error': 'Record not found'}
+        )
+    edits = [edit for edit in edits if edit[1] in existing]
+    deletes = [item for item in deletes if item[1] in existing]
+
+    new_ids = []
+    if adds:
+        # SQLite gives rows inserted in one statement increasing DataIDs in
+        # parameter order, so sorting the returned ids matches them to the
+        # rows without giving up the multi-row INSERT
+        new_ids = sorted(session.scalars(
+            insert(EmploymentData).returning(EmploymentData.DataID),
+            employment_table_values(session, [row for _, row in adds])
+        ))
+        for (index, _), data_id in zip(adds, new_ids):
+            results[index] = {'status': 'success', 'DataID': data_id}
+    if edits:
+        table_values = employment_table_values(
+            session, [values for _, _, values in edits]
+        )
+        # A bulk UPDATE by primary key, grouped by the columns each sets
+        session.execute(update(EmploymentData), [
+            {'DataID': data_id, **values}
+            for (_, data_id, _), values in zip(edits, table_values)
+        ])
+    if deletes:
+        session.execute(
+            delete(EmploymentData).where(
+                EmploymentData.DataID.in_([data_id for _, data_id in deletes])
+            )
+        )
+
+    version = None
+    if adds or edits or deletes:
+        version = DatasetVersion.bump(
+            session,
+            updated=new_ids + [data_id for _, data_id, _ in edits],
+            deleted=[data_id for _, data_id in deletes]
+        )
+    return results, version
+
+
+def iter_export_batches(session, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Iterate over every EmploymentData row in batches, in primary key order.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    batch_size : int, optional
+        Number of rows fetched from the cursor at a time.
+
+    Yields
+    ------
+    list
+        A batch of rows, each a tuple in `export_header` order.
+    """
+    statement = (
+        select_employment_rows(EmploymentData.DataID, *DATATABLE_COLUMNS)
+        .order_by(EmploymentData.DataID)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in session.execute(statement).partitions():
+        yield partition
+
+
+def export_header():
+    """Return the column names written at the top of an export."""
+    return ['DataID', *EMPLOYMENT_COLUMNS]
+
+
+def stream_csv_export(session, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Generate the EmploymentData table as CSV, one chunk per batch of rows.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    batch_size : int, optional
+        Number of rows written per chunk.
+
+    Yields
+    ------
+    str
+        The header line first, then the CSV text of each batch of rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    writer.writerow(export_header())
+    yield buffer.getvalue()
+
+    for batch in iter_export_batches(session, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def write_xlsx_export(session, file, batch_size=EXPORT_BATCH_SIZE,
+                      progress=None):
+    """
+    Write the EmploymentData table to an XLSX workbook in constant memory.
+
+    The workbook is built in openpyxl's write-only mode, which streams each
+    row to disk instead of keeping the sheet in memory.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    file : str or file-like
+        Destination of the workbook, e.g. a temporary file.
+    batch_size : int, optional
+        Number of rows fetched from the cursor at a time.
+    progress : callable, optional
+        Called with the number of rows written so far after each batch.
+
+    Returns
+    -------
+    int
+        The number of data rows written.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+
+    header = []
+    for name in export_header():
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
+
+    rows_written = 0
+    for batch in iter_export_batches(session, batch_size):
+        for row in batch:
+            sheet.append(tuple(row))
+        rows_written += len(batch)
+        if progress:
+            progress(rows_written)
+
+    workbook.save(file)
+    return rows_written
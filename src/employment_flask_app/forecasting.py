@@ -0,0 +1,179 @@
+"""
+Local employment forecasts.
+
+The prediction prompt asks the model for a linear trend fitted separately
+for males and females, with the margin of error taken as the average of past
+values. `linear_forecast` computes exactly that with NumPy, for any number
+of (region, occupation type, gender) series at once: the series are
+numbered with `pandas.factorize`, the least-squares slope and intercept of
+every series come from per-series sums taken with `numpy.bincount`, and the
+forecast years are filled in with one broadcast.
+
+Forecasts are rounded as the prompt asks: percentages to 2 decimal places
+with round-half-to-even, as `numpy.round` does, and coordinates to 6.
+"""
+import numpy as np
+import pandas as pd
+
+# Columns of a forecast, in the order the model is asked to return them
+FORECAST_COLUMNS = [
+    'RegionName', 'Year', 'Gender', 'OccupationType', 'EmploymentPercentage',
+    'MarginofErrorPercentage', 'Longitude', 'Latitude'
+]
+
+# Columns identifying one series of a forecast
+SERIES_COLUMNS = ['RegionName', 'OccupationType', 'Gender']
+
+
+def linear_forecast(history, years):
+    """
+    Forecast every series of historical rows with a least-squares trend.
+
+    Parameters
+    ----------
+    history : pandas.DataFrame
+        Historical rows with the `FORECAST_COLUMNS`. Rows are grouped into
+        series by region, occupation type and gender.
+    years : sequence of int
+        The years to forecast.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per series and year with the `FORECAST_COLUMNS`, ordered by
+        series and then year. Percentages are never below zero; a series
+        with a single year of history is forecast flat. The margin of error
+        is the mean of the series' past margins, and the coordinates are
+        those of its latest year.
+    """
+    years = np.asarray(years, dtype=int)
+    if history.empty or not len(years):
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    # Number the series by combining the sorted codes of their columns,
+    # then sum each one's terms with bincount
+    combined = np.zeros(len(history), dtype=np.int64)
+    labels = []
+    for column in SERIES_COLUMNS:
+        column_codes, values = pd.factorize(history[column], sort=True)
+        combined = combined * len(values) + column_codes
+        labels.append(values)
+    series_keys, codes = np.unique(combined, return_inverse=True)
+    n_series = len(series_keys)
+    # Recover the column values of each series from its combined code
+    series = {}
+    for column, values in zip(reversed(SERIES_COLUMNS), reversed(labels)):
+        series_keys, column_codes = np.divmod(series_keys, len(values))
+        series[column] = np.asarray(values)[column_codes]
+    counts = np.bincount(codes, minlength=n_series)
+
+    def series_sums(values):
+        return np.bincount(codes, weights=values, minlength=n_series)
+
+    # Measure years from the first one, so the sums stay small
+    history_years = history['Year'].to_numpy()
+    origin = history_years.min()
+    x = (history_years - origin).astype(float)
+    y = history['EmploymentPercentage'].to_numpy(dtype=float)
+    mean_x = series_sums(x) / counts
+    mean_y = series_sums(y) / counts
+    variance = series_sums(x * x) / counts - mean_x ** 2
+    covariance = series_sums(x * y) / counts - mean_x * mean_y
+    # A series observed in one year only has no trend
+    flat = variance <= 1e-12
+    slope = np.divide(
+        covariance, variance, out=np.zeros_like(covariance), where=~flat
+    )
+    intercept = mean_y - slope * mean_x
+
+    # Fill in every year of every series at once
+    percentages = (
+        intercept[:, None] + slope[:, None] * (years - origin)[None, :]
+    )
+
+    margins = series_sums(
+        history['MarginofErrorPercentage'].to_numpy(dtype=float)
+    ) / counts
+    # The latest row of each series is the last one once sorted by series
+    # and year
+    order = np.lexsort((history_years, codes))
+    latest = order[np.cumsum(counts) - 1]
+    longitudes = history['Longitude'].to_numpy(dtype=float)[latest]
+    latitudes = history['Latitude'].to_numpy(dtype=float)[latest]
+
+    n_years = len(years)
+    forecast = pd.DataFrame({
+        'RegionName': np.repeat(series['RegionName'], n_years),
+        'Year': np.tile(years, n_series),
+        'Gender': np.repeat(series['Gender'], n_years),
+        'OccupationType': np.repeat(series['OccupationType'], n_years),
+        'EmploymentPercentage': np.round(
+            np.clip(percentages, 0, None).ravel(), 2
+        ),
+        'MarginofErrorPercentage': np.round(np.repeat(margins, n_years), 2),
+        'Longitude': np.round(np.repeat(longitudes, n_years), 6),
+        'Latitude': np.round(np.repeat(latitudes, n_years), 6)
+    })
+    return forecast[FORECAST_COLUMNS]
+
+
+def forecast_table(forecast):
+    """
+    Return a forecast as a Markdown table.
+
+    Parameters
+    ----------
+    forecast : pandas.DataFrame
+        Forecast rows with the `FORECAST_COLUMNS`.
+
+    Returns
+    -------
+    str
+        The table, with a header row and one line per forecast row.
+    """
+    lines = [
+        '| ' + ' | '.join(FORECAST_COLUMNS) + ' |',
+        '|' + '---|' * len(FORECAST_COLUMNS)
+    ]
+    lines += [
+        '| ' + ' | '.join(str(value) for value in row) + ' |'
+        for row in forecast[FORECAST_COLUMNS].itertuples(index=False)
+    ]
+    return '\n'.join(lines)
+
+
+def forecast_summary(forecast, region, occupation_type, reason=None):
+    """
+    Return a Markdown account of a local forecast, for when the model has
+    not written one.
+
+    Parameters
+    ----------
+    forecast : pandas.DataFrame
+        Forecast rows of one region and occupation type.
+    region : str
+        The region forecast.
+    occupation_type : str
+        The occupation type forecast.
+    reason : str, optional
+        Why the model's account is missing, shown to the user.
+
+    Returns
+    -------
+    str
+        A short description of the method followed by the forecast table.
+    """
+    text = (
+        f'Forecast for {region} ({occupation_type}), computed locally.\n\n'
+    )
+    if reason:
+        text += f'The prediction model was unavailable: {reason}\n\n'
+    text += (
+        '**Trend Analysis & Forecasting Method**\n\n'
+        'A linear trend was fitted by least squares to the historical '
+        'employment percentages, separately for males and females. The '
+        'margin of error is the average of the past margins of error.\n\n'
+        '**Final Forecast Table**\n\n'
+        f'{forecast_table(forecast)}\n'
+    )
+    return text
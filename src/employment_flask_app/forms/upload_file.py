@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import FileField, SubmitField
+from wtforms import FileField, SelectField, SubmitField
 from wtforms.validators import ValidationError, InputRequired
 
 
@@ -18,5 +18,15 @@ def check_file_extension(form, file_field):
 class UploadFileForm(FlaskForm):
     # File field with input required and custom file extension validator
     file = FileField("File", [InputRequired(), check_file_extension])
+    # How rows that already exist in the database are handled
+    on_duplicate = SelectField(
+        "Existing rows",
+        choices=[
+            ('ignore', 'Skip rows that already exist'),
+            ('update', 'Update rows that already exist'),
+            ('reject', 'Reject the file if any row already exists')
+        ],
+        default='ignore'
+    )
     # Submit button for the form
     submit = SubmitField("Upload File")
@@ -0,0 +1,142 @@
+"""
+Reusable Gemini clients, one per API key.
+
+Every `genai.Client` opens its own HTTP connection pool, so building one per
+prediction repeats the client setup and the TCP and TLS handshakes with the
+API on every request. The app keeps its clients in a `GenaiClientRegistry`
+instead and hands the same client to every prediction made with the same
+key, the server's `GENAI_API_KEY` or a visitor's own key from their session.
+
+Clients are keyed on a SHA-256 hash of the key, so the registry's keys do
+not reveal the API keys. At most `GENAI_CLIENT_CACHE_SIZE` clients are kept;
+the least recently used is dropped to make room, and clients unused for
+`GENAI_CLIENT_IDLE_TIMEOUT` seconds are dropped on the next handout.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from google import genai
+
+# Largest number of clients kept by each app process
+DEFAULT_GENAI_CLIENT_CACHE_SIZE = 32
+
+# Seconds a client may go unused before it is dropped
+DEFAULT_GENAI_CLIENT_IDLE_TIMEOUT = 10 * 60
+
+
+def api_key_hash(api_key):
+    """Return the registry key of an API key (None for the default key)."""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+
+
+class GenaiClientRegistry:
+    """Thread-safe LRU of Gemini clients keyed on a hash of their API key.
+
+    Parameters
+    ----------
+    max_clients : int, optional
+        Largest number of clients kept.
+    idle_timeout : float, optional
+        Seconds a client may go unused before it is dropped.
+    factory : callable, optional
+        Builds a client from an API key (default `genai.Client`).
+    clock : callable, optional
+        Returns the current time in seconds (default `time.monotonic`).
+    """
+
+    def __init__(self, max_clients=DEFAULT_GENAI_CLIENT_CACHE_SIZE,
+                 idle_timeout=DEFAULT_GENAI_CLIENT_IDLE_TIMEOUT,
+                 factory=None, clock=time.monotonic):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.factory = factory or (
+            lambda api_key: genai.Client(api_key=api_key)
+        )
+        self.clock = clock
+        # Hashed API key -> (client, time last handed out), oldest first
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+    def get(self, api_key):
+        """
+        Return the client of an API key, building it on first use.
+
+        Parameters
+        ----------
+        api_key : str or None
+            The API key. Calls with the same key share one client.
+
+        Returns
+        -------
+        object
+            The client built by the registry's factory.
+        """
+        key = api_key_hash(api_key)
+        with self._lock:
+            now = self.clock()
+            self._drop_idle(now)
+            if key in self._clients:
+                client, _ = self._clients.pop(key)
+                self._clients[key] = (client, now)
+                return client
+
+        # Build outside the lock so other keys are not held up; if another
+        # thread built the same client meanwhile, theirs is used
+        client = self.factory(api_key)
+        with self._lock:
+            if key in self._clients:
+                client, _ = self._clients.pop(key)
+            self._clients[key] = (client, self.clock())
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return client
+
+    def clear(self):
+        """Drop every client."""
+        with self._lock:
+            self._clients.clear()
+
+    def _drop_idle(self, now):
+        # Entries are ordered by last use, so the idle ones come first
+        while self._clients:
+            _, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            self._clients.popitem(last=False)
+
+
+def get_genai_client_registry(app):
+    """
+    Return the app's Gemini client registry, creating it once.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application.
+
+    Returns
+    -------
+    GenaiClientRegistry
+        The app's registry.
+    """
+    registry = app.extensions.get('genai_clients')
+    if registry is None:
+        registry = app.extensions.setdefault(
+            'genai_clients',
+            GenaiClientRegistry(
+                max_clients=app.config.get(
+                    'GENAI_CLIENT_CACHE_SIZE', DEFAULT_GENAI_CLIENT_CACHE_SIZE
+                ),
+                idle_timeout=app.config.get(
+                    'GENAI_CLIENT_IDLE_TIMEOUT',
+                    DEFAULT_GENAI_CLIENT_IDLE_TIMEOUT
+                )
+            )
+        )
+    return registry
@@ -0,0 +1,193 @@
+"""
+Background imports for large employment data uploads.
+
+An upload is saved to the instance folder and recorded as an `ImportJob`,
+then handed to a thread pool owned by the app, so the request returns as soon
+as the file is on disk. The worker reads the file in chunks, inserts them and
+records its progress on the job row, which `/datatable/import/<job_id>`
+reports to the datatable page. No external broker is needed: the queue lives
+in the app's process and the jobs table in its database.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from employment_flask_app import db
+from employment_flask_app.models import EmploymentData, ImportJob
+from employment_flask_app.route_functions import (
+    insert_new_employment_chunks,
+    read_employment_file,
+    upsert_employment_chunks
+)
+
+# Number of imports run at the same time by each app process
+DEFAULT_IMPORT_WORKERS = 1
+
+
+def get_import_executor(app):
+    """
+    Return the thread pool that runs the app's imports, creating it once.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application.
+
+    Returns
+    -------
+    concurrent.futures.ThreadPoolExecutor
+        The app's import executor.
+    """
+    executor = app.extensions.get('import_jobs')
+    if executor is None:
+        executor = app.extensions.setdefault(
+            'import_jobs',
+            ThreadPoolExecutor(
+                max_workers=app.config.get(
+                    'IMPORT_WORKERS', DEFAULT_IMPORT_WORKERS
+                ),
+                thread_name_prefix='import-job'
+            )
+        )
+    return executor
+
+
+def enqueue_import(file, on_conflict):
+    """
+    Save an uploaded file and queue it for import.
+
+    Parameters
+    ----------
+    file : werkzeug.datastructures.FileStorage
+        The uploaded CSV or XLSX file.
+    on_conflict : str
+        How rows that already exist are handled: 'ignore', 'update' or
+        'reject' (see `insert_employment_chunks`).
+
+    Returns
+    -------
+    tuple
+        The id of the new ImportJob and the `concurrent.futures.Future` of
+        its run, which resolves to the job id once the import has finished.
+    """
+    app = current_app._get_current_object()
+
+    job = ImportJob(FileName=file.filename, OnConflict=on_conflict)
+    db.session.add(job)
+    db.session.flush()
+
+    upload_dir = os.path.join(app.instance_path, 'imports')
+    os.makedirs(upload_dir, exist_ok=True)
+    extension = os.path.splitext(file.filename)[1]
+    path = os.path.join(upload_dir, f'{job.JobID}{extension}')
+    file.save(path)
+    db.session.commit()
+
+    future = get_import_executor(app).submit(
+        run_import_job, app, job.JobID, path
+    )
+    return job.JobID, future
+
+
+def run_import_job(app, job_id, path):
+    """
+    Import a saved upload and record the outcome on its ImportJob.
+
+    In 'ignore' and 'update' mode every chunk is committed on its own, so
+    progress is visible while the file is imported and a failure keeps the
+    chunks already stored. In 'reject' mode the whole file is one
+    transaction and the counts are only recorded at the end.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application, whose context the worker runs in.
+    job_id : int
+        The ImportJob to run.
+    path : str
+        Location of the saved upload. It is deleted once the job has run.
+
+    Returns
+    -------
+    int
+        The job id.
+    """
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        file_name, on_conflict = job.FileName, job.OnConflict
+        update_job(job_id, Status='running')
+
+        totals = {
+            'RowsParsed': 0,
+            'RowsInserted': 0,
+            'RowsUpdated': 0,
+            'RowsRejected': 0
+        }
+        status, error = 'completed', None
+        try:
+            chunks = read_employment_file(path, file_name)
+            if on_conflict in ('ignore', 'update'):
+                for chunk in chunks:
+                    counts = upsert_employment_chunks(
+                        [chunk], db, EmploymentData, on_conflict=on_conflict
+                    )
+                    totals['RowsParsed'] += len(chunk)
+                    totals['RowsInserted'] += counts['inserted']
+                    totals['RowsUpdated'] += counts['updated']
+                    totals['RowsRejected'] += counts['skipped']
+                    update_job(job_id, **totals)
+            else:
+                parsed = []
+
+                def counted(chunks):
+                    for chunk in chunks:
+                        parsed.append(len(chunk))
+                        yield chunk
+
+                try:
+                    totals['RowsInserted'] = insert_new_employment_chunks(
+                        counted(chunks), db, EmploymentData
+                    )
+                except IntegrityError:
+                    totals['RowsRejected'] = sum(parsed)
+                    raise
+                finally:
+                    totals['RowsParsed'] = sum(parsed)
+        except IntegrityError:
+            db.session.rollback()
+            status = 'failed'
+            error = (
+                'A row already exists or has missing or invalid values; '
+                'nothing was stored from that batch.'
+            )
+        except Exception as e:
+            db.session.rollback()
+            status, error = 'failed', str(e)[:500]
+            app.logger.exception('Import job %s failed', job_id)
+        finally:
+            update_job(job_id, Status=status, Error=error, **totals)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return job_id
+
+
+def update_job(job_id, **values):
+    """
+    Set columns of an ImportJob and commit them so pollers can see them.
+
+    Parameters
+    ----------
+    job_id : int
+        The ImportJob to update.
+    **values
+        New values keyed by column name.
+    """
+    job = db.session.get(ImportJob, job_id)
+    for column, value in values.items():
+        setattr(job, column, value)
+    db.session.commit()
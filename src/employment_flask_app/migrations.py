@@ -0,0 +1,120 @@
+"""
+Schema upgrades for databases created by older versions of the app.
+
+Tables are created with `db.create_all`, which never changes a table that
+already exists. Upgrades that change the layout of an existing table are
+applied here when the app starts, and do nothing once a database is current.
+"""
+from sqlalchemy import MetaData, Table, inspect, insert, select
+
+from employment_flask_app.models import (
+    EMPLOYMENT_DIMENSIONS,
+    EmploymentData
+)
+
+
+def upgrade_employment_dimensions(connection):
+    """
+    Move EmploymentData's text columns into dimension tables.
+
+    Older databases store `RegionName`, `Gender` and `OccupationType` as text
+    on every row. This fills the dimension tables with their distinct values
+    and rebuilds `employment_data` with integer keys, keeping every `DataID`.
+
+    Parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Connection to the database, inside a transaction.
+
+    Returns
+    -------
+    bool
+        True if the table was migrated, False if it was already current or
+        does not exist yet.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table(EmploymentData.__tablename__):
+        return False
+    columns = {
+        column['name']
+        for column in inspector.get_columns(EmploymentData.__tablename__)
+    }
+    if 'RegionName' not in columns:
+        return False
+
+    # Give every distinct text value a key
+    legacy = Table(
+        EmploymentData.__tablename__, MetaData(), autoload_with=connection
+    )
+    for column, (dimension, _) in EMPLOYMENT_DIMENSIONS.items():
+        dimension.__table__.create(connection, checkfirst=True)
+        connection.execute(
+            insert(dimension.__table__)
+            .prefix_with('OR IGNORE')
+            .from_select(
+                [dimension.value_name],
+                select(legacy.c[column]).distinct()
+            )
+        )
+
+    # Move the old table aside so the new one can take its name
+    legacy_name = f'{EmploymentData.__tablename__}_legacy'
+    connection.exec_driver_sql(
+        f'ALTER TABLE {EmploymentData.__tablename__} RENAME TO {legacy_name}'
+    )
+    legacy = Table(legacy_name, MetaData(), autoload_with=connection)
+
+    # Copy the rows across, swapping the text values for their keys
+    EmploymentData.__table__.create(connection)
+    copied = select(legacy)
+    targets = []
+    for column in legacy.columns:
+        if column.name in EMPLOYMENT_DIMENSIONS:
+            dimension, key = EMPLOYMENT_DIMENSIONS[column.name]
+            copied = copied.join(
+                dimension,
+                dimension.value_column() == column
+            )
+            targets.append((key, dimension.key_column()))
+        else:
+            targets.append((column.name, column))
+    connection.execute(
+        insert(EmploymentData.__table__).from_select(
+            [name for name, _ in targets],
+            copied.with_only_columns(*(source for _, source in targets))
+        )
+    )
+    legacy.drop(connection)
+    return True
+
+
+def create_employment_indexes(connection):
+    """
+    Create any EmploymentData index missing from an existing table.
+
+    `db.create_all` only creates indexes along with their table, so indexes
+    added to the model later are created here.
+
+    Parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Connection to the database, inside a transaction.
+
+    Returns
+    -------
+    list
+        Names of the indexes that were created.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table(EmploymentData.__tablename__):
+        return []
+    existing = {
+        index['name']
+        for index in inspector.get_indexes(EmploymentData.__tablename__)
+    }
+    created = []
+    for index in EmploymentData.__table__.indexes:
+        if index.name not in existing:
+            index.create(connection)
+            created.append(index.name)
+    return created
@@ -1,31 +1,224 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from sqlalchemy import ForeignKey, Integer, String, Float, UniqueConstraint
+from sqlalchemy import (
+    DateTime, ForeignKey, Index, Integer, String, Float, Text,
+    UniqueConstraint, delete, func, insert, select, update
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import operators
 from employment_flask_app import db
 
 
+class DimensionMixin:
+    """Lookup table giving each distinct text value a small integer key.
+
+    Subclasses name their key and value columns in `key_name` and
+    `value_name`.
+    """
+    key_name = None
+    value_name = None
+
+    @classmethod
+    def key_column(cls):
+        return getattr(cls, cls.key_name)
+
+    @classmethod
+    def value_column(cls):
+        return getattr(cls, cls.value_name)
+
+    @classmethod
+    def keys_for(cls, session, values):
+        """Return {value: key} for the values, adding any that are new."""
+        values = list(dict.fromkeys(values))
+        if not values:
+            return {}
+        with session.no_autoflush:
+            # INSERT OR IGNORE keeps concurrent writers from racing
+            session.execute(
+                sqlite_insert(cls).on_conflict_do_nothing(),
+                [{cls.value_name: value} for value in values]
+            )
+            rows = session.execute(
+                select(cls.value_column(), cls.key_column())
+                .where(cls.value_column().in_(values))
+            ).all()
+        return dict(rows)
+
+    @classmethod
+    def named(cls, session, value):
+        """Return the row for a value, adding it if it is new."""
+        if value is None:
+            return None
+        return session.get(cls, cls.keys_for(session, [value])[value])
+
+
+class RegionDimension(DimensionMixin, db.Model):
+    __tablename__ = "region"
+    key_name = 'RegionID'
+    value_name = 'RegionName'
+    RegionID: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    RegionName: Mapped[str] = mapped_column(
+        String(50), nullable=False, unique=True
+    )
+
+
+class GenderDimension(DimensionMixin, db.Model):
+    __tablename__ = "gender"
+    key_name = 'GenderID'
+    value_name = 'GenderName'
+    GenderID: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    GenderName: Mapped[str] = mapped_column(
+        String(50), nullable=False, unique=True
+    )
+
+
+class OccupationTypeDimension(DimensionMixin, db.Model):
+    __tablename__ = "occupation_type"
+    key_name = 'OccupationTypeID'
+    value_name = 'OccupationTypeName'
+    OccupationTypeID: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True
+    )
+    OccupationTypeName: Mapped[str] = mapped_column(
+        String(50), nullable=False, unique=True
+    )
+
+
+class DimensionComparator(Comparator):
+    """SQL behaviour of a text attribute stored as a dimension key.
+
+    Equality and `in_` look the value up in the dimension table first, so
+    the comparison on the fact table is on the integer key. Other uses, such
+    as selecting or ordering, see the text value.
+    """
+
+    def __init__(self, foreign_key, dimension):
+        super().__init__(foreign_key)
+        self.foreign_key = foreign_key
+        self.dimension = dimension
+
+    def __clause_element__(self):
+        return (
+            select(self.dimension.value_column())
+            .where(self.dimension.key_column() == self.foreign_key)
+            .scalar_subquery()
+        )
+
+    def keys_where(self, condition):
+        return select(self.dimension.key_column()).where(condition)
+
+    def operate(self, op, *other, **kwargs):
+        value = self.dimension.value_column()
+        if op is operators.eq:
+            return self.foreign_key == (
+                self.keys_where(value == other[0]).scalar_subquery()
+            )
+        if op is operators.in_op:
+            return self.foreign_key.in_(self.keys_where(value.in_(other[0])))
+        return op(self.__clause_element__(), *other, **kwargs)
+
+
 class EmploymentData(db.Model):
+    """One employment figure.
+
+    Region, gender and occupation type are stored as integer keys into their
+    dimension tables. `RegionName`, `Gender` and `OccupationType` read and
+    write the text values, and can be used in `filter_by` and comparisons,
+    which match on the keys.
+    """
     __tablename__ = "employment_data"
     DataID: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    RegionName: Mapped[str] = mapped_column(String(50), nullable=False)
+    RegionID: Mapped[int] = mapped_column(
+        ForeignKey('region.RegionID'), nullable=False
+    )
     Year: Mapped[int] = mapped_column(Integer, nullable=False)
-    Gender: Mapped[str] = mapped_column(String(50), nullable=False)
-    OccupationType: Mapped[str] = mapped_column(String(50), nullable=False)
+    GenderID: Mapped[int] = mapped_column(
+        ForeignKey('gender.GenderID'), nullable=False
+    )
+    OccupationTypeID: Mapped[int] = mapped_column(
+        ForeignKey('occupation_type.OccupationTypeID'), nullable=False
+    )
     EmploymentPercentage: Mapped[float] = mapped_column(Float, nullable=False)
     MarginofErrorPercentage: Mapped[float] = mapped_column(
         Float, nullable=False
     )
     Longitude: Mapped[float] = mapped_column(Float, nullable=False)
     Latitude: Mapped[float] = mapped_column(Float, nullable=False)
+    RegionDimension: Mapped["RegionDimension"] = relationship(
+        lazy='joined', innerjoin=True
+    )
+    GenderDimension: Mapped["GenderDimension"] = relationship(
+        lazy='joined', innerjoin=True
+    )
+    OccupationTypeDimension: Mapped["OccupationTypeDimension"] = relationship(
+        lazy='joined', innerjoin=True
+    )
 
     __table_args__ = (
-        UniqueConstraint('RegionName', 'Year', 'Gender', 'OccupationType',
+        UniqueConstraint('RegionID', 'Year', 'GenderID', 'OccupationTypeID',
                          'EmploymentPercentage', 'MarginofErrorPercentage',
                          'Longitude', 'Latitude',
                          name='unique_employment_data'),
+        # `predict_employment_data` filters by region and occupation type.
+        # Its index carries every column, so matches are read from the index
+        # alone; it also serves the dashboard's (region, year) and (year,
+        # occupation) lookups and `edit_row` / `delete_row`, as the dimension
+        # tables are small enough for SQLite to seek it once per key.
+        Index('ix_employment_data_region_occupation',
+              'RegionID', 'OccupationTypeID', 'Year', 'GenderID',
+              'EmploymentPercentage', 'MarginofErrorPercentage',
+              'Longitude', 'Latitude'),
+        # The datatable's default order, so its pages and the percentage
+        # filter options are read in order instead of sorted
+        Index('ix_employment_data_percentage', 'EmploymentPercentage'),
     )
 
+    @hybrid_property
+    def RegionName(self):
+        region = self.RegionDimension
+        return region.RegionName if region else None
+
+    @RegionName.setter
+    def RegionName(self, value):
+        self.RegionDimension = RegionDimension.named(db.session, value)
+
+    @RegionName.comparator
+    def RegionName(cls):
+        return DimensionComparator(cls.RegionID, RegionDimension)
+
+    @hybrid_property
+    def Gender(self):
+        gender = self.GenderDimension
+        return gender.GenderName if gender else None
+
+    @Gender.setter
+    def Gender(self, value):
+        self.GenderDimension = GenderDimension.named(db.session, value)
+
+    @Gender.comparator
+    def Gender(cls):
+        return DimensionComparator(cls.GenderID, GenderDimension)
+
+    @hybrid_property
+    def OccupationType(self):
+        occupation_type = self.OccupationTypeDimension
+        return occupation_type.OccupationTypeName if occupation_type else None
+
+    @OccupationType.setter
+    def OccupationType(self, value):
+        self.OccupationTypeDimension = OccupationTypeDimension.named(
+            db.session, value
+        )
+
+    @OccupationType.comparator
+    def OccupationType(cls):
+        return DimensionComparator(
+            cls.OccupationTypeID, OccupationTypeDimension
+        )
+
     def to_array(self):
         return [
             self.RegionName,
@@ -51,6 +244,280 @@ class EmploymentData(db.Model):
         }
 
 
+# Text columns of EmploymentData and the dimension tables that store them
+EMPLOYMENT_DIMENSIONS = {
+    'RegionName': (RegionDimension, 'RegionID'),
+    'Gender': (GenderDimension, 'GenderID'),
+    'OccupationType': (OccupationTypeDimension, 'OccupationTypeID'),
+}
+
+# SQL expressions for the EmploymentData fields, in `to_array` order, for
+# use with `select_employment_rows`
+EMPLOYMENT_COLUMNS = {
+    'RegionName': RegionDimension.RegionName,
+    'Year': EmploymentData.Year,
+    'Gender': GenderDimension.GenderName,
+    'OccupationType': OccupationTypeDimension.OccupationTypeName,
+    'EmploymentPercentage': EmploymentData.EmploymentPercentage,
+    'MarginofErrorPercentage': EmploymentData.MarginofErrorPercentage,
+    'Longitude': EmploymentData.Longitude,
+    'Latitude': EmploymentData.Latitude,
+}
+
+
+def select_employment_rows(*columns):
+    """Select columns of EmploymentData joined to its dimension tables."""
+    return (
+        select(*columns)
+        .select_from(EmploymentData)
+        .join(EmploymentData.RegionDimension)
+        .join(EmploymentData.GenderDimension)
+        .join(EmploymentData.OccupationTypeDimension)
+    )
+
+
+class DatasetVersion(db.Model):
+    """Single-row counter bumped whenever employment data changes.
+
+    Every process compares its cached copy of the employment table against
+    this counter and reloads only when it has moved on.
+    """
+    __tablename__ = "dataset_version"
+    VersionID: Mapped[int] = mapped_column(primary_key=True)
+    Version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, session):
+        """Return the current data version (0 before the first change)."""
+        version = session.scalar(
+            select(cls.Version).where(cls.VersionID == 1)
+        )
+        return version or 0
+
+    @classmethod
+    def lock(cls, session):
+        """Start writing in the caller's transaction, taking SQLite's lock.
+
+        Other writers wait until the transaction ends, so what the caller
+        reads afterwards cannot change under it.
+        """
+        # INSERT OR IGNORE avoids a race between workers creating the row
+        session.execute(
+            sqlite_insert(cls)
+            .values(VersionID=1, Version=0)
+            .on_conflict_do_nothing()
+        )
+
+    @classmethod
+    def bump(cls, session, updated=None, deleted=None):
+        """Increment the data version inside the caller's transaction.
+
+        The change is logged in `EmploymentChange` under the new version:
+        `updated` are the DataIDs of rows added or edited and `deleted` those
+        of rows removed. When the changed rows are not known, e.g. after an
+        import, both are left as None and a reset is logged instead.
+        Returns the new version.
+        """
+        cls.lock(session)
+        version = session.scalar(
+            update(cls)
+            .where(cls.VersionID == 1)
+            .values(Version=cls.Version + 1)
+            .returning(cls.Version)
+        )
+        EmploymentChange.record(session, version, updated, deleted)
+        return version
+
+
+# Number of data versions whose changes are kept in the change log
+CHANGE_LOG_VERSIONS = 1000
+
+
+class EmploymentChange(db.Model):
+    """A change to EmploymentData, logged under the version that made it.
+
+    Open datatables ask for the changes since the version they last saw and
+    patch the affected rows in place. A change without a DataID is a reset:
+    the rows that changed are not known, so clients reload what they show.
+    Only the last `CHANGE_LOG_VERSIONS` versions are kept.
+    """
+    __tablename__ = "employment_change"
+    ChangeID: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True
+    )
+    Version: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    DataID: Mapped[Optional[int]] = mapped_column(Integer)
+    # 'update' for rows added or edited, 'delete' or 'reset'
+    Action: Mapped[str] = mapped_column(String(10), nullable=False)
+
+    @classmethod
+    def record(cls, session, version, updated=None, deleted=None):
+        """Log the rows changed by a version and drop expired changes."""
+        if updated is None and deleted is None:
+            changes = [{'Version': version, 'DataID': None, 'Action': 'reset'}]
+        else:
+            changes = [
+                {'Version': version, 'DataID': data_id, 'Action': 'update'}
+                for data_id in updated or ()
+            ] + [
+                {'Version': version, 'DataID': data_id, 'Action': 'delete'}
+                for data_id in deleted or ()
+            ]
+        if changes:
+            session.execute(insert(cls), changes)
+        session.execute(
+            delete(cls).where(cls.Version <= version - CHANGE_LOG_VERSIONS)
+        )
+
+
+class ImportJob(db.Model):
+    """A file upload queued for import by a background worker.
+
+    The row is created when the upload is accepted and updated by the worker
+    as it works through the file, so its progress can be polled.
+    """
+    __tablename__ = "import_job"
+    JobID: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    FileName: Mapped[str] = mapped_column(String(255), nullable=False)
+    OnConflict: Mapped[str] = mapped_column(String(20), nullable=False)
+    Status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default='queued'
+    )
+    RowsParsed: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    RowsInserted: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    RowsUpdated: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    RowsRejected: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    Error: Mapped[Optional[str]] = mapped_column(String(500))
+    CreatedAt: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now()
+    )
+    UpdatedAt: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now(),
+        onupdate=func.now()
+    )
+
+    def to_dict(self):
+        return {
+            "JobID": self.JobID,
+            "FileName": self.FileName,
+            "OnConflict": self.OnConflict,
+            "Status": self.Status,
+            "RowsParsed": self.RowsParsed,
+            "RowsInserted": self.RowsInserted,
+            "RowsUpdated": self.RowsUpdated,
+            "RowsRejected": self.RowsRejected,
+            "Error": self.Error,
+            "CreatedAt": self.CreatedAt.isoformat(),
+            "UpdatedAt": self.UpdatedAt.isoformat()
+        }
+
+
+class PredictionJob(db.Model):
+    """A trend prediction queued for a background worker.
+
+    The row is created when the form is submitted and updated by the worker,
+    so the page can poll it for the result. The API key used for the
+    prediction is never stored.
+    """
+    __tablename__ = "prediction_job"
+    JobID: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    RegionName: Mapped[str] = mapped_column(String(100), nullable=False)
+    NoOfYears: Mapped[int] = mapped_column(Integer, nullable=False)
+    OccupationType: Mapped[str] = mapped_column(String(100), nullable=False)
+    AdditionalInfo: Mapped[Optional[str]] = mapped_column(String(600))
+    Status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default='queued'
+    )
+    PredictionResult: Mapped[Optional[str]] = mapped_column(Text)
+    # The forecast DataFrame as a JSON array of records
+    ForecastData: Mapped[Optional[str]] = mapped_column(Text)
+    StartingYear: Mapped[Optional[int]] = mapped_column(Integer)
+    EndYear: Mapped[Optional[int]] = mapped_column(Integer)
+    Error: Mapped[Optional[str]] = mapped_column(String(500))
+    CreatedAt: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now()
+    )
+    UpdatedAt: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now(),
+        onupdate=func.now()
+    )
+
+    def to_dict(self):
+        return {
+            "JobID": self.JobID,
+            "RegionName": self.RegionName,
+            "NoOfYears": self.NoOfYears,
+            "OccupationType": self.OccupationType,
+            "Status": self.Status,
+            "PredictionResult": self.PredictionResult,
+            "StartingYear": self.StartingYear,
+            "EndYear": self.EndYear,
+            "Error": self.Error,
+            "CreatedAt": self.CreatedAt.isoformat(),
+            "UpdatedAt": self.UpdatedAt.isoformat()
+        }
+
+
+class PredictionCacheEntry(db.Model):
+    """A stored trend prediction, keyed on a hash of the model's prompt.
+
+    The prompt holds every input of a prediction, including the historical
+    rows it is based on, so an entry is reused only while those rows are
+    unchanged. Times are seconds since the epoch.
+    """
+    __tablename__ = "prediction_cache"
+    CacheKey: Mapped[str] = mapped_column(String(64), primary_key=True)
+    PredictionResult: Mapped[str] = mapped_column(Text, nullable=False)
+    # The forecast DataFrame as JSON in pandas' 'split' layout, which keeps
+    # the columns of an empty forecast
+    ForecastData: Mapped[str] = mapped_column(Text, nullable=False)
+    StartingYear: Mapped[int] = mapped_column(Integer, nullable=False)
+    EndYear: Mapped[int] = mapped_column(Integer, nullable=False)
+    CreatedAt: Mapped[float] = mapped_column(Float, nullable=False)
+    LastUsedAt: Mapped[float] = mapped_column(
+        Float, nullable=False, index=True
+    )
+    Hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class PredictionCacheStats(db.Model):
+    """Single-row hit, miss and eviction counters of the prediction cache.
+
+    Kept in the database so the counts cover every worker process.
+    """
+    __tablename__ = "prediction_cache_stats"
+    StatsID: Mapped[int] = mapped_column(primary_key=True)
+    Hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    Misses: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    Evictions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def count(cls, session, **increments):
+        """Add to the counters inside the caller's transaction."""
+        # INSERT OR IGNORE avoids a race between workers creating the row
+        session.execute(
+            sqlite_insert(cls)
+            .values(StatsID=1, Hits=0, Misses=0, Evictions=0)
+            .on_conflict_do_nothing()
+        )
+        session.execute(
+            update(cls)
+            .where(cls.StatsID == 1)
+            .values({
+                getattr(cls, name): getattr(cls, name) + amount
+                for name, amount in increments.items()
+            })
+        )
+
+
 class PolicyRecommendation(db.Model):
     __tablename__ = "policy_recommendation"
     PolicyID: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -0,0 +1,331 @@
+"""
+Batch trend forecasts across many regions and occupation types.
+
+Analysts comparing regions want every (region, occupation type) pair at
+once, and one `predict_employment_data` call per pair would repeat its query
+and its model round trip for each of them. `predict_employment_batch` runs
+the same steps over the whole batch instead: the history of every requested
+pair comes from one query, `linear_forecast` forecasts every series in one
+pass, and the model's accounts of the forecasts are requested concurrently.
+The accounts share the prediction cache with single predictions, and a pair
+whose model call fails is described locally, as a single prediction is.
+
+Model calls from every batch of an app process go through one bounded
+semaphore, so batches running at the same time never have more than
+`PREDICTION_BATCH_CONCURRENCY` calls in flight against the API's quota.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import pandas as pd
+from flask import current_app
+from flask.cli import with_appcontext
+
+from employment_flask_app import db
+from employment_flask_app.forecasting import FORECAST_COLUMNS, linear_forecast
+from employment_flask_app.models import (
+    EMPLOYMENT_COLUMNS,
+    EmploymentData,
+    select_employment_rows
+)
+from employment_flask_app.prediction_cache import (
+    get_cached_prediction,
+    prediction_cache_key,
+    store_prediction
+)
+from employment_flask_app.route_functions import (
+    PREDICTION_MODEL_ID,
+    build_prediction_prompt,
+    employment_history_records,
+    generate_prediction,
+    get_model_client,
+    local_prediction_result
+)
+
+# Largest number of model calls in flight at once across all batches of an
+# app process
+DEFAULT_PREDICTION_BATCH_CONCURRENCY = 4
+
+# Largest number of years forecast by one batch, as on the prediction form
+MAX_BATCH_YEARS = 10
+
+
+def _batch_concurrency():
+    return current_app.config.get(
+        'PREDICTION_BATCH_CONCURRENCY', DEFAULT_PREDICTION_BATCH_CONCURRENCY
+    )
+
+
+def get_model_call_semaphore(app):
+    """
+    Return the semaphore bounding the app's batch model calls, creating it
+    once.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application.
+
+    Returns
+    -------
+    threading.BoundedSemaphore
+        The app's semaphore, admitting `PREDICTION_BATCH_CONCURRENCY` calls
+        at once.
+    """
+    semaphore = app.extensions.get('prediction_batch')
+    if semaphore is None:
+        semaphore = app.extensions.setdefault(
+            'prediction_batch',
+            threading.BoundedSemaphore(app.config.get(
+                'PREDICTION_BATCH_CONCURRENCY',
+                DEFAULT_PREDICTION_BATCH_CONCURRENCY
+            ))
+        )
+    return semaphore
+
+
+def batch_employment_history(session, regions=None, occupation_types=None):
+    """
+    Return the history of every requested pair, read with one query.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The database session.
+    regions : list of str, optional
+        The regions to read (default all).
+    occupation_types : list of str, optional
+        The occupation types to read (default all).
+
+    Returns
+    -------
+    dict
+        The prompt records of each (region, occupation type) pair with any
+        history, ordered by pair. Within a pair the records are in the
+        order `predict_employment_data` reads them, so both build the same
+        prompts.
+    """
+    statement = select_employment_rows(
+        *(EMPLOYMENT_COLUMNS[column].label(column)
+          for column in FORECAST_COLUMNS)
+    ).order_by(
+        EmploymentData.Year,
+        EmploymentData.GenderID,
+        EmploymentData.DataID
+    )
+    if regions:
+        statement = statement.where(
+            EMPLOYMENT_COLUMNS['RegionName'].in_(regions)
+        )
+    if occupation_types:
+        statement = statement.where(
+            EMPLOYMENT_COLUMNS['OccupationType'].in_(occupation_types)
+        )
+
+    rows_by_pair = {}
+    for row in session.execute(statement):
+        rows_by_pair.setdefault(
+            (row.RegionName, row.OccupationType), []
+        ).append(row)
+    return {
+        pair: employment_history_records(rows)
+        for pair, rows in sorted(rows_by_pair.items())
+    }
+
+
+def predict_employment_batch(regions=None, occupation_types=None,
+                             no_of_years=1, additional_info=None,
+                             api_key=None, narrative=None):
+    """
+    Forecast many regions and occupation types into one table.
+
+    Parameters
+    ----------
+    regions : list of str, optional
+        The regions to forecast (default all).
+    occupation_types : list of str, optional
+        The occupation types to forecast (default all).
+    no_of_years : int, optional
+        The number of years to forecast.
+    additional_info : str, optional
+        Additional information for the model's prompts.
+    api_key : str, optional
+        A Gemini API key used instead of the server's.
+    narrative : bool, optional
+        Whether to ask the model for an account of each pair's forecast
+        (default the `PREDICTION_NARRATIVE` setting).
+
+    Returns
+    -------
+    tuple
+        The combined forecast of every pair with history, a list of dicts
+        with the `RegionName`, `OccupationType`, `PredictionResult` and
+        `Source` ('model', 'cache' or 'local') of each account, and the
+        first and last years forecast.
+
+    Raises
+    ------
+    ValueError
+        If none of the requested pairs has any history.
+
+    Notes
+    -----
+    Every pair is forecast over the same years, from the year after the
+    latest one in the batch. Forecasts are always made locally, whatever
+    the `PREDICTION_FORECAST` setting of single predictions.
+    """
+    histories = batch_employment_history(
+        db.session, regions, occupation_types
+    )
+    if not histories:
+        raise ValueError(
+            'No employment data for the requested regions and occupation '
+            'types'
+        )
+
+    # Forecast every series of the batch at once
+    records = [record for history in histories.values() for record in history]
+    starting_year = max(record['Year'] for record in records) + 1
+    end_year = starting_year + no_of_years - 1
+    forecast_data = linear_forecast(
+        pd.DataFrame(records, columns=FORECAST_COLUMNS),
+        range(starting_year, end_year + 1)
+    )
+    if narrative is None:
+        narrative = current_app.config.get('PREDICTION_NARRATIVE', True)
+    if not narrative:
+        return forecast_data, [], starting_year, end_year
+
+    pair_forecasts = {
+        pair: forecast.reset_index(drop=True)
+        for pair, forecast in forecast_data.groupby(
+            ['RegionName', 'OccupationType'], sort=False
+        )
+    }
+
+    # Answer what the cache can, and collect the prompts still to be sent
+    accounts = {}
+    prompts = {}
+    for (region, occupation_type), history in histories.items():
+        pair = (region, occupation_type)
+        contents_prompt = build_prediction_prompt(
+            region, occupation_type, no_of_years, starting_year, history,
+            pair_forecasts[pair], 'local', additional_info
+        )
+        cached = get_cached_prediction(
+            db.session, prediction_cache_key(PREDICTION_MODEL_ID,
+                                             contents_prompt)
+        )
+        if cached is not None:
+            accounts[pair] = (cached[0], 'cache')
+        else:
+            prompts[pair] = contents_prompt
+
+    if prompts:
+        # The model calls need no app context, so worker threads can make
+        # them with a client fetched here
+        client = get_model_client(api_key)
+        semaphore = get_model_call_semaphore(
+            current_app._get_current_object()
+        )
+
+        def narrate(pair):
+            with semaphore:
+                return generate_prediction(
+                    client, PREDICTION_MODEL_ID, prompts[pair],
+                    pair_forecasts[pair], 'local'
+                )[0]
+
+        with ThreadPoolExecutor(
+            max_workers=min(_batch_concurrency(), len(prompts)),
+            thread_name_prefix='prediction-batch'
+        ) as executor:
+            futures = {pair: executor.submit(narrate, pair)
+                       for pair in prompts}
+
+        for pair, future in futures.items():
+            region, occupation_type = pair
+            try:
+                prediction_result = future.result()
+            except Exception as e:
+                # As for a single prediction, describe the forecast locally
+                # and leave it uncached so the model is asked again
+                current_app.logger.warning(
+                    'Prediction model unavailable for %s (%s): %s',
+                    region, occupation_type, e
+                )
+                accounts[pair] = (local_prediction_result(
+                    pair_forecasts[pair], region, occupation_type,
+                    reason=str(e)
+                ), 'local')
+                continue
+            store_prediction(
+                db.session,
+                prediction_cache_key(PREDICTION_MODEL_ID, prompts[pair]),
+                prediction_result, pair_forecasts[pair], starting_year,
+                end_year
+            )
+            accounts[pair] = (prediction_result, 'model')
+
+    narratives = [
+        {
+            'RegionName': region,
+            'OccupationType': occupation_type,
+            'PredictionResult': accounts[(region, occupation_type)][0],
+            'Source': accounts[(region, occupation_type)][1]
+        }
+        for region, occupation_type in histories
+    ]
+    return forecast_data, narratives, starting_year, end_year
+
+
+@click.command('predict-employment-batch')
+@click.option('--years', 'no_of_years', default=1, show_default=True,
+              type=click.IntRange(1, MAX_BATCH_YEARS),
+              help='Number of years to forecast.')
+@click.option('--region', 'regions', multiple=True,
+              help='Region to forecast; repeat for several (default all).')
+@click.option('--occupation-type', 'occupation_types', multiple=True,
+              help='Occupation type to forecast; repeat for several '
+                   '(default all).')
+@click.option('--additional-info', default=None,
+              help="Additional information for the model's prompts.")
+@click.option('--narrative/--no-narrative', default=None,
+              help='Ask the model to explain each forecast (default the '
+                   'PREDICTION_NARRATIVE setting).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help='CSV file for the combined forecast (default stdout).')
+@click.option('--narratives-output', type=click.Path(dir_okay=False),
+              default=None, help="JSON file for the model's accounts.")
+@with_appcontext
+def predict_employment_batch_command(no_of_years, regions, occupation_types,
+                                     additional_info, narrative, output,
+                                     narratives_output):
+    """Forecast many regions and occupation types into one table."""
+    try:
+        forecast_data, narratives, starting_year, end_year = (
+            predict_employment_batch(
+                list(regions), list(occupation_types), no_of_years,
+                additional_info, narrative=narrative
+            )
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if output:
+        forecast_data.to_csv(output, index=False)
+        click.echo(
+            f'Wrote {len(forecast_data)} forecast rows for '
+            f'{starting_year}-{end_year} to {output}.'
+        )
+    else:
+        click.echo(forecast_data.to_csv(index=False), nl=False)
+    if narratives_output:
+        with open(narratives_output, 'w', encoding='utf-8') as file:
+            json.dump(narratives, file, indent=2)
+        click.echo(
+            f'Wrote {len(narratives)} accounts to {narratives_output}.',
+            err=not output
+        )
@@ -0,0 +1,205 @@
+"""
+Persistent cache of trend predictions.
+
+A prediction asks the model for a forecast of one region and occupation
+type, and takes several seconds and some of the API quota. The answer only
+depends on the prompt, which is built from the form inputs and the
+historical rows of that region and occupation type, so the cache is keyed
+on a SHA-256 hash of the model name and the prompt. A repeat request with
+the same inputs over the same rows is answered from the `prediction_cache`
+table; once any of those rows changes the prompt, and so the key, changes
+with it.
+
+Entries expire `PREDICTION_CACHE_TTL` seconds after they were stored
+(0 turns the cache off), and once there are more than
+`PREDICTION_CACHE_MAX_ENTRIES` the least recently used are evicted. Hits,
+misses and evictions are counted in `PredictionCacheStats` and reported by
+`prediction_cache_stats`, which `/predict_employment_trends/cache` serves
+as JSON.
+"""
+import hashlib
+import json
+import time
+
+import click
+import pandas as pd
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select
+
+from employment_flask_app import db
+from employment_flask_app.models import (
+    PredictionCacheEntry,
+    PredictionCacheStats
+)
+
+# Seconds a prediction is served from the cache
+DEFAULT_PREDICTION_CACHE_TTL = 24 * 60 * 60
+
+# Largest number of predictions kept
+DEFAULT_PREDICTION_CACHE_MAX_ENTRIES = 500
+
+
+def _cache_ttl():
+    return current_app.config.get(
+        'PREDICTION_CACHE_TTL', DEFAULT_PREDICTION_CACHE_TTL
+    )
+
+
+def _cache_max_entries():
+    return current_app.config.get(
+        'PREDICTION_CACHE_MAX_ENTRIES', DEFAULT_PREDICTION_CACHE_MAX_ENTRIES
+    )
+
+
+def prediction_cache_key(model_id, prompt):
+    """Return the cache key of a prompt sent to a model."""
+    return hashlib.sha256(
+        f'{model_id}\n{prompt}'.encode('utf-8')
+    ).hexdigest()
+
+
+def get_cached_prediction(session, key):
+    """
+    Return a cached prediction and count the lookup as a hit or miss.
+
+    The lookup is committed straight away, so no lock is held while a miss
+    waits for the model.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    key : str
+        The key from `prediction_cache_key`.
+
+    Returns
+    -------
+    tuple or None
+        `(prediction_result, forecast_data, starting_year, end_year)` as
+        returned by `predict_employment_data`, or None when the prediction
+        is not cached, has expired or the cache is turned off.
+    """
+    ttl = _cache_ttl()
+    if not ttl:
+        return None
+    now = time.time()
+    entry = session.get(PredictionCacheEntry, key)
+    if entry is None or entry.CreatedAt < now - ttl:
+        PredictionCacheStats.count(session, Misses=1)
+        session.commit()
+        return None
+
+    prediction = (
+        entry.PredictionResult,
+        pd.DataFrame(**json.loads(entry.ForecastData)),
+        entry.StartingYear,
+        entry.EndYear
+    )
+    entry.LastUsedAt = now
+    entry.Hits += 1
+    PredictionCacheStats.count(session, Hits=1)
+    session.commit()
+    return prediction
+
+
+def store_prediction(session, key, prediction_result, forecast_data,
+                     starting_year, end_year):
+    """
+    Cache a prediction, then evict expired and least recently used entries.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to write through; the change is committed.
+    key : str
+        The key from `prediction_cache_key`.
+    prediction_result : str
+        The markdown-formatted prediction.
+    forecast_data : pandas.DataFrame
+        The forecast rows.
+    starting_year, end_year : int
+        The first and last year of the forecast.
+    """
+    ttl = _cache_ttl()
+    if not ttl:
+        return
+    now = time.time()
+    session.merge(PredictionCacheEntry(
+        CacheKey=key,
+        PredictionResult=prediction_result,
+        ForecastData=forecast_data.to_json(orient='split'),
+        StartingYear=int(starting_year),
+        EndYear=int(end_year),
+        CreatedAt=now,
+        LastUsedAt=now,
+        Hits=0
+    ))
+    session.flush()
+
+    evicted = session.execute(
+        delete(PredictionCacheEntry)
+        .where(PredictionCacheEntry.CreatedAt < now - ttl)
+    ).rowcount
+    # Keep the most recently used entries, newest first
+    kept = (
+        select(PredictionCacheEntry.CacheKey)
+        .order_by(PredictionCacheEntry.LastUsedAt.desc())
+        .limit(_cache_max_entries())
+    )
+    evicted += session.execute(
+        delete(PredictionCacheEntry)
+        .where(PredictionCacheEntry.CacheKey.not_in(kept))
+    ).rowcount
+    if evicted:
+        PredictionCacheStats.count(session, Evictions=evicted)
+    session.commit()
+
+
+def prediction_cache_stats(session):
+    """
+    Return the prediction cache's counters and size.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+
+    Returns
+    -------
+    dict
+        Hits, misses and evictions since the cache was created, the hit
+        rate of all lookups and the number of entries.
+    """
+    hits, misses, evictions = session.execute(
+        select(
+            PredictionCacheStats.Hits,
+            PredictionCacheStats.Misses,
+            PredictionCacheStats.Evictions
+        ).where(PredictionCacheStats.StatsID == 1)
+    ).first() or (0, 0, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'evictions': evictions,
+        'hit_rate': hits / lookups if lookups else 0.0,
+        'entries': session.scalar(
+            select(func.count()).select_from(PredictionCacheEntry)
+        )
+    }
+
+
+def clear_prediction_cache(session):
+    """Remove every cached prediction and reset the counters."""
+    session.execute(delete(PredictionCacheEntry))
+    session.execute(delete(PredictionCacheStats))
+    session.commit()
+
+
+@click.command('clear-prediction-cache')
+@with_appcontext
+def clear_prediction_cache_command():
+    """Remove every cached trend prediction."""
+    clear_prediction_cache(db.session)
+    click.echo('Cleared the prediction cache.')
@@ -0,0 +1,199 @@
+"""
+Background trend predictions.
+
+A prediction waits several seconds for the model and its Google Search
+grounding. Run inside the request, it would hold a gunicorn worker for all
+of that time, and a few forecasts at once would leave none free for the
+rest of the app. Instead the submitted form is recorded as a
+`PredictionJob` and handed to a thread pool owned by the app, and the
+request returns at once. The page polls `/predict_employment_trends/jobs/
+<job_id>` until the job has finished and then shows its result and chart.
+
+The user's API key is passed to the worker in memory only and never stored.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import plotly.io as pio
+from flask import current_app
+
+from employment_flask_app import db
+from employment_flask_app.models import PredictionJob
+from employment_flask_app.route_functions import (
+    create_predicted_bar_chart,
+    predict_employment_data
+)
+
+# Number of predictions run at the same time by each app process. The
+# workers mostly wait on the model, so several can share one process.
+DEFAULT_PREDICTION_WORKERS = 4
+
+
+def get_prediction_executor(app):
+    """
+    Return the thread pool that runs the app's predictions, creating it once.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application.
+
+    Returns
+    -------
+    concurrent.futures.ThreadPoolExecutor
+        The app's prediction executor.
+    """
+    executor = app.extensions.get('prediction_jobs')
+    if executor is None:
+        executor = app.extensions.setdefault(
+            'prediction_jobs',
+            ThreadPoolExecutor(
+                max_workers=app.config.get(
+                    'PREDICTION_WORKERS', DEFAULT_PREDICTION_WORKERS
+                ),
+                thread_name_prefix='prediction-job'
+            )
+        )
+    return executor
+
+
+def enqueue_prediction(region, no_of_years, occupation_type,
+                       additional_info=None, api_key=None):
+    """
+    Record a prediction request and queue it for a background worker.
+
+    Parameters
+    ----------
+    region : str
+        The region to predict.
+    no_of_years : int
+        The number of years to predict.
+    occupation_type : str
+        The occupation type to predict.
+    additional_info : str, optional
+        Additional information for the prompt.
+    api_key : str, optional
+        The user's Gemini API key, used instead of the server's.
+
+    Returns
+    -------
+    tuple
+        The id of the new PredictionJob and the `concurrent.futures.Future`
+        of its run, which resolves to the job id once it has finished.
+    """
+    app = current_app._get_current_object()
+
+    job = PredictionJob(
+        RegionName=region,
+        NoOfYears=no_of_years,
+        OccupationType=occupation_type,
+        AdditionalInfo=additional_info
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    future = get_prediction_executor(app).submit(
+        run_prediction_job, app, job.JobID, api_key
+    )
+    return job.JobID, future
+
+
+def run_prediction_job(app, job_id, api_key=None):
+    """
+    Make a queued prediction and record the outcome on its PredictionJob.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application, whose context the worker runs in.
+    job_id : int
+        The PredictionJob to run.
+    api_key : str, optional
+        The user's Gemini API key.
+
+    Returns
+    -------
+    int
+        The job id.
+    """
+    with app.app_context():
+        job = db.session.get(PredictionJob, job_id)
+        region, no_of_years = job.RegionName, job.NoOfYears
+        occupation_type, additional_info = (
+            job.OccupationType, job.AdditionalInfo
+        )
+        update_job(job_id, Status='running')
+
+        try:
+            prediction_result, forecast_data, starting_year, end_year = (
+                predict_employment_data(
+                    region,
+                    no_of_years,
+                    occupation_type,
+                    additional_info,
+                    api_key=api_key
+                )
+            )
+        except Exception as e:
+            # Most commonly a genai quota (429) or auth error, which the
+            # page reports so the user can paste a different key
+            db.session.rollback()
+            app.logger.exception('Prediction job %s failed', job_id)
+            update_job(job_id, Status='failed', Error=str(e)[:300])
+        else:
+            update_job(
+                job_id,
+                Status='completed',
+                PredictionResult=prediction_result,
+                ForecastData=forecast_data.to_json(orient='records'),
+                StartingYear=starting_year,
+                EndYear=end_year
+            )
+
+    return job_id
+
+
+def update_job(job_id, **values):
+    """
+    Set columns of a PredictionJob and commit them so pollers can see them.
+
+    Parameters
+    ----------
+    job_id : int
+        The PredictionJob to update.
+    **values
+        New values keyed by column name.
+    """
+    job = db.session.get(PredictionJob, job_id)
+    for column, value in values.items():
+        setattr(job, column, value)
+    db.session.commit()
+
+
+def prediction_job_status(job):
+    """
+    Return a PredictionJob's state, with the chart once it has completed.
+
+    Parameters
+    ----------
+    job : PredictionJob
+        The job to report.
+
+    Returns
+    -------
+    dict
+        The job's columns, plus `GraphHtml` holding the forecast chart's
+        HTML once the job has completed (empty when the forecast has no
+        rows).
+    """
+    status = job.to_dict()
+    if job.Status == 'completed':
+        forecast_data = pd.DataFrame(json.loads(job.ForecastData))
+        status['GraphHtml'] = ''
+        if not forecast_data.empty:
+            fig = create_predicted_bar_chart(
+                forecast_data, job.RegionName, job.StartingYear, job.EndYear
+            )
+            status['GraphHtml'] = pio.to_html(fig, full_html=False)
+    return status
@@ -1,7 +1,26 @@
-from employment_flask_app.models import EmploymentData
-from flask import redirect, url_for, flash
+from employment_flask_app import db
+from employment_flask_app.models import (
+    EMPLOYMENT_COLUMNS,
+    EMPLOYMENT_DIMENSIONS,
+    EmploymentData,
+    DatasetVersion
+)
+from employment_flask_app.prediction_cache import (
+    get_cached_prediction,
+    prediction_cache_key,
+    store_prediction
+)
+from employment_flask_app.forecasting import (
+    FORECAST_COLUMNS,
+    forecast_summary,
+    linear_forecast
+)
+from employment_flask_app.genai_clients import get_genai_client_registry
+from employment_flask_app.stub_model import StubModelClient
+from flask import current_app, redirect, url_for, flash
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
-from google import genai
 from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
 import pandas as pd
 import plotly.express as px
@@ -12,8 +31,23 @@ from functools import wraps
 from flask import (
     request, session, render_template
 )
+from openpyxl import load_workbook
 import os
 
+# Number of rows read, normalized and inserted at a time when ingesting data
+INGEST_CHUNK_SIZE = 10000
+
+# AI model used for predictions
+PREDICTION_MODEL_ID = "gemini-2.0-flash"
+
+# Generation settings of every prediction, grounded with Google Search. They
+# never change, so they are built once and shared by all requests.
+PREDICTION_CONFIG = GenerateContentConfig(
+    tools=[Tool(google_search=GoogleSearch())],
+    response_modalities=["TEXT"]
+)
+
+
 def password_protected(required_password):
     """
     This decorator ensures that a specific route is protected by requiring
@@ -70,28 +104,17 @@ def password_protected(required_password):
     return decorator
 
 
-def insert_employment_data(df, db, EmploymentData, msg=None):
-    """
-    Inserts employment data from a DataFrame into the database.
+def prepare_employment_data(df):
+    """Normalizes an employment DataFrame for insertion into the database.
     Parameters
     ----------
     df : pandas.DataFrame
-        The DataFrame containing employment data to be inserted.
-    db : SQLAlchemy
-        The database instance for managing database operations.
-    EmploymentData : SQLAlchemy.Model
-        The database model representing the employment data table.
-    msg : str, optional
-        A message to display upon successful data upload (default is None).
+        Employment data using the dataset's column names.
     Returns
     -------
-    flask.Response or None
-        Redirects to an error page if an IntegrityError occurs, otherwise None.
-    Notes
-    -----
-    - Rounds numerical values to specified precision before insertion.
-    - Uses one bulk insert transaction instead of committing each row.
-    - Handles duplicate data gracefully by rolling back the transaction."""
+    pandas.DataFrame
+        The data renamed to the EmploymentData columns, with numerical
+        values rounded to their stored precision."""
     prepared_df = df.rename(
         columns={
             'Region': 'RegionName',
@@ -123,22 +146,334 @@ def insert_employment_data(df, db, EmploymentData, msg=None):
     )
     prepared_df['Longitude'] = prepared_df['Longitude'].round(6)
     prepared_df['Latitude'] = prepared_df['Latitude'].round(6)
+    return prepared_df
 
-    try:
-        db.session.bulk_insert_mappings(
-            EmploymentData,
-            prepared_df.to_dict(orient='records')
+
+def employment_records(session, prepared_df):
+    """Converts normalized employment data into EmploymentData row mappings.
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session used to look up (and add) dimension keys.
+    prepared_df : pandas.DataFrame
+        Output of `prepare_employment_data`.
+    Returns
+    -------
+    list of dict
+        One mapping per row, with region, gender and occupation type
+        replaced by their dimension keys.
+    Notes
+    -----
+    - Values missing from a dimension table are added to it.
+    - Missing text values become missing keys, which the NOT NULL
+        constraints reject on insert."""
+    records_df = prepared_df.copy()
+    for column, (dimension, key) in EMPLOYMENT_DIMENSIONS.items():
+        keys = dimension.keys_for(
+            session, prepared_df[column].dropna().astype(str).tolist()
         )
+        records_df[key] = prepared_df[column].map(keys)
+        records_df = records_df.drop(columns=column)
+    return records_df.to_dict(orient='records')
+
+
+def read_employment_file(file, filename, chunksize=INGEST_CHUNK_SIZE):
+    """Reads an uploaded CSV or XLSX file in fixed-size chunks.
+    Parameters
+    ----------
+    file : file-like
+        The uploaded file.
+    filename : str
+        Name of the uploaded file, used to pick the parser.
+    chunksize : int, optional
+        Number of rows per chunk (default is `INGEST_CHUNK_SIZE`).
+    Yields
+    ------
+    pandas.DataFrame
+        Consecutive chunks of the file, using the file's header row.
+    Notes
+    -----
+    - CSV files are parsed incrementally by pandas.
+    - XLSX files are read row by row through openpyxl's read-only mode, so
+        only one chunk of rows is held in memory at a time."""
+    if filename.endswith('.csv'):
+        with pd.read_csv(file, chunksize=chunksize) as reader:
+            yield from reader
+        return
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                # Skip blank rows, as pandas does
+                continue
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def insert_new_employment_chunks(chunks, db, EmploymentData):
+    """
+    Inserts chunks of employment data, all or nothing.
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        The employment data to insert, e.g. from `read_employment_file`.
+    db : SQLAlchemy
+        The database instance for managing database operations.
+    EmploymentData : SQLAlchemy.Model
+        The database model representing the employment data table.
+    Returns
+    -------
+    int
+        The number of rows inserted.
+    Raises
+    ------
+    IntegrityError
+        If any row already exists or has invalid values. The transaction is
+        rolled back, so nothing is stored.
+    Notes
+    -----
+    - Each chunk is inserted as its own batch within one transaction."""
+    inserted = 0
+    try:
+        for chunk in chunks:
+            records = employment_records(
+                db.session, prepare_employment_data(chunk)
+            )
+            db.session.bulk_insert_mappings(EmploymentData, records)
+            inserted += len(records)
+        DatasetVersion.bump(db.session)
         db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise
+    return inserted
+
+
+def upsert_employment_chunks(chunks, db, EmploymentData, on_conflict='ignore'):
+    """
+    Inserts chunks of employment data, skipping or updating existing rows.
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        The employment data to insert, e.g. from `read_employment_file`.
+    db : SQLAlchemy
+        The database instance for managing database operations.
+    EmploymentData : SQLAlchemy.Model
+        The database model representing the employment data table.
+    on_conflict : str, optional
+        'ignore' to skip rows that violate `unique_employment_data`, or
+        'update' to overwrite the existing row with the uploaded values
+        (default is 'ignore').
+    Returns
+    -------
+    dict
+        The number of rows 'inserted', 'skipped' and 'updated'.
+    Raises
+    ------
+    IntegrityError
+        If a row violates a constraint other than the unique key, e.g. a
+        missing value. Nothing is stored in that case.
+    Notes
+    -----
+    - Each chunk is sent as one `INSERT ... ON CONFLICT` statement with
+        `RETURNING`. Rows that conflict are not returned when ignored, and
+        return their existing `DataID` when updated, so new rows are the ones
+        whose `DataID` is above the highest id before the chunk.
+    - All chunks share one transaction, and the dataset version is only
+        bumped when a row changed."""
+    counts = {'inserted': 0, 'skipped': 0, 'updated': 0}
+    unique_columns = next(
+        constraint.columns.keys()
+        for constraint in EmploymentData.__table__.constraints
+        if constraint.name == 'unique_employment_data'
+    )
+    try:
+        for chunk in chunks:
+            records = employment_records(
+                db.session, prepare_employment_data(chunk)
+            )
+            if not records:
+                continue
+
+            statement = sqlite_insert(EmploymentData)
+            if on_conflict == 'update':
+                statement = statement.on_conflict_do_update(
+                    index_elements=unique_columns,
+                    set_={
+                        column: statement.excluded[column]
+                        for column in records[0]
+                    }
+                )
+            else:
+                statement = statement.on_conflict_do_nothing()
+
+            last_id = db.session.scalar(
+                select(func.max(EmploymentData.DataID))
+            ) or 0
+            returned_ids = db.session.scalars(
+                statement.returning(EmploymentData.DataID), records
+            ).all()
+            inserted = sum(1 for data_id in returned_ids if data_id > last_id)
+
+            counts['inserted'] += inserted
+            if on_conflict == 'update':
+                counts['updated'] += len(records) - inserted
+            else:
+                counts['skipped'] += len(records) - inserted
+
+        if counts['inserted'] or counts['updated']:
+            DatasetVersion.bump(db.session)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise
+    return counts
+
+
+def insert_employment_chunks(chunks, db, EmploymentData, msg=None,
+                             on_conflict=None):
+    """
+    Inserts chunks of employment data into the database in one transaction.
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        The employment data to insert, e.g. from `read_employment_file`.
+    db : SQLAlchemy
+        The database instance for managing database operations.
+    EmploymentData : SQLAlchemy.Model
+        The database model representing the employment data table.
+    msg : str, optional
+        A message to display upon successful data upload (default is None).
+    on_conflict : str, optional
+        'ignore' or 'update' to keep the new rows of an upload that contains
+        existing rows (see `upsert_employment_chunks`). By default any
+        existing row rejects the whole upload.
+    Returns
+    -------
+    flask.Response, dict or None
+        Redirects to an error page if an IntegrityError occurs. With
+        `on_conflict`, returns the inserted, skipped and updated counts,
+        otherwise None.
+    Notes
+    -----
+    - Each chunk is normalized and inserted as its own batch, so only one
+        chunk is held in memory at a time.
+    - All batches share one transaction: either every row is stored or,
+        if any row is a duplicate, none are.
+    - Bumps the dataset version so cached dashboard data is reloaded."""
+    if on_conflict in ('ignore', 'update'):
+        try:
+            counts = upsert_employment_chunks(
+                chunks, db, EmploymentData, on_conflict=on_conflict
+            )
+        except IntegrityError:
+            if msg:
+                flash("Data could not be stored: a row has missing or "
+                      "invalid values.", "danger")
+                return redirect(url_for('starter.error'))
+            return None
+        if msg:
+            flash(
+                f"Data uploaded: {counts['inserted']} rows inserted, "
+                f"{counts['skipped']} skipped, {counts['updated']} updated",
+                "success"
+            )
+        return counts
+
+    try:
+        insert_new_employment_chunks(chunks, db, EmploymentData)
         if msg:
             flash("Data uploaded successfully", "success")
     except IntegrityError:
-        db.session.rollback()
         if msg:
             flash("Data already exists in the database.", "danger")
             return redirect(url_for('starter.error'))
 
 
+def insert_employment_data(df, db, EmploymentData, msg=None):
+    """
+    Inserts employment data from a DataFrame into the database.
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The DataFrame containing employment data to be inserted.
+    db : SQLAlchemy
+        The database instance for managing database operations.
+    EmploymentData : SQLAlchemy.Model
+        The database model representing the employment data table.
+    msg : str, optional
+        A message to display upon successful data upload (default is None).
+    Returns
+    -------
+    flask.Response or None
+        Redirects to an error page if an IntegrityError occurs, otherwise None.
+    Notes
+    -----
+    - Rounds numerical values to specified precision before insertion.
+    - Inserts the DataFrame in chunks of `INGEST_CHUNK_SIZE` rows within one
+        transaction (see `insert_employment_chunks`).
+    - Bumps the dataset version so cached dashboard data is reloaded.
+    - Handles duplicate data gracefully by rolling back the transaction."""
+    chunks = (
+        df.iloc[start:start + INGEST_CHUNK_SIZE]
+        for start in range(0, len(df), INGEST_CHUNK_SIZE)
+    )
+    return insert_employment_chunks(chunks, db, EmploymentData, msg=msg)
+
+
+def find_employment_row(session, lookup):
+    """
+    Find the EmploymentData row a datatable edit or delete refers to.
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to query through.
+    lookup : dict
+        Either the row's `DataID`, which is a primary key lookup, or the
+        column values of the row as sent by older clients.
+    Returns
+    -------
+    EmploymentData or None
+        The matching row, or None if there is none.
+    Notes
+    -----
+    - Matching on column values compares floats exactly and can miss rows
+        whose values were rounded on the way to the client, so `DataID` is
+        preferred."""
+    fields = dict(lookup)
+    data_id = fields.pop('DataID', None)
+    if data_id is not None:
+        return session.get(EmploymentData, data_id)
+    return EmploymentData.query.filter_by(**fields).first()
+
+
+def update_employment_row(entry, values):
+    """
+    Set the columns of an EmploymentData row from a datatable edit.
+    Parameters
+    ----------
+    entry : EmploymentData
+        The row to update.
+    values : dict
+        New values keyed by column name, as in `EmploymentData.to_dict`.
+        `DataID` and unknown keys are ignored."""
+    for field, value in values.items():
+        if field in EMPLOYMENT_COLUMNS:
+            setattr(entry, field, value)
+
+
 def process_prediction_response(response):
     """Processes the raw response from the AI model to extract and format
     prediction data.
@@ -192,49 +527,43 @@ def process_prediction_response(response):
     return prediction_result, forecast_data
 
 
-def predict_employment_data(
-    region,
-    no_of_years,
-    occupation_type,
-    additional_info=None,
-    api_key=None
-        ):
-    """Predicts employment data trends for a specified region and occupation
-    type.
+def get_model_client(api_key=None):
+    """Returns the client predictions are generated with.
     Parameters
     ----------
-    region : str
-    The name of the region for which predictions are to be made.
-    no_of_years : int
-    The number of years to predict into the future.
-    occupation_type : str
-    The type of occupation for which predictions are to be made.
-    additional_info : str, optional
-    Additional information to include in the prediction prompt
-    (default is None).
+    api_key : str, optional
+        The Gemini API key to use (default is the server's GENAI_API_KEY).
     Returns
     -------
-    tuple
-    A tuple containing:
-    - prediction_result (str): The markdown-formatted prediction result.
-    - forecast_data (pandas.DataFrame): The forecast data as a DataFrame.
-    - starting_year (int): The first year of the prediction.
-    - end_year (int): The last year of the prediction.
+    google.genai.Client or StubModelClient
+        A Gemini client, or the offline stub when the app's
+        PREDICTION_MODEL_CLIENT setting is 'stub'.
     Notes
     -----
-    - Uses an AI model to generate predictions based on historical data.
-    - Applies data preprocessing and error-aware forecasting techniques."""
+    - Clients are reused across requests, one per API key, so their HTTP
+    connections stay open between predictions (see genai_clients.py)."""
+    if current_app.config.get('PREDICTION_MODEL_CLIENT') == 'stub':
+        return StubModelClient()
+    # Prefer a user-supplied key (BYOK) so visitors can spend their own quota;
+    # fall back to the server-configured key for local dev and demos.
+    return get_genai_client_registry(current_app).get(
+        api_key or os.environ.get('GENAI_API_KEY')
+    )
 
-    # Query the database for historical employment data for the specified
-    # region and occupation type
-    employment_data = EmploymentData.query.filter_by(
-        RegionName=region,
-        OccupationType=occupation_type
-        ).all()
 
-    # Convert the queried data into a list of dictionaries for easier
-    # processing
-    employment_data_list = [
+def employment_history_records(rows):
+    """Converts historical employment rows into the records of a prompt.
+    Parameters
+    ----------
+    rows : iterable
+        EmploymentData objects, or result rows with the same attribute
+        names, of one region and occupation type in prompt order.
+    Returns
+    -------
+    list of dict
+        One dict per row with the FORECAST_COLUMNS, percentages rounded to
+        2 decimal places and coordinates to 6."""
+    return [
         {
             "RegionName": data.RegionName,
             "Year": data.Year,
@@ -245,34 +574,32 @@ def predict_employment_data(
             "Longitude": round(data.Longitude, 6),
             "Latitude": round(data.Latitude, 6)
         }
-        for data in employment_data
+        for data in rows
     ]
 
-    # Determine the most recent year in the historical data, defaulting to
-    # 2023 if no data exists
-    most_recent_year = max([d.Year for d in employment_data], default=2023)
-    # Calculate the starting year for predictions
-    starting_year = most_recent_year + 1
-    # Generate a list of years for the prediction range
-    predicted_years = [starting_year + i for i in range(no_of_years)]
-    # Calculate the ending year for predictions
-    end_year = starting_year + no_of_years - 1
-
-    # Prefer a user-supplied key (BYOK) so visitors can spend their own quota;
-    # fall back to the server-configured key for local dev and demos.
-    resolved_key = api_key or os.environ.get('GENAI_API_KEY')
-    client = genai.Client(api_key=resolved_key)
-    # Specify the AI model to use for predictions
-    model_id = "gemini-2.0-flash"
-
-    # Define a Google Search tool to assist with generating content
-    google_search_tool = Tool(
-        google_search=GoogleSearch()
-    )
 
-    # Construct the prompt for the AI model with detailed instructions and
-    # historical data
-    contents_prompt = f"""
+def build_forecast_prompt(region, occupation_type, no_of_years,
+                          starting_year, employment_data_list):
+    """Builds the prompt asking the AI model for a forecast and its account.
+    Parameters
+    ----------
+    region : str
+        The name of the region to predict.
+    occupation_type : str
+        The type of occupation to predict.
+    no_of_years : int
+        The number of years to predict.
+    starting_year : int
+        The first year of the prediction.
+    employment_data_list : list of dict
+        The historical rows of the region and occupation type.
+    Returns
+    -------
+    str
+        The prompt, asking for the forecast as a Markdown table and as a
+        JSON array of rows."""
+    predicted_years = [starting_year + i for i in range(no_of_years)]
+    return f"""
     Analyze employment data with columns [RegionName, Year, Gender,
     OccupationType, EmploymentPercentage, MarginofErrorPercentage,
     Longitude, Latitude] to predict employment trends for {no_of_years} years
@@ -341,25 +668,298 @@ def predict_employment_data(
     - **Margin of Error Interpretation**: The constant margin of error
     assumption should be used cautiously.
     """
-    # Append additional information to the prompt if provided
+
+
+def build_narrative_prompt(region, occupation_type, employment_data_list,
+                           forecast_data):
+    """Builds the prompt asking the AI model to explain a local forecast.
+    Parameters
+    ----------
+    region : str
+        The name of the region predicted.
+    occupation_type : str
+        The type of occupation predicted.
+    employment_data_list : list of dict
+        The historical rows of the region and occupation type.
+    forecast_data : pandas.DataFrame
+        The forecast computed by `linear_forecast`.
+    Returns
+    -------
+    str
+        The prompt, which gives the model the forecast and asks only for
+        its account in the sections of the forecast prompt."""
+    forecast_list = forecast_data.to_dict(orient='records')
+    return f"""
+    Analyze employment data with columns [RegionName, Year, Gender,
+    OccupationType, EmploymentPercentage, MarginofErrorPercentage,
+    Longitude, Latitude].
+
+    Historical data for {region} ({occupation_type}):
+    {employment_data_list}
+
+    The forecast has already been computed. It follows a linear trend fitted
+    by least squares separately for males and females, with the margin of
+    error taken as the average of the past margins of error:
+    {forecast_list}
+
+    Explain this forecast. Do not change or recompute any of its values.
+
+    Ensure the output always begins:
+    "I will analyze the provided employment data for {region}
+     ({occupation_type}) and explain the forecast."
+
+    The explanation should include the following sections:
+    1. **Data Preprocessing Details** (rounding and precision of the data).
+    2. **Error-Aware Forecasting** (how the margin of error was estimated).
+    3. **Trend Analysis & Forecasting Method** (the yearly changes of the
+    trend for males and females).
+    4. **Final Forecast Table** (the forecast above as a Markdown table with
+    the headings RegionName, Year, Gender, OccupationType, Employment
+    Percentage, MarginofErrorPercentage, Longitude, Latitude).
+
+    Additionally, highlight key considerations:
+    - **Data Limitations**: Forecast accuracy depends on available
+    historical data.
+    - **Linearity Assumption**: Trends may be influenced by external
+    factors.
+    - **Occupation & Region Specificity**: Results should not be
+    generalized.
+    - **Margin of Error Interpretation**: The constant margin of error
+    assumption should be used cautiously.
+    """
+
+
+def build_prediction_prompt(region, occupation_type, no_of_years,
+                            starting_year, employment_data_list,
+                            local_forecast, forecast_mode,
+                            additional_info=None):
+    """Builds the prompt of a prediction in the given forecast mode.
+    Parameters
+    ----------
+    region : str
+        The name of the region to predict.
+    occupation_type : str
+        The type of occupation to predict.
+    no_of_years : int
+        The number of years to predict.
+    starting_year : int
+        The first year of the prediction.
+    employment_data_list : list of dict
+        The historical rows of the region and occupation type.
+    local_forecast : pandas.DataFrame
+        The forecast computed by `linear_forecast`.
+    forecast_mode : str
+        'model' to have the AI model make the forecast, otherwise 'local'
+        to have it explain `local_forecast`.
+    additional_info : str, optional
+        Additional information to include in the prompt.
+    Returns
+    -------
+    str
+        The prompt. The additional information has its whitespace
+        normalized so reformatted text still hits the cache."""
+    if forecast_mode == 'model':
+        contents_prompt = build_forecast_prompt(
+            region, occupation_type, no_of_years, starting_year,
+            employment_data_list
+        )
+    else:
+        contents_prompt = build_narrative_prompt(
+            region, occupation_type, employment_data_list, local_forecast
+        )
+
+    additional_info = ' '.join((additional_info or '').split())
     if additional_info:
         contents_prompt += f"""
         Use the following additional information:
         {additional_info}
         """
+    return contents_prompt
 
-    # Generate predictions using the AI model
+
+def generate_prediction(client, model_id, contents_prompt, local_forecast,
+                        forecast_mode):
+    """Asks the AI model for a prediction and reads its answer.
+    Parameters
+    ----------
+    client : genai.Client or StubModelClient
+        The client returned by `get_model_client`.
+    model_id : str
+        The AI model to use.
+    contents_prompt : str
+        The prompt built by `build_prediction_prompt`.
+    local_forecast : pandas.DataFrame
+        The forecast computed by `linear_forecast`.
+    forecast_mode : str
+        The forecast mode the prompt was built in.
+    Returns
+    -------
+    tuple
+    The markdown-formatted prediction result and the forecast data: the
+    model's own forecast in 'model' mode, otherwise `local_forecast`.
+    Raises
+    ------
+    Exception
+        Whatever the model call raises, or ValueError when a forecast
+        cannot be read from the answer.
+    Notes
+    -----
+    - Needs no app context, so it can run in worker threads."""
     response = client.models.generate_content(
         model=model_id,
         contents=contents_prompt,
-        config=GenerateContentConfig(
-            tools=[google_search_tool],
-            response_modalities=["TEXT"]
+        config=PREDICTION_CONFIG
+    )
+    if forecast_mode == 'model':
+        # Process the AI model's response to extract prediction results
+        # and forecast data
+        processed = process_prediction_response(response)
+        if isinstance(processed, str):
+            raise ValueError(processed)
+        return processed
+    return markdown.markdown(response.text), local_forecast
+
+
+def local_prediction_result(local_forecast, region, occupation_type,
+                            reason=None):
+    """Describes a local forecast without the AI model.
+    Parameters
+    ----------
+    local_forecast : pandas.DataFrame
+        The forecast computed by `linear_forecast`.
+    region : str
+        The name of the region predicted.
+    occupation_type : str
+        The type of occupation predicted.
+    reason : str, optional
+        Why the model was not used, shown to the user.
+    Returns
+    -------
+    str
+        The HTML of the forecast's summary."""
+    return markdown.markdown(forecast_summary(
+        local_forecast, region, occupation_type,
+        reason=reason[:300] if reason else None
+    ))
+
+
+def predict_employment_data(
+    region,
+    no_of_years,
+    occupation_type,
+    additional_info=None,
+    api_key=None
+        ):
+    """Predicts employment data trends for a specified region and occupation
+    type.
+    Parameters
+    ----------
+    region : str
+    The name of the region for which predictions are to be made.
+    no_of_years : int
+    The number of years to predict into the future.
+    occupation_type : str
+    The type of occupation for which predictions are to be made.
+    additional_info : str, optional
+    Additional information to include in the prediction prompt
+    (default is None).
+    Returns
+    -------
+    tuple
+    A tuple containing:
+    - prediction_result (str): The markdown-formatted prediction result.
+    - forecast_data (pandas.DataFrame): The forecast data as a DataFrame.
+    - starting_year (int): The first year of the prediction.
+    - end_year (int): The last year of the prediction.
+    Notes
+    -----
+    - By default the forecast is a least-squares linear trend per gender
+    computed locally, and the AI model only writes its account. With
+    PREDICTION_FORECAST set to 'model' the AI model makes the forecast, and
+    with PREDICTION_NARRATIVE set to False the model is not called at all.
+    - When the model is unavailable or over quota, the local forecast is
+    returned with a short account of its own.
+    - Predictions are cached on a hash of the prompt, which includes the
+    historical rows, so a repeat request over unchanged data skips the model
+    (see prediction_cache.py)."""
+
+    # Query the database for historical employment data for the specified
+    # region and occupation type, in a fixed order so the same rows always
+    # give the same prompt
+    employment_data = EmploymentData.query.filter_by(
+        RegionName=region,
+        OccupationType=occupation_type
+        ).order_by(
+            EmploymentData.Year,
+            EmploymentData.GenderID,
+            EmploymentData.DataID
+        ).all()
+
+    # Convert the queried data into a list of dictionaries for easier
+    # processing
+    employment_data_list = employment_history_records(employment_data)
+
+    # Determine the most recent year in the historical data, defaulting to
+    # 2023 if no data exists
+    most_recent_year = max([d.Year for d in employment_data], default=2023)
+    # Calculate the starting year for predictions
+    starting_year = most_recent_year + 1
+    # Generate a list of years for the prediction range
+    predicted_years = [starting_year + i for i in range(no_of_years)]
+    # Calculate the ending year for predictions
+    end_year = starting_year + no_of_years - 1
+
+    # Specify the AI model to use for predictions
+    model_id = PREDICTION_MODEL_ID
+
+    # Forecast locally with the trend the prompt's protocol describes, a
+    # least-squares line per gender (see forecasting.py)
+    local_forecast = linear_forecast(
+        pd.DataFrame(employment_data_list, columns=FORECAST_COLUMNS),
+        predicted_years
+    )
+    forecast_mode = current_app.config.get('PREDICTION_FORECAST', 'local')
+    if (forecast_mode == 'local'
+            and not current_app.config.get('PREDICTION_NARRATIVE', True)):
+        # Skip the model altogether and describe the forecast here
+        prediction_result = local_prediction_result(
+            local_forecast, region, occupation_type
+        )
+        return prediction_result, local_forecast, starting_year, end_year
+
+    # Construct the prompt for the AI model: in 'model' mode it makes the
+    # forecast itself, otherwise it only explains the local forecast
+    contents_prompt = build_prediction_prompt(
+        region, occupation_type, no_of_years, starting_year,
+        employment_data_list, local_forecast, forecast_mode, additional_info
+    )
+
+    # Serve a repeat request from the cache
+    cache_key = prediction_cache_key(model_id, contents_prompt)
+    cached = get_cached_prediction(db.session, cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        # Generate predictions using the AI model
+        prediction_result, forecast_data = generate_prediction(
+            get_model_client(api_key), model_id, contents_prompt,
+            local_forecast, forecast_mode
         )
+    except Exception as e:
+        # The model is unavailable, most commonly over quota (429) or without
+        # a valid key: answer with the local forecast instead. The answer is
+        # not cached, so the model is asked again next time.
+        current_app.logger.warning('Prediction model unavailable: %s', e)
+        prediction_result = local_prediction_result(
+            local_forecast, region, occupation_type, reason=str(e)
+        )
+        return prediction_result, local_forecast, starting_year, end_year
+
+    store_prediction(
+        db.session, cache_key, prediction_result, forecast_data,
+        starting_year, end_year
     )
-    # Process the AI model's response to extract prediction results and
-    # forecast data
-    prediction_result, forecast_data = process_prediction_response(response)
 
     # Return the prediction result, forecast data, and prediction range
     return prediction_result, forecast_data, starting_year, end_year
@@ -6,7 +6,10 @@ from flask import (
     flash,
     request,
     jsonify,
-    session
+    session,
+    Response,
+    stream_with_context,
+    current_app
 )
 from employment_flask_app.forms.upload_file import UploadFileForm
 from employment_flask_app.forms.policy_recommendation import (
@@ -15,42 +18,50 @@ from employment_flask_app.forms.policy_recommendation import (
 from employment_flask_app.forms.policy_feedback import PolicyFeedbackForm
 from employment_flask_app.forms.data_prediction import DataPredictForm
 from employment_flask_app.models import (
+    EMPLOYMENT_COLUMNS,
+    DatasetVersion,
     EmploymentData,
+    ImportJob,
     PolicyRecommendation,
-    PolicyFeedback
+    PolicyFeedback,
+    PredictionJob
 )
 from employment_flask_app import db
-from pathlib import Path
+from employment_flask_app.import_jobs import enqueue_import
+from employment_flask_app.prediction_jobs import (
+    enqueue_prediction,
+    prediction_job_status
+)
+from employment_flask_app.datatable_functions import (
+    MAX_BATCH_OPERATIONS,
+    apply_datatable_batch,
+    datatable_changes,
+    datatable_filter_options,
+    datatable_page,
+    datatable_rows,
+    stream_csv_export,
+    write_xlsx_export
+)
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import selectinload
-import plotly.io as pio
-import pandas as pd
 from employment_flask_app.route_functions import (
-    insert_employment_data,
-    predict_employment_data,
-    create_predicted_bar_chart,
-    password_protected
+    find_employment_row,
+    password_protected,
+    update_employment_row
+)
+from employment_flask_app.prediction_cache import prediction_cache_stats
+from employment_flask_app.prediction_batch import (
+    MAX_BATCH_YEARS,
+    predict_employment_batch
 )
 from flask import send_file
-from io import BytesIO
+import tempfile
 
 bp = Blueprint('starter', __name__)
 
-data_path = Path(__file__).parent / 'data' / 'employment_prepared.xlsx'
-ori_df = pd.read_excel(data_path)
-
-
-def ensure_employment_data():
-    """Load the bundled dataset when the employment table is empty."""
-    if not db.session.query(EmploymentData.DataID).first():
-        insert_employment_data(ori_df, db, EmploymentData)
-
 
 @bp.route('/')
 def index():
-    # Insert initial employment data into the database from the prepared Excel
-    # file
-    ensure_employment_data()
     # Render the index page with a welcome message
     return render_template('home.html')
 
@@ -65,60 +76,88 @@ def error():
 def datatable():
     # Create an instance of the file upload form
     form = UploadFileForm()
+    import_job_id = None
     if form.validate_on_submit():
         # If the form is submitted and validated, process the uploaded file
         file = form.file.data
         if file:
-            # Check the file extension and read the data accordingly
-            if file.filename.endswith('.xlsx'):
-                df = pd.read_excel(file)
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(file)
-            # Insert the uploaded data into the EmploymentData table
-            insert_employment_data(df, db, EmploymentData, msg=True)
-    ensure_employment_data()
-    # Fetch all employment data from the database and convert it to an array
-    # format
+            # Queue the file for a background import, handling rows that
+            # already exist as chosen in the form, and return straight away
+            import_job_id, _ = enqueue_import(file, form.on_duplicate.data)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'job_id': import_job_id,
+                    'status_url': url_for(
+                        'starter.import_status', job_id=import_job_id
+                    )
+                }), 202
+            flash(f"Import of {file.filename} queued as job {import_job_id}",
+                  "info")
     # Handle export requests
     export_type = request.args.get('export')
-    if export_type in ['csv', 'xlsx']:
-        # Query all rows from EmploymentData table
-        query = db.session.query(EmploymentData)
-
-        # Convert SQLAlchemy query to pandas DataFrame
-        df = pd.read_sql(
-            sql=query.statement,
-            con=db.engine  # Use the SQLAlchemy engine
+    if export_type == 'csv':
+        # Stream the CSV in batches so the table is never held in memory
+        return Response(
+            stream_with_context(stream_csv_export(db.session)),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition':
+                    'attachment; filename=employment_data.csv'
+            }
         )
-
-        # Create an in-memory file for export
-        output = BytesIO()
-        if export_type == 'csv':
-            df.to_csv(output, index=False)
-            mimetype = 'text/csv'
-            filename = 'employment_data.csv'
-        elif export_type == 'xlsx':
-            with pd.ExcelWriter(output) as writer:
-                df.to_excel(writer, index=False)
-            mimetype = (
-                'application/vnd.openxmlformats-officedocument.'
-                'spreadsheetml.sheet'
+    if export_type == 'xlsx':
+        # Spool the workbook to a temporary file, which send_file closes
+        # (and so deletes) once the response has been sent
+        output = tempfile.TemporaryFile()
+        rows_written = write_xlsx_export(
+            db.session,
+            output,
+            progress=lambda rows: current_app.logger.debug(
+                'XLSX export: %d rows written', rows
             )
-            filename = 'employment_data.xlsx'
+        )
+        size = output.tell()
+        current_app.logger.info(
+            'XLSX export: %d rows, %d bytes', rows_written, size
+        )
 
         output.seek(0)
-        return send_file(
+        response = send_file(
             output,
-            mimetype=mimetype,
+            mimetype=(
+                'application/vnd.openxmlformats-officedocument.'
+                'spreadsheetml.sheet'
+            ),
             as_attachment=True,
-            download_name=filename
+            download_name='employment_data.xlsx'
         )
-
-    employment_data = [data.to_array() for data in EmploymentData.query.all()]
-    # Render the datatable page with the form and employment data
+        response.content_length = size
+        return response
+
+    # Rows are fetched page by page from /datatable/data, so only the footer
+    # filter options are rendered into the page
+    filter_options = datatable_filter_options(db.session)
+    # Render the datatable page with the form, filter options and the id of
+    # any import that was just queued
     return render_template('datatable.html',
                            form=form,
-                           employment_data=employment_data)
+                           filter_options=filter_options,
+                           import_job_id=import_job_id)
+
+
+@bp.route('/datatable/import/<int:job_id>')
+def import_status(job_id):
+    # Report the progress of a background import
+    job = db.session.get(ImportJob, job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@bp.route('/datatable/data')
+def datatable_data():
+    # Answer a DataTables server-side processing request with one page of rows
+    return jsonify(datatable_page(db.session, request.args))
 
 
 @bp.route('/datatable/add', methods=['POST'])
@@ -140,15 +179,75 @@ def add_row():
 
     # Add the new entry to the database session
     db.session.add(new_entry)
+    db.session.flush()
+    version = DatasetVersion.bump(db.session, updated=[new_entry.DataID])
 
     # Commit the session to save the new entry in the database
     db.session.commit()
 
-    # Return a success response with a redirect URL to the datatable page
-    return jsonify({
+    # Return the new row and data version, and a redirect URL to the
+    # datatable page for older clients
+    return jsonify(
+        redirect_url=url_for('starter.datatable'),
+        **mutation_response(version, updated=[new_entry.DataID])
+    )
+
+
+def mutation_response(version, updated=(), deleted=()):
+    """Describe a saved change so the datatable can patch itself in place."""
+    return {
         'status': 'success',
-        'redirect_url': url_for('starter.datatable')
-    })
+        'version': version,
+        'rows': datatable_rows(db.session, list(updated)),
+        'deleted': list(deleted)
+    }
+
+
+@bp.route('/datatable/batch', methods=['POST'])
+def datatable_batch():
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+
+    # Validate the list of operations
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Missing operations'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({
+            'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'
+        }), 400
+
+    # Apply every operation in one transaction
+    try:
+        results, version = apply_datatable_batch(db.session, operations)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'error': (
+                'A row already exists or has missing or invalid values; '
+                'no changes were saved.'
+            )
+        }), 409
+
+    # Return the rows as they now are, so the page can patch them in place
+    updated, deleted = [], []
+    for operation, result in zip(operations, results):
+        if result['status'] == 'success':
+            changed = deleted if operation['op'] == 'delete' else updated
+            changed.append(result['DataID'])
+    return jsonify(
+        results=results, **mutation_response(version, updated, deleted)
+    )
+
+
+@bp.route('/datatable/changes')
+def datatable_changes_since():
+    # Report the rows changed since the data version the client last saw
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'Missing since version'}), 400
+    return jsonify(datatable_changes(db.session, since))
 
 
 @bp.route('/datatable/edit', methods=['PATCH'])
@@ -159,25 +258,39 @@ def edit_row():
     if not all(key in data for key in ['lookupFields', 'updatedRowData']):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    lookup_fields = data['lookupFields']
+    # Find the record by DataID, or by the lookup fields of older clients
+    entry = find_employment_row(db.session, data['lookupFields'])
 
-    # Query record using lookup fields
-    entry = EmploymentData.query.filter_by(**lookup_fields).first()
+    if not entry:
+        return jsonify({'error': 'Record not found'}), 404
+
+    return save_row_edit(entry, data['updatedRowData'])
+
+
+@bp.route('/datatable/rows/<int:data_id>', methods=['PATCH'])
+def edit_row_by_id(data_id):
+    # Find the record by its primary key
+    entry = db.session.get(EmploymentData, data_id)
 
     if not entry:
         return jsonify({'error': 'Record not found'}), 404
 
+    return save_row_edit(entry, request.get_json())
+
+
+def save_row_edit(entry, updated_row_data):
+    """Apply a datatable edit to a row and commit it."""
     try:
-        # Update all fields in updatedRowData dynamically
-        for field, value in data['updatedRowData'].items():
-            setattr(entry, field, value)
+        # Update the fields in updated_row_data
+        update_employment_row(entry, updated_row_data)
 
+        version = DatasetVersion.bump(db.session, updated=[entry.DataID])
         db.session.commit()
 
-        return jsonify({
-            'status': 'success',
-            'redirect_url': url_for('starter.datatable')
-        })
+        return jsonify(
+            redirect_url=url_for('starter.datatable'),
+            **mutation_response(version, updated=[entry.DataID])
+        )
 
     except Exception as e:
         db.session.rollback()
@@ -188,29 +301,41 @@ def edit_row():
 def delete_row():
     data = request.get_json()
 
-    # Find the existing entry in the database
-    entry_to_delete = EmploymentData.query.filter_by(
-        RegionName=data.get('RegionName'),
-        Year=data.get('Year'),
-        Gender=data.get('Gender'),
-        OccupationType=data.get('OccupationType'),
-        EmploymentPercentage=data.get('EmploymentPercentage'),
-        MarginofErrorPercentage=data.get('MarginofErrorPercentage'),
-        Longitude=data.get('Longitude'),
-        Latitude=data.get('Latitude')
-    ).first()  # Get the first matching record
+    # Find the existing entry by DataID, or by every column for older
+    # clients
+    entry_to_delete = find_employment_row(db.session, {
+        key: data.get(key) for key in ['DataID', *EMPLOYMENT_COLUMNS]
+    })
 
     if not entry_to_delete:
         return jsonify({'status': 'error', 'message': 'Entry not found'}), 404
 
+    return save_row_delete(entry_to_delete)
+
+
+@bp.route('/datatable/rows/<int:data_id>', methods=['DELETE'])
+def delete_row_by_id(data_id):
+    # Find the existing entry by its primary key
+    entry_to_delete = db.session.get(EmploymentData, data_id)
+
+    if not entry_to_delete:
+        return jsonify({'status': 'error', 'message': 'Entry not found'}), 404
+
+    return save_row_delete(entry_to_delete)
+
+
+def save_row_delete(entry_to_delete):
+    """Delete a datatable row and commit."""
     # Delete the existing entry
+    data_id = entry_to_delete.DataID
     db.session.delete(entry_to_delete)
+    version = DatasetVersion.bump(db.session, deleted=[data_id])
     db.session.commit()
 
-    return jsonify({
-        'status': 'success',
-        'redirect_url': url_for('starter.datatable')
-    })
+    return jsonify(
+        redirect_url=url_for('starter.datatable'),
+        **mutation_response(version, deleted=[data_id])
+    )
 
 
 @bp.route('/policy_recommendation', methods=['GET', 'POST'])
@@ -327,9 +452,7 @@ def policy_feedback():
 def predict_employment_trends():
     # Create an instance of the data prediction form
     form = DataPredictForm()
-    prediction_result = None  # Initialize the prediction result
-    graph_html = None  # Initialize the HTML for the graph
-    forecast_data = None  # Initialize the forecast data
+    prediction_job_id = None  # Initialize the id of a queued prediction
 
     # Check if the form is submitted and validated
     if form.validate_on_submit():
@@ -346,51 +469,105 @@ def predict_employment_trends():
             session['genai_api_key'] = submitted_key
         user_api_key = session.get('genai_api_key')
 
-        # Predict employment data with or without additional information
-        try:
-            prediction_result, forecast_data, starting_year, end_year = (
-                predict_employment_data(
-                    region,
-                    no_of_years,
-                    occupation_type,
-                    additional_info if additional_info else None,
-                    api_key=user_api_key
+        # Queue the prediction for a background worker and return straight
+        # away; the page polls the job for the result
+        prediction_job_id, _ = enqueue_prediction(
+            region,
+            no_of_years,
+            occupation_type,
+            additional_info if additional_info else None,
+            api_key=user_api_key
+        )
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({
+                'job_id': prediction_job_id,
+                'status_url': url_for(
+                    'starter.prediction_status', job_id=prediction_job_id
                 )
-            )
-        except Exception as e:
-            # Most commonly a genai quota (429) or auth error. Surface the
-            # message instead of 500-ing so the user can paste a different key.
-            # Drop the session-stored key so a subsequent submission without a
-            # new key falls back to the server default rather than the bad one.
-            session.pop('genai_api_key', None)
-            flash(
-                f"Prediction failed: {str(e)[:300]}. "
-                "If this is a quota error, paste your own Gemini API key "
-                "below and try again.",
-                "danger"
-            )
-            return render_template(
-                'data_prediction.html',
-                form=form,
-                prediction_result=None,
-                graph_html=None,
-                forecast_data=None
-            )
+            }), 202
 
-        # If forecast data is not empty, create a bar chart
-        graph_html = ""
-        if not forecast_data.empty:
-            fig = create_predicted_bar_chart(
-                forecast_data, region, starting_year, end_year
-            )
-            graph_html = pio.to_html(fig, full_html=False)
-
-    # Render the data prediction page with the form, prediction result, graph,
-    # and forecast data
+    # Render the data prediction page with the form and the id of any
+    # prediction that was just queued
     return render_template(
         'data_prediction.html',
         form=form,
-        prediction_result=prediction_result,
-        graph_html=graph_html,
-        forecast_data=forecast_data
+        prediction_job_id=prediction_job_id
     )
+
+
+@bp.route('/predict_employment_trends/jobs/<int:job_id>')
+def prediction_status(job_id):
+    # Report the progress of a background prediction, with its result and
+    # chart once it has completed
+    job = db.session.get(PredictionJob, job_id)
+    if not job:
+        return jsonify({'error': 'Prediction job not found'}), 404
+    if job.Status == 'failed':
+        # Most commonly a genai quota (429) or auth error. Drop the
+        # session-stored key so a subsequent submission without a new key
+        # falls back to the server default rather than the bad one.
+        session.pop('genai_api_key', None)
+    return jsonify(prediction_job_status(job))
+
+
+@bp.route('/predict_employment_trends/batch', methods=['POST'])
+def predict_employment_trends_batch():
+    data = request.get_json(silent=True) or {}
+    no_of_years = data.get('no_of_years', 1)
+    regions = data.get('regions') or []
+    occupation_types = data.get('occupation_types') or []
+
+    # Validate the request before any work is done
+    if (not isinstance(no_of_years, int) or isinstance(no_of_years, bool)
+            or not 1 <= no_of_years <= MAX_BATCH_YEARS):
+        return jsonify({
+            'error': (
+                f'no_of_years must be a whole number from 1 to '
+                f'{MAX_BATCH_YEARS}'
+            )
+        }), 400
+    for values in (regions, occupation_types):
+        if (not isinstance(values, list)
+                or not all(isinstance(value, str) for value in values)):
+            return jsonify({
+                'error': 'regions and occupation_types must be lists of names'
+            }), 400
+
+    # Forecast every pair at once, with the visitor's own key if they have
+    # given one on the prediction page
+    try:
+        forecast_data, narratives, starting_year, end_year = (
+            predict_employment_batch(
+                regions,
+                occupation_types,
+                no_of_years,
+                data.get('additional_info'),
+                api_key=session.get('genai_api_key'),
+                narrative=data.get('narrative')
+            )
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    if request.args.get('format') == 'csv':
+        return Response(
+            forecast_data.to_csv(index=False),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition': (
+                    'attachment; filename=employment_forecast_'
+                    f'{starting_year}_{end_year}.csv'
+                )
+            }
+        )
+    return jsonify({
+        'StartingYear': starting_year,
+        'EndYear': end_year,
+        'Forecast': forecast_data.to_dict(orient='records'),
+        'Narratives': narratives
+    })
+
+
+@bp.route('/predict_employment_trends/cache')
+def prediction_cache():
+    # Report the prediction cache's hit, miss and eviction counters
+    return jsonify(prediction_cache_stats(db.session))
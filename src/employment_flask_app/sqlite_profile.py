@@ -0,0 +1,102 @@
+"""
+SQLite tuning for the app's database engine.
+
+Several gunicorn workers share one SQLite file. In SQLite's default rollback
+journal mode a writer blocks every reader, and a connection that finds the
+database locked gives up at once with "database is locked". The profile
+below switches the database to write-ahead logging, where readers and a
+writer work side by side, and has connections wait for a lock instead of
+failing.
+
+The pragmas are set on every new connection through an engine `connect`
+event. Connections are pooled, so each worker opens a few connections and
+keeps their page cache and memory map between requests.
+
+Both are configurable: `SQLITE_PRAGMAS` maps pragma names to values (an
+empty mapping leaves SQLite's defaults), and `SQLITE_POOL_SIZE` and
+`SQLITE_MAX_OVERFLOW` size each worker's pool. Options given in
+`SQLALCHEMY_ENGINE_OPTIONS` take precedence.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_SQLITE_PRAGMAS = {
+    # Readers no longer wait for writers, and commits append to the log
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power loss can only lose the last commits
+    'synchronous': 'NORMAL',
+    # Wait up to 5 s for a lock held by another worker before failing
+    'busy_timeout': 5000,
+    # 64 MiB page cache per connection (negative values are in KiB)
+    'cache_size': -64000,
+    # Read the database through a 256 MiB memory map
+    'mmap_size': 268435456,
+    # Keep temporary tables and sort indexes in memory
+    'temp_store': 'MEMORY',
+}
+
+# Connections kept open by each worker, and extra ones allowed under load
+DEFAULT_SQLITE_POOL_SIZE = 5
+DEFAULT_SQLITE_MAX_OVERFLOW = 10
+
+
+def is_sqlite_file(uri):
+    """Return True if a database URI names an SQLite file."""
+    url = make_url(uri)
+    return (
+        url.get_backend_name() == 'sqlite'
+        and url.database not in (None, '', ':memory:')
+    )
+
+
+def configure_sqlite_engine(app):
+    """
+    Set the engine options of an SQLite file database before it is created.
+
+    Call before `db.init_app`. Databases that are not SQLite files, such as
+    in-memory test databases, keep SQLAlchemy's default pool.
+
+    Parameters
+    ----------
+    app : Flask
+        The Flask application.
+    """
+    if not is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('poolclass', QueuePool)
+    options.setdefault('pool_size', app.config.get(
+        'SQLITE_POOL_SIZE', DEFAULT_SQLITE_POOL_SIZE
+    ))
+    options.setdefault('max_overflow', app.config.get(
+        'SQLITE_MAX_OVERFLOW', DEFAULT_SQLITE_MAX_OVERFLOW
+    ))
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Set pragmas on every new connection of an SQLite engine.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        The engine. Engines of other databases are left alone.
+    pragmas : dict
+        Values keyed by pragma name, e.g. `DEFAULT_SQLITE_PRAGMAS`. Nothing
+        is set when empty or None.
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    statements = [
+        f'PRAGMA {name} = {value}' for name, value in pragmas.items()
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
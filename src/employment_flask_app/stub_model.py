@@ -0,0 +1,91 @@
+"""
+Offline stand-in for the Gemini client used by `predict_employment_data`.
+
+Setting `PREDICTION_MODEL_CLIENT = 'stub'` makes predictions come from
+`StubModelClient`, which needs no API key or network. It reads the region,
+occupation type and historical rows back out of the prompt and answers in
+the format the prompt asks for: a fixed account of a local forecast, or a
+forecast made with `linear_forecast` when the model is asked to forecast.
+The stub is meant for tests and offline development of the prediction
+pages.
+"""
+import ast
+import re
+
+import pandas as pd
+
+from employment_flask_app.forecasting import (
+    FORECAST_COLUMNS,
+    forecast_table,
+    linear_forecast
+)
+
+
+class StubResponse:
+    """The part of a `GenerateContentResponse` the app reads."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModels:
+    """Answers `generate_content` calls without contacting a model."""
+
+    def generate_content(self, model, contents, config=None):
+        return StubResponse(stub_prediction_text(contents))
+
+
+class StubModelClient:
+    """Drop-in replacement for `genai.Client` in `predict_employment_data`."""
+
+    def __init__(self, api_key=None):
+        self.models = StubModels()
+
+
+def stub_prediction_text(prompt):
+    """
+    Return an answer in the format requested by a prediction prompt.
+
+    Parameters
+    ----------
+    prompt : str
+        A prompt built by `build_forecast_prompt` or
+        `build_narrative_prompt`.
+
+    Returns
+    -------
+    str
+        For a forecast prompt, Markdown with a forecast table and a JSON
+        array of forecast rows; for a narrative prompt, a short account.
+    """
+    region, occupation_type = re.search(
+        r'Historical data for (.*) \((.*)\):', prompt
+    ).groups()
+    years = re.search(r'one prediction per year for \[([\d, ]*)\]', prompt)
+    if years is None:
+        return (
+            f'I will analyze the provided employment data for {region} '
+            f'({occupation_type}) and explain the forecast.\n\n'
+            f'**Trend Analysis & Forecasting Method**\n\n'
+            f'This account was written by the offline stub model. The '
+            f'forecast follows the linear trend of the historical data.\n'
+        )
+
+    history = pd.DataFrame(
+        ast.literal_eval(re.search(
+            r'Historical data for .*:\s*(\[.*?\])\n', prompt
+        ).group(1)),
+        columns=FORECAST_COLUMNS
+    )
+    forecast = linear_forecast(
+        history, [int(year) for year in years.group(1).split(',')]
+    )
+    return (
+        f'I will analyze the provided employment data for {region} '
+        f'({occupation_type}) and generate a forecast with the offline '
+        f'stub model.\n\n'
+        f'**Final Forecast Table**\n\n'
+        f'{forecast_table(forecast)}\n\n'
+        f'**DataFrame Output:**\n\n'
+        f'{forecast.to_json(orient="records")}\n'
+    )
@@ -126,12 +126,12 @@ sample_df = pd.read_csv(StringIO(csv_data))
 
 
 @pytest.fixture(scope='function')
-def app():
+def app(tmp_path):
     """
     Fixture to set up and tear down a Flask application for testing.
 
     This fixture creates a Flask application instance with a testing
-    configuration, including an in-memory SQLite database. It initializes the
+    configuration, including a temporary SQLite database. It initializes the
     database, inserts sample employment data, and ensures proper cleanup after
     each test.
 
@@ -148,10 +148,14 @@ def app():
     and the database engine is disposed to ensure a clean state for subsequent
     tests.
     """
-    app = create_app()
-    app.config.update({
+    # Tests seed the bundled dataset themselves where they need it. The
+    # database is configured before create_app binds the engine, so the
+    # tests never touch the instance database; it is a file rather than
+    # in memory so background workers share it.
+    app = create_app({
         "TESTING": True,
-        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "SEED_EMPLOYMENT_DATA": False,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.sqlite'}",
         "SQLALCHEMY_TRACK_MODIFICATIONS": False
     })
 
@@ -160,6 +164,13 @@ def app():
         insert_employment_data(sample_df, db, EmploymentData)
     yield app
 
+    # Let background imports and predictions started by the test finish
+    # before cleaning up
+    for name in ('import_jobs', 'prediction_jobs'):
+        executor = app.extensions.get(name)
+        if executor:
+            executor.shutdown(wait=True)
+
     with app.app_context():
         db.session.close()
         db.drop_all()
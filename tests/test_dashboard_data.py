@@ -0,0 +1,203 @@
+from dash import no_update
+from employment_flask_app.dash_app import callbacks
+from employment_flask_app.dash_app.disparity_cube import DisparityCube
+from employment_flask_app.dash_app.filter_data_functions import (
+    filter_dataframe,
+    get_disparity_df
+)
+from employment_flask_app.dataset_store import (
+    get_dashboard_dataset,
+    get_dataset
+)
+
+new_row = {
+    "RegionName": "Test Region",
+    "Year": 2021,
+    "Gender": "Female",
+    "OccupationType": "1: managers, directors and senior officials",
+    "EmploymentPercentage": 4.5,
+    "MarginofErrorPercentage": 0.04,
+    "Longitude": -3.62985,
+    "Latitude": 52.441543
+}
+
+
+def test_dashboard_falls_back_to_bundled_data(app):
+    """
+    GIVEN an app whose EmploymentData table is empty
+    WHEN the dashboard dataset is filtered inside the app context
+    THEN the bundled dataset is used
+    """
+    # ARRANGE: Make sure the table is empty
+    with app.app_context():
+        from employment_flask_app import db
+        from employment_flask_app.models import EmploymentData
+        db.session.query(EmploymentData).delete()
+        db.session.commit()
+
+        # ACT: Filter the dashboard data by region
+        wales_df = filter_dataframe(region='Wales')
+
+    # ASSERT: The bundled Wales rows are returned
+    assert len(wales_df) == 54
+
+
+def test_dashboard_reloads_after_add_row(app, client):
+    """
+    GIVEN a dashboard dataset that has already been cached
+    WHEN a row is added through the '/datatable/add' endpoint
+    THEN the data version moves on and the dashboard sees the new row
+    """
+    # ARRANGE: Warm the dashboard cache and remember its version
+    with app.app_context():
+        old_version = get_dashboard_dataset().attrs['version']
+
+    # ACT: Add a row for a new region
+    response = client.post('/datatable/add', json=new_row)
+
+    # ASSERT: The version changed and the new row is visible
+    assert response.status_code == 200
+    with app.app_context():
+        assert get_dashboard_dataset().attrs['version'] > old_version
+        assert len(filter_dataframe(region='Test Region')) == 1
+
+
+def test_indexed_filter_matches_boolean_masks():
+    """
+    GIVEN the bundled dataset
+    WHEN it is filtered through the position index
+    THEN the rows and row labels match filtering with boolean masks
+    """
+    # ARRANGE: Build the expected result with plain boolean masks
+    df = get_dataset()
+    cases = [
+        {'region': 'Wales', 'year': '2022'},
+        {'year': 2021, 'occupation_prefix': '3:'},
+        {'region': 'England', 'year': 2023, 'gender': 'Male'},
+        {'occupation_prefix': '2: prof'},
+        {'region': 'Nowhere'},
+    ]
+    for filters in cases:
+        expected = df
+        if 'region' in filters:
+            expected = expected[expected['Region'] == filters['region']]
+        if 'year' in filters:
+            expected = expected[expected['Year'] == int(filters['year'])]
+        if 'occupation_prefix' in filters:
+            expected = expected[expected['Occupation Type'].str.startswith(
+                filters['occupation_prefix']
+            )]
+        if 'gender' in filters:
+            expected = expected[expected['Gender'] == filters['gender']]
+
+        # ACT: Filter through the index
+        result = filter_dataframe(**filters)
+
+        # ASSERT: Same rows in the same order
+        assert result.equals(expected), filters
+        assert result.index.equals(expected.index), filters
+
+
+def test_disparity_pivot_is_shared_until_data_changes(app, client):
+    """
+    GIVEN a disparity pivot computed for a region and year
+    WHEN the same selection is requested again, then after a row is added
+    THEN the cached pivot is reused until the data version changes
+    """
+    # ARRANGE: Compute the pivot once through two equivalent selections
+    with app.app_context():
+        first = get_disparity_df(region='Wales', year='2021')
+
+        # ACT: Request the same selection with the year as an int
+        second = get_disparity_df(region='Wales', year=2021)
+
+    # ACT: Change the data
+    client.post('/datatable/add', json=new_row)
+    with app.app_context():
+        third = get_disparity_df(region='Wales', year=2021)
+
+    # ASSERT: Same object before the change, recomputed after it
+    assert second is first
+    assert third is not first
+
+
+def test_disparity_cube_matches_pivots():
+    """
+    GIVEN the bundled dataset
+    WHEN a disparity cube is built from it
+    THEN its lookups match the pandas pivots for every region and year
+    """
+    # ARRANGE: Build the cube
+    df = get_dataset()
+    cube = DisparityCube(df)
+
+    for region in df['Region'].unique():
+        for year in df['Year'].unique():
+            # ACT: Compute the same values through the disparity pivot
+            disparity_df = get_disparity_df(region=region, year=year)
+            disparity_row = disparity_df.loc[
+                disparity_df['Disparity'].idxmax()
+            ]
+            total_row = disparity_df.loc[
+                disparity_df['Total Employment'].idxmax()
+            ]
+
+            # ASSERT: The cube agrees with the pivots
+            assert cube.highest_disparity_occupation(region, year) == (
+                disparity_row['Occupation Type'], disparity_row['Disparity']
+            )
+            assert cube.highest_total_employment_occupation(
+                region, year
+            ) == (total_row['Occupation Type'], total_row['Total Employment'])
+
+
+def test_batched_summary_stats_match_standalone_callbacks():
+    """
+    GIVEN a complete region, year and occupation selection
+    WHEN the batched summary statistics callback runs
+    THEN it returns what the standalone card callbacks return
+    """
+    # ARRANGE: Pick a selection and compute each card separately
+    region, year, occupation = 'Wales', 2021, 2
+    expected = (
+        callbacks.update_selected_filters_for_gender_stats(region, year)
+        + callbacks.update_selected_filters_for_occ_stats(
+            region, year, occupation
+        )
+        + callbacks.update_highest_disparity_region(occupation, year)
+        + callbacks.update_highest_disparity_occupation_for_selected_region(
+            region, year
+        )
+        + callbacks.update_highest_overall_employment_occupation(
+            region, year
+        )
+        + callbacks.update_highest_male_employment_occupation(region, year)
+        + callbacks.update_highest_female_employment_occupation(region, year)
+    )
+
+    # ACT: Compute every card in one call
+    result = callbacks.update_summary_stats(region, year, occupation)
+
+    # ASSERT: Same values, one per registered output
+    assert result == expected
+    assert len(result) == len(callbacks.SUMMARY_STATS_OUTPUTS)
+
+
+def test_batched_summary_stats_skip_incomplete_cards():
+    """
+    GIVEN a region and year but no occupation
+    WHEN the batched summary statistics callback runs
+    THEN the occupation cards are left unchanged and the others update
+    """
+    # ACT: Run the callback without an occupation
+    result = dict(zip(
+        callbacks.SUMMARY_STATS_OUTPUTS,
+        callbacks.update_summary_stats('Wales', 2021, None)
+    ))
+
+    # ASSERT: Occupation cards untouched, region cards filled in
+    assert result[('selected-occupation-type', 'children')] is no_update
+    assert result[('highest-disparity-region', 'children')] is no_update
+    assert result[('gen-selected-region', 'children')] == 'Wales'
+    assert result[('highest-male-employment-occupation', 'children')] \
+        is not no_update
@@ -0,0 +1,127 @@
+from employment_flask_app import dataset_store
+
+
+def test_dataset_loaded_once(monkeypatch):
+    """
+    GIVEN an empty dataset store
+    WHEN the dataset is requested several times
+    THEN the workbook is only parsed once
+    """
+    # ARRANGE: Reset the store and count calls to the loader
+    calls = []
+    original_load = dataset_store.load_dataset
+
+    def counting_load(*args, **kwargs):
+        calls.append(1)
+        return original_load(*args, **kwargs)
+
+    monkeypatch.setattr(dataset_store, 'load_dataset', counting_load)
+    dataset_store.clear_dataset()
+
+    # ACT: Request the dataset repeatedly
+    first = dataset_store.get_dataset()
+    second = dataset_store.get_dataset()
+
+    # ASSERT: Loaded once and both views contain the same data
+    assert len(calls) == 1
+    assert first.equals(second)
+
+
+def test_dataset_view_is_isolated():
+    """
+    GIVEN a view of the shared dataset
+    WHEN a consumer adds a column to its view
+    THEN other views of the dataset are not affected
+    """
+    # ARRANGE: Take a view of the dataset
+    view = dataset_store.get_dataset()
+
+    # ACT: Add a derived column to the view
+    view['Short Occupation Type'] = (
+        view[dataset_store.OCCUPATION_COL].str.split(':').str[0]
+    )
+
+    # ASSERT: A fresh view does not see the new column
+    assert 'Short Occupation Type' not in dataset_store.get_dataset().columns
+    assert dataset_store.get_dataset()[dataset_store.YEAR_COL].dtype == 'int64'
+
+
+def test_sidecar_written_and_reused(tmp_path, monkeypatch):
+    """
+    GIVEN a copy of the bundled workbook without a sidecar
+    WHEN the dataset is loaded twice
+    THEN the first load writes the sidecar and the second load reads it
+    instead of parsing the workbook
+    """
+    # ARRANGE: Copy the workbook to a temporary directory
+    workbook = tmp_path / 'employment_prepared.xlsx'
+    workbook.write_bytes(dataset_store.data_path.read_bytes())
+
+    # ACT: Load once to build the sidecar
+    from_workbook = dataset_store.load_dataset(workbook)
+
+    # ACT: Load again with workbook parsing disabled
+    def fail_read_workbook(*args, **kwargs):
+        raise AssertionError('workbook should not be parsed')
+
+    monkeypatch.setattr(dataset_store, 'read_workbook', fail_read_workbook)
+    from_cache = dataset_store.load_dataset(workbook)
+
+    # ASSERT: Sidecar exists and both loads agree, categoricals included
+    assert dataset_store.cache_path_for(workbook).exists()
+    assert from_cache.equals(from_workbook)
+    assert from_cache[dataset_store.REGION_COL].dtype == 'category'
+
+
+def test_corrupt_sidecar_falls_back_to_workbook(tmp_path):
+    """
+    GIVEN a workbook whose sidecar is corrupt
+    WHEN the dataset is loaded
+    THEN the workbook is parsed and the sidecar is rewritten
+    """
+    # ARRANGE: Copy the workbook and write garbage to its sidecar
+    workbook = tmp_path / 'employment_prepared.xlsx'
+    workbook.write_bytes(dataset_store.data_path.read_bytes())
+    cache_path = dataset_store.cache_path_for(workbook)
+    cache_path.write_bytes(b'not a numpy archive')
+
+    # ACT: Load the dataset
+    df = dataset_store.load_dataset(workbook)
+
+    # ASSERT: The data loaded and the sidecar is readable again
+    assert not df.empty
+    assert dataset_store.read_cache(cache_path).equals(df)
+
+
+def test_seed_employment_data_runs_once(app, client, runner, monkeypatch):
+    """
+    GIVEN an app whose employment table is empty
+    WHEN pages are viewed, then the table is seeded several times
+    THEN page views do not seed, the first seed loads the bundled dataset
+    and later seeds leave the table alone
+    """
+    from employment_flask_app import db
+    from employment_flask_app.models import EmploymentData
+
+    # ARRANGE: Forget any database this process has already seeded
+    monkeypatch.setattr(dataset_store, '_seeded_databases', set())
+
+    # ACT: View the pages, then seed through the command and at startup
+    client.get('/')
+    client.get('/datatable')
+    with app.app_context():
+        rows_after_views = db.session.query(EmploymentData).count()
+    seeded = runner.invoke(args=['seed-employment-data'])
+    reseeded = runner.invoke(args=['seed-employment-data'])
+    with app.app_context():
+        startup = dataset_store.seed_employment_data()
+        rows = db.session.query(EmploymentData).count()
+
+    # ASSERT: Only the first seed inserted the dataset
+    assert rows_after_views == 0
+    assert seeded.output == (
+        f'Seeded {len(dataset_store.get_dataset())} employment rows.\n'
+    )
+    assert reseeded.output == 'The employment table already has rows.\n'
+    assert startup == 0
+    assert rows == len(dataset_store.get_dataset())
@@ -0,0 +1,64 @@
+def datatable_args(**overrides):
+    """Build the query string DataTables sends for the first page."""
+    args = {
+        'draw': 1,
+        'start': 0,
+        'length': 10,
+        'order[0][column]': 4,
+        'order[0][dir]': 'asc',
+        'search[value]': ''
+    }
+    args.update(overrides)
+    return args
+
+
+def test_datatable_data_returns_one_page(client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN the second page is requested in server-side mode
+    THEN only that page is returned, ordered by the requested column, with
+    the total row count
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+
+    # ACT: Request the first two pages
+    first = client.get(
+        '/datatable/data', query_string=datatable_args()
+    ).json
+    second = client.get(
+        '/datatable/data', query_string=datatable_args(draw=2, start=10)
+    ).json
+
+    # ASSERT: Pages have the requested size, follow on and echo the draw
+    assert second['draw'] == 2
+    assert len(second['data']) == 10
+    assert second['recordsTotal'] == second['recordsFiltered'] > 20
+    percentages = [row[4] for row in first['data'] + second['data']]
+    assert percentages == sorted(percentages)
+
+
+def test_datatable_data_searches(client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN the table is searched globally and through a footer filter
+    THEN only matching rows are counted and returned
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+
+    # ACT: Search all columns, then filter the year column
+    searched = client.get(
+        '/datatable/data',
+        query_string=datatable_args(**{'search[value]': 'Wales'})
+    ).json
+    filtered = client.get(
+        '/datatable/data',
+        query_string=datatable_args(**{'columns[1][search][value]': '2022'})
+    ).json
+
+    # ASSERT: Counts shrink and every returned row matches
+    assert 0 < searched['recordsFiltered'] < searched['recordsTotal']
+    assert all('Wales' in row[0] for row in searched['data'])
+    assert 0 < filtered['recordsFiltered'] < filtered['recordsTotal']
+    assert all(row[1] == 2022 for row in filtered['data'])
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from employment_flask_app.forecasting import FORECAST_COLUMNS, linear_forecast
+
+
+def history_rows(series):
+    """Build historical rows from {(region, gender): [(year, pct), ...]}."""
+    return pd.DataFrame([
+        {
+            'RegionName': region, 'Year': year, 'Gender': gender,
+            'OccupationType': '2: professional occupations',
+            'EmploymentPercentage': percentage,
+            'MarginofErrorPercentage': 0.1 * year % 1,
+            'Longitude': -1.5, 'Latitude': 53.0
+        }
+        for (region, gender), points in series.items()
+        for year, percentage in points
+    ], columns=FORECAST_COLUMNS)
+
+
+def test_linear_forecast_matches_least_squares():
+    """
+    GIVEN the history of several region and gender series
+    WHEN they are forecast together
+    THEN every series follows its own least-squares line
+    """
+    # ARRANGE: Three series with different trends and lengths
+    series = {
+        ('England', 'Male'): [(2019, 7.1), (2020, 7.4), (2021, 7.2),
+                              (2022, 7.9)],
+        ('England', 'Female'): [(2020, 4.0), (2021, 3.5), (2022, 3.1)],
+        ('Wales', 'Male'): [(2021, 6.0), (2022, 6.5)]
+    }
+
+    # ACT: Forecast the next three years
+    forecast = linear_forecast(history_rows(series), [2023, 2024, 2025])
+
+    # ASSERT: Each series matches numpy.polyfit, rounded to 2 places
+    assert list(forecast.columns) == FORECAST_COLUMNS
+    assert len(forecast) == 9
+    for (region, gender), points in series.items():
+        years, percentages = zip(*points)
+        expected = np.round(np.polyval(
+            np.polyfit(years, percentages, 1), [2023, 2024, 2025]
+        ), 2)
+        rows = forecast[
+            (forecast['RegionName'] == region)
+            & (forecast['Gender'] == gender)
+        ]
+        assert rows['Year'].tolist() == [2023, 2024, 2025]
+        np.testing.assert_allclose(rows['EmploymentPercentage'], expected)
+
+
+def test_linear_forecast_single_year_and_floor():
+    """
+    GIVEN a series with one year of history and one falling steeply
+    WHEN they are forecast
+    THEN the first stays flat and the second stops at zero
+    """
+    # ARRANGE: A single-year series and a steeply falling one
+    history = history_rows({
+        ('England', 'Male'): [(2022, 5.0)],
+        ('England', 'Female'): [(2021, 2.0), (2022, 1.0)]
+    })
+
+    # ACT: Forecast three years
+    forecast = linear_forecast(history, [2023, 2024, 2025])
+
+    # ASSERT: Flat at 5.0, and 0.0 once the trend would go below zero
+    by_gender = forecast.groupby('Gender')['EmploymentPercentage'].apply(list)
+    assert by_gender['Male'] == [5.0, 5.0, 5.0]
+    assert by_gender['Female'] == [0.0, 0.0, 0.0]
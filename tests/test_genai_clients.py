@@ -0,0 +1,65 @@
+from employment_flask_app.genai_clients import GenaiClientRegistry
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_client_reused_per_api_key():
+    """
+    GIVEN a client registry
+    WHEN clients are requested for the same and for different API keys
+    THEN each key is given one client, built once
+    """
+    # ARRANGE: Count the clients built
+    built = []
+    registry = GenaiClientRegistry(
+        factory=lambda api_key: built.append(api_key) or object()
+    )
+
+    # ACT: Request clients for two keys, one of them twice
+    server = registry.get('server-key')
+    again = registry.get('server-key')
+    user = registry.get('user-key')
+
+    # ASSERT: Two clients were built and the first was reused
+    assert server is again
+    assert server is not user
+    assert built == ['server-key', 'user-key']
+
+
+def test_clients_evicted_when_full_or_idle():
+    """
+    GIVEN a registry of at most two clients dropped after 60 idle seconds
+    WHEN a third key is used, and later a key goes unused for too long
+    THEN the least recently used client, then the idle one, are dropped
+    """
+    # ARRANGE: Build a small registry with a controllable clock
+    clock = FakeClock()
+    registry = GenaiClientRegistry(
+        max_clients=2, idle_timeout=60,
+        factory=lambda api_key: object(), clock=clock
+    )
+    a = registry.get('a')
+    registry.get('b')
+    registry.get('a')
+
+    # ACT: Use a third key, then let 'a' go idle while 'c' is in use
+    registry.get('c')
+    full = len(registry)
+    clock.now = 50
+    c = registry.get('c')
+    clock.now = 100
+    registry.get('c')
+
+    # ASSERT: 'b' was evicted when full and 'a' once idle
+    assert full == 2
+    assert len(registry) == 1
+    assert registry.get('c') is c
+    assert registry.get('a') is not a
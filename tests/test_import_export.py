@@ -1,6 +1,29 @@
 from io import BytesIO
+import time
+import pandas as pd
+from employment_flask_app import db
+from employment_flask_app.datatable_functions import (
+    stream_csv_export,
+    write_xlsx_export
+)
+from employment_flask_app.models import EmploymentData
+from employment_flask_app.route_functions import (
+    read_employment_file,
+    upsert_employment_chunks
+)
 
 
+
+def wait_for_import(client, status_url, timeout=10):
+    """Poll an import job until it has finished and return its status."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url).json
+        if job['Status'] not in ('queued', 'running'):
+            return job
+        assert time.monotonic() < deadline, 'Import did not finish in time'
+        time.sleep(0.05)
+
 def test_import_data(app, client, session):
     """
     GIVEN a Flask application configured for testing
@@ -29,6 +52,141 @@ def test_import_data(app, client, session):
     assert response.status_code == 200
 
 
+
+def test_import_xlsx_in_chunks(app, client):
+    """
+    GIVEN an XLSX file with five rows of employment data
+    WHEN it is read in chunks of two rows and uploaded via '/datatable'
+    THEN the chunks cover every row and every row is inserted
+    """
+    # ARRANGE: Disable CSRF and build a small workbook
+    app.config['WTF_CSRF_ENABLED'] = False
+    upload_df = pd.DataFrame({
+        'Region': [f'ChunkRegion{i}' for i in range(5)],
+        'Year': [2025] * 5,
+        'Gender': ['Female'] * 5,
+        'Occupation Type': ['TestOccupation'] * 5,
+        'Percentage Employed (Relative to Total Employment in the Year)': [
+            10.0, 20.0, 30.0, 40.0, 50.0
+        ],
+        'Margin of Error (%)': [0.1] * 5,
+        'Latitude': [51.5] * 5,
+        'Longitude': [-0.12] * 5
+    })
+    workbook = BytesIO()
+    upload_df.to_excel(workbook, index=False)
+
+    # ACT: Read the workbook in chunks, then upload it and wait for the
+    # background import
+    chunks = list(read_employment_file(
+        BytesIO(workbook.getvalue()), 'test.xlsx', chunksize=2
+    ))
+    response = client.post(
+        '/datatable',
+        data={
+            'file': (BytesIO(workbook.getvalue()), 'test.xlsx'),
+            'submit': 'Upload File'
+        },
+        content_type='multipart/form-data',
+        headers={'Accept': 'application/json'}
+    )
+    job = wait_for_import(client, response.json['status_url'])
+
+    # ASSERT: Three chunks were read and all five rows were stored
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert response.status_code == 202
+    assert job['Status'] == 'completed'
+    assert job['RowsParsed'] == job['RowsInserted'] == 5
+    with app.app_context():
+        stored = db.session.query(EmploymentData).filter(
+            EmploymentData.RegionName.startswith('ChunkRegion')
+        ).count()
+    assert stored == 5
+
+
+def test_import_job_reports_rejected_rows(app, client):
+    """
+    GIVEN a CSV file that has already been imported
+    WHEN it is uploaded again with existing rows rejected
+    THEN the import job fails and reports every row as rejected
+    """
+    # ARRANGE: Disable CSRF and import the file once
+    app.config['WTF_CSRF_ENABLED'] = False
+    csv_file = (
+        b'Region,Year,Gender,Occupation Type,Percentage Employed '
+        b'(Relative to Total Employment in the Year),Margin of Error '
+        b'(%),Latitude,Longitude\n'
+        b'JobRegion,2025,Female,TestOccupation,50.0,5.0,40.7128,-74.0060\n'
+        b'JobRegion,2025,Male,TestOccupation,40.0,5.0,40.7128,-74.0060\n'
+    )
+
+    def upload(on_duplicate):
+        response = client.post(
+            '/datatable',
+            data={
+                'file': (BytesIO(csv_file), 'test.csv'),
+                'on_duplicate': on_duplicate,
+                'submit': 'Upload File'
+            },
+            content_type='multipart/form-data',
+            headers={'Accept': 'application/json'}
+        )
+        return wait_for_import(client, response.json['status_url'])
+
+    first = upload('ignore')
+
+    # ACT: Upload the same file again, rejecting existing rows
+    second = upload('reject')
+
+    # ASSERT: The first import stored both rows, the second none
+    assert first['Status'] == 'completed'
+    assert first['RowsInserted'] == 2
+    assert second['Status'] == 'failed'
+    assert second['RowsParsed'] == second['RowsRejected'] == 2
+    assert second['RowsInserted'] == 0
+    assert second['Error']
+
+
+def test_upsert_counts_new_and_existing_rows(app):
+    """
+    GIVEN three rows already stored in the database
+    WHEN an upload with two of those rows and two new ones is inserted in
+    ignore mode, then again in update mode
+    THEN only the new rows are inserted and the existing ones are counted as
+    skipped or updated
+    """
+    # ARRANGE: Build four rows and store the first three
+    df = pd.DataFrame({
+        'Region': [f'UpsertRegion{i}' for i in range(4)],
+        'Year': [2025] * 4,
+        'Gender': ['Male'] * 4,
+        'Occupation Type': ['TestOccupation'] * 4,
+        'Percentage Employed (Relative to Total Employment in the Year)': [
+            1.0, 2.0, 3.0, 4.0
+        ],
+        'Margin of Error (%)': [0.1] * 4,
+        'Latitude': [51.5] * 4,
+        'Longitude': [-0.12] * 4
+    })
+    with app.app_context():
+        upsert_employment_chunks([df.iloc[:3]], db, EmploymentData)
+
+        # ACT: Upload rows 1-3 with conflicts skipped, then updated
+        ignored = upsert_employment_chunks(
+            [df.iloc[1:2], df.iloc[2:]], db, EmploymentData
+        )
+        updated = upsert_employment_chunks(
+            [df], db, EmploymentData, on_conflict='update'
+        )
+        stored = db.session.query(EmploymentData).filter(
+            EmploymentData.RegionName.startswith('UpsertRegion')
+        ).count()
+
+    # ASSERT: One new row inserted, nothing duplicated
+    assert ignored == {'inserted': 1, 'skipped': 2, 'updated': 0}
+    assert updated == {'inserted': 0, 'skipped': 0, 'updated': 4}
+    assert stored == 4
+
 def test_export_csv(client):
     """
     GIVEN a Flask application with data available for export
@@ -64,3 +222,51 @@ def test_export_xlsx(client):
     assert response.content_type == (
         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
+
+
+def test_export_csv_streams_in_batches(app, client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN the table is exported as CSV in small batches
+    THEN the rows arrive in several chunks that add up to the whole table
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+
+    # ACT: Stream the export five rows at a time
+    with app.app_context():
+        chunks = list(stream_csv_export(db.session, batch_size=5))
+        row_count = db.session.query(EmploymentData).count()
+
+    # ASSERT: Header chunk, one chunk per batch, every row written once
+    lines = ''.join(chunks).splitlines()
+    assert lines[0].startswith('DataID,RegionName,Year')
+    assert len(lines) == row_count + 1
+    assert len(chunks) == 1 + -(-row_count // 5)
+
+
+def test_export_xlsx_reports_progress(app, client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN the table is written to a write-only workbook in small batches
+    THEN progress is reported after each batch and the workbook holds every
+    row
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+    output = BytesIO()
+    progress = []
+
+    # ACT: Write the workbook five rows at a time
+    with app.app_context():
+        rows_written = write_xlsx_export(
+            db.session, output, batch_size=5, progress=progress.append
+        )
+        row_count = db.session.query(EmploymentData).count()
+
+    # ASSERT: Progress grows to the row count and the workbook reads back
+    assert rows_written == row_count
+    assert progress == sorted(progress) and progress[-1] == row_count
+    df = pd.read_excel(BytesIO(output.getvalue()))
+    assert len(df) == row_count
+    assert list(df.columns[:3]) == ['DataID', 'RegionName', 'Year']
@@ -0,0 +1,104 @@
+from sqlalchemy import create_engine, inspect
+from employment_flask_app.migrations import (
+    create_employment_indexes,
+    upgrade_employment_dimensions
+)
+from employment_flask_app.models import (
+    EMPLOYMENT_COLUMNS,
+    EmploymentData,
+    RegionDimension,
+    select_employment_rows
+)
+
+legacy_schema = """
+CREATE TABLE employment_data (
+    "DataID" INTEGER NOT NULL PRIMARY KEY,
+    "RegionName" VARCHAR(50) NOT NULL,
+    "Year" INTEGER NOT NULL,
+    "Gender" VARCHAR(50) NOT NULL,
+    "OccupationType" VARCHAR(50) NOT NULL,
+    "EmploymentPercentage" FLOAT NOT NULL,
+    "MarginofErrorPercentage" FLOAT NOT NULL,
+    "Longitude" FLOAT NOT NULL,
+    "Latitude" FLOAT NOT NULL,
+    CONSTRAINT unique_employment_data UNIQUE (
+        "RegionName", "Year", "Gender", "OccupationType",
+        "EmploymentPercentage", "MarginofErrorPercentage", "Longitude",
+        "Latitude"
+    )
+)
+"""
+
+legacy_rows = [
+    (5, 'Wales', 2021, 'Male', '1: managers', 1.5, 0.1, -3.6, 52.4),
+    (9, 'Wales', 2022, 'Female', '2: professional', 2.5, 0.1, -3.6, 52.4),
+    (12, 'England', 2021, 'Male', '1: managers', 3.5, 0.1, -1.5, 53.1)
+]
+
+
+def test_upgrade_moves_text_columns_to_dimensions():
+    """
+    GIVEN a database whose employment table stores text columns on every row
+    WHEN the dimension upgrade runs twice
+    THEN the rows are kept with the same ids and values, each text value is
+    stored once, and the second run does nothing
+    """
+    # ARRANGE: Create the old table with three rows
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.exec_driver_sql(legacy_schema)
+        connection.exec_driver_sql(
+            'INSERT INTO employment_data VALUES '
+            + ', '.join(['(?, ?, ?, ?, ?, ?, ?, ?, ?)'] * len(legacy_rows)),
+            tuple(value for row in legacy_rows for value in row)
+        )
+
+    # ACT: Run the upgrade, then run it again
+    with engine.begin() as connection:
+        first = upgrade_employment_dimensions(connection)
+    with engine.begin() as connection:
+        second = upgrade_employment_dimensions(connection)
+        rows = connection.execute(
+            select_employment_rows(
+                EmploymentData.DataID, *EMPLOYMENT_COLUMNS.values()
+            ).order_by(EmploymentData.DataID)
+        ).all()
+        regions = connection.execute(
+            RegionDimension.__table__.select()
+        ).all()
+
+    # ASSERT: Same rows, two regions, nothing left to do the second time
+    assert first is True
+    assert second is False
+    assert [tuple(row) for row in rows] == legacy_rows
+    assert sorted(name for _, name in regions) == ['England', 'Wales']
+
+
+def test_missing_indexes_are_created():
+    """
+    GIVEN an employment table created before its composite indexes existed
+    WHEN the index upgrade runs twice
+    THEN every index declared on the model is created once
+    """
+    # ARRANGE: Create the table, then drop the model's indexes
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        EmploymentData.metadata.create_all(connection)
+        for index in EmploymentData.__table__.indexes:
+            index.drop(connection)
+
+    # ACT: Run the upgrade, then run it again
+    with engine.begin() as connection:
+        first = create_employment_indexes(connection)
+    with engine.begin() as connection:
+        second = create_employment_indexes(connection)
+        indexes = {
+            index['name']
+            for index in inspect(connection).get_indexes('employment_data')
+        }
+
+    # ASSERT: All indexes exist and nothing is left to do the second time
+    declared = {index.name for index in EmploymentData.__table__.indexes}
+    assert sorted(first) == sorted(declared)
+    assert second == []
+    assert declared <= indexes
@@ -1,3 +1,6 @@
+import time
+
+from employment_flask_app import prediction_jobs, route_functions
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
@@ -113,3 +116,114 @@ def test_predict_employment_trends(pred_emp_page, chrome_driver,
 
     assert result_table.is_displayed()
     assert result_graph.is_displayed()
+
+
+def wait_for_prediction(client, status_url, timeout=10):
+    """Poll a prediction job until it has finished and return its status."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url).json
+        if job['Status'] not in ('queued', 'running'):
+            return job
+        assert time.monotonic() < deadline, 'Prediction did not finish in time'
+        time.sleep(0.05)
+
+
+def test_prediction_runs_as_background_job(app, client, runner):
+    """
+    GIVEN the prediction page using the offline stub model
+    WHEN a valid prediction form is submitted
+    THEN a job is queued at once, and polling it returns the forecast and
+    its chart
+    """
+    # ARRANGE: Seed the table, disable CSRF and use the stub model
+    runner.invoke(args=['seed-employment-data'])
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PREDICTION_MODEL_CLIENT'] = 'stub'
+
+    # ACT: Submit the form, then poll the job
+    response = client.post(
+        '/predict_employment_trends',
+        data={
+            'region': 'England',
+            'no_of_years': 2,
+            'occupation_type': '2: professional occupations'
+        },
+        headers={'Accept': 'application/json'}
+    )
+    job = wait_for_prediction(client, response.json['status_url'])
+
+    # ASSERT: The job completed with a two-year forecast and a chart
+    assert response.status_code == 202
+    assert job['Status'] == 'completed'
+    assert job['EndYear'] == job['StartingYear'] + 1
+    assert 'England' in job['PredictionResult']
+    assert 'plotly' in job['GraphHtml']
+
+
+def test_unavailable_model_falls_back_to_local_forecast(app, client, runner,
+                                                      monkeypatch):
+    """
+    GIVEN a model client that fails, as on a quota error
+    WHEN a prediction is submitted
+    THEN its job completes with the local forecast and the model's error
+    """
+    # ARRANGE: Seed the table, disable CSRF and make the model client fail
+    runner.invoke(args=['seed-employment-data'])
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    def failing_client(api_key=None):
+        raise RuntimeError('429 RESOURCE_EXHAUSTED')
+
+    monkeypatch.setattr(route_functions, 'get_model_client', failing_client)
+
+    # ACT: Submit the form, then poll the job
+    response = client.post(
+        '/predict_employment_trends',
+        data={
+            'region': 'England',
+            'no_of_years': 1,
+            'occupation_type': '2: professional occupations'
+        },
+        headers={'Accept': 'application/json'}
+    )
+    job = wait_for_prediction(client, response.json['status_url'])
+
+    # ASSERT: The local forecast is shown along with the error
+    assert job['Status'] == 'completed'
+    assert 'computed locally' in job['PredictionResult']
+    assert '429 RESOURCE_EXHAUSTED' in job['PredictionResult']
+    assert 'plotly' in job['GraphHtml']
+
+
+def test_failed_prediction_job_reports_error(app, client, monkeypatch):
+    """
+    GIVEN a prediction that fails outright
+    WHEN it is submitted
+    THEN its job fails with the error message
+    """
+    # ARRANGE: Disable CSRF and make the prediction fail
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    def failing_prediction(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(
+        prediction_jobs, 'predict_employment_data', failing_prediction
+    )
+
+    # ACT: Submit the form, then poll the job
+    response = client.post(
+        '/predict_employment_trends',
+        data={
+            'region': 'Wales',
+            'no_of_years': 1,
+            'occupation_type': '2: professional occupations'
+        },
+        headers={'Accept': 'application/json'}
+    )
+    job = wait_for_prediction(client, response.json['status_url'])
+
+    # ASSERT: The error is reported on the job
+    assert job['Status'] == 'failed'
+    assert 'database is locked' in job['Error']
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pandas as pd
+
+from employment_flask_app import db, prediction_batch, route_functions
+from employment_flask_app.prediction_cache import prediction_cache_stats
+from employment_flask_app.stub_model import StubModelClient
+
+
+class SlowModels:
+    """Answers like the stub model after a pause, recording the peak number
+    of calls in flight."""
+
+    def __init__(self):
+        self.stub = StubModelClient().models
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def generate_content(self, model, contents, config=None):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(0.05)
+            if 'elementary occupations' in contents:
+                raise RuntimeError('429 RESOURCE_EXHAUSTED')
+            return self.stub.generate_content(model, contents, config)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_batch_forecasts_every_pair_in_one_table(app, client, runner):
+    """
+    GIVEN the seeded employment table and the offline stub model
+    WHEN a batch forecast of every region and occupation type is requested
+    THEN one table covers every pair, each pair has an account from the
+    model, and a single prediction of a pair reuses its cached account
+    """
+    # ARRANGE: Seed the table and use the stub model
+    runner.invoke(args=['seed-employment-data'])
+    app.config['PREDICTION_MODEL_CLIENT'] = 'stub'
+
+    # ACT: Forecast every pair, then predict one pair on its own
+    response = client.post(
+        '/predict_employment_trends/batch', json={'no_of_years': 2}
+    )
+    with app.app_context():
+        hits = prediction_cache_stats(db.session)['hits']
+        _, single_forecast, _, _ = route_functions.predict_employment_data(
+            'Wales', 2, '2: professional occupations'
+        )
+        single_hits = prediction_cache_stats(db.session)['hits'] - hits
+
+    # ASSERT: 4 regions x 9 occupation types x 2 genders x 2 years, all
+    # explained by the model, with the single prediction served from cache
+    batch = response.json
+    forecast = pd.DataFrame(batch['Forecast'])
+    assert response.status_code == 200
+    assert len(forecast) == 4 * 9 * 2 * 2
+    assert batch['EndYear'] == batch['StartingYear'] + 1
+    assert len(batch['Narratives']) == 4 * 9
+    assert {n['Source'] for n in batch['Narratives']} == {'model'}
+    assert single_hits == 1
+    wales = forecast[
+        (forecast['RegionName'] == 'Wales')
+        & (forecast['OccupationType'] == '2: professional occupations')
+    ]
+    assert (
+        wales['EmploymentPercentage'].tolist()
+        == single_forecast['EmploymentPercentage'].tolist()
+    )
+
+
+def test_batch_bounds_concurrent_model_calls(app, runner, monkeypatch):
+    """
+    GIVEN a slow model that fails for one occupation type, and a batch
+    concurrency of 2
+    WHEN a batch forecast of one region is made
+    THEN at most 2 model calls run at once, and the failed pair is
+    described locally
+    """
+    # ARRANGE: Seed the table and bound the batch's model calls
+    runner.invoke(args=['seed-employment-data'])
+    app.config['PREDICTION_BATCH_CONCURRENCY'] = 2
+    models = SlowModels()
+    monkeypatch.setattr(
+        prediction_batch, 'get_model_client',
+        lambda api_key=None: type('Client', (), {'models': models})()
+    )
+
+    # ACT: Forecast every occupation type of Wales
+    with app.app_context():
+        _, narratives, _, _ = prediction_batch.predict_employment_batch(
+            regions=['Wales']
+        )
+
+    # ASSERT: The calls overlapped up to the bound and no further
+    sources = {n['OccupationType']: n['Source'] for n in narratives}
+    assert models.peak == 2
+    assert sources.pop('9: elementary occupations') == 'local'
+    assert set(sources.values()) == {'model'}
+
+
+def test_batch_command_writes_combined_csv(app, runner, tmp_path):
+    """
+    GIVEN the seeded employment table
+    WHEN the batch command is run for two regions without model accounts
+    THEN the combined forecast of both regions is written to a CSV file
+    """
+    # ARRANGE: Seed the table
+    runner.invoke(args=['seed-employment-data'])
+    output = tmp_path / 'forecast.csv'
+
+    # ACT: Run the command
+    result = runner.invoke(args=[
+        'predict-employment-batch', '--years', '3', '--no-narrative',
+        '--region', 'Wales', '--region', 'Scotland', '--output', str(output)
+    ])
+
+    # ASSERT: Both regions' 9 occupation types and 2 genders, for 3 years
+    forecast = pd.read_csv(output)
+    assert result.exit_code == 0
+    assert len(forecast) == 2 * 9 * 2 * 3
+    assert set(forecast['RegionName']) == {'Wales', 'Scotland'}
@@ -0,0 +1,96 @@
+import json
+
+from employment_flask_app import db, genai_clients, route_functions
+from employment_flask_app.prediction_cache import (
+    prediction_cache_stats,
+    store_prediction
+)
+
+
+class FakeModels:
+    """Stands in for `genai.Client().models`, counting its calls."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def generate_content(self, model, contents, config):
+        self.calls.append(contents)
+        forecast = [{
+            'RegionName': 'London', 'Year': 2024, 'Gender': 'Male',
+            'OccupationType': '2: professional occupations',
+            'EmploymentPercentage': 12.5, 'MarginofErrorPercentage': 0.5,
+            'Longitude': -0.1, 'Latitude': 51.5
+        }]
+        return type('Response', (), {
+            'text': f'**DataFrame Output:**\n{json.dumps(forecast)}'
+        })()
+
+
+def fake_client(monkeypatch):
+    """Replace the genai client and return the list of prompts it gets."""
+    calls = []
+    monkeypatch.setattr(
+        genai_clients.genai, 'Client',
+        lambda api_key=None: type('Client', (), {
+            'models': FakeModels(calls)
+        })()
+    )
+    return calls
+
+
+def test_repeat_prediction_served_from_cache(app, client, monkeypatch):
+    """
+    GIVEN a prediction already made for a region and occupation type
+    WHEN the same prediction is requested again, with the additional
+    information spaced differently
+    THEN the model is called once and the cached prediction is returned
+    """
+    # ARRANGE: Replace the model with a fake
+    calls = fake_client(monkeypatch)
+
+    # ACT: Predict twice with the same inputs
+    with app.app_context():
+        first = route_functions.predict_employment_data(
+            'England', 1, '2: professional occupations', 'Rising demand'
+        )
+        second = route_functions.predict_employment_data(
+            'England', 1, '2: professional occupations', ' Rising  demand\n'
+        )
+    stats = client.get('/predict_employment_trends/cache').json
+
+    # ASSERT: The second prediction came from the cache
+    assert len(calls) == 1
+    assert first[0] == second[0]
+    assert first[1].equals(second[1])
+    assert first[2:] == second[2:]
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_prediction_cache_evicts_least_recently_used(app, monkeypatch):
+    """
+    GIVEN a prediction cache limited to two entries
+    WHEN a third prediction is stored
+    THEN the least recently used prediction is evicted
+    """
+    # ARRANGE: Limit the cache and make a forecast to store
+    app.config['PREDICTION_CACHE_MAX_ENTRIES'] = 2
+    calls = fake_client(monkeypatch)
+    with app.app_context():
+        route_functions.predict_employment_data(
+            'England', 1, '2: professional occupations'
+        )
+        _, forecast_data, _, _ = route_functions.predict_employment_data(
+            'England', 1, '2: professional occupations'
+        )
+
+        # ACT: Store two more predictions
+        store_prediction(db.session, 'b', 'B', forecast_data, 2024, 2024)
+        store_prediction(db.session, 'c', 'C', forecast_data, 2024, 2024)
+        stats = prediction_cache_stats(db.session)
+        route_functions.predict_employment_data(
+            'England', 1, '2: professional occupations'
+        )
+
+    # ASSERT: The first prediction was evicted and is made again
+    assert (stats['entries'], stats['evictions']) == (2, 1)
+    assert len(calls) == 2
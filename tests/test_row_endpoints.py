@@ -0,0 +1,183 @@
+from employment_flask_app import db
+from employment_flask_app.models import EmploymentData
+
+
+def first_row(client):
+    """Return the first datatable row, which ends with its DataID."""
+    return client.get('/datatable/data').json['data'][0]
+
+
+def test_edit_and_delete_row_by_id(app, client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN a row is edited and then deleted through its DataID
+    THEN only that row changes, and a second delete reports it is gone
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+    row = first_row(client)
+    data_id = row[8]
+
+    # ACT: Rename the row's region, then delete the row
+    edited = client.patch(
+        f'/datatable/rows/{data_id}', json={'RegionName': 'Edited Region'}
+    )
+    with app.app_context():
+        entry = db.session.get(EmploymentData, data_id)
+        edited_region, edited_year = entry.RegionName, entry.Year
+        matching = EmploymentData.query.filter_by(
+            RegionName='Edited Region'
+        ).count()
+    deleted = client.delete(f'/datatable/rows/{data_id}')
+    missing = client.delete(f'/datatable/rows/{data_id}')
+
+    # ASSERT: The edit touched one column of one row, then the row was gone
+    assert edited.json['status'] == 'success'
+    assert (edited_region, edited_year) == ('Edited Region', row[1])
+    assert matching == 1
+    assert deleted.json['status'] == 'success'
+    assert missing.status_code == 404
+
+
+def test_old_edit_and_delete_payloads(app, client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN a row is edited by its lookup fields and deleted by every column,
+    as older clients do
+    THEN the row is still found, edited and deleted
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+    row = first_row(client)
+    region, year, gender, occupation = row[:4]
+    columns = [
+        'RegionName', 'Year', 'Gender', 'OccupationType',
+        'EmploymentPercentage', 'MarginofErrorPercentage', 'Longitude',
+        'Latitude'
+    ]
+
+    # ACT: Edit the row's percentage, then delete it
+    edited = client.patch('/datatable/edit', json={
+        'lookupFields': {
+            'RegionName': region,
+            'Year': year,
+            'Gender': gender,
+            'OccupationType': occupation
+        },
+        'updatedRowData': {**dict(zip(columns, row)),
+                           'EmploymentPercentage': 99.5}
+    })
+    deleted = client.post(
+        '/datatable/delete',
+        json={**dict(zip(columns, row)), 'EmploymentPercentage': 99.5}
+    )
+
+    # ASSERT: Both requests found the row, which is now gone
+    assert edited.json['status'] == 'success'
+    assert deleted.json['status'] == 'success'
+    with app.app_context():
+        assert db.session.get(EmploymentData, row[8]) is None
+
+
+def test_batch_applies_operations_together(app, client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN a batch adds, edits and deletes rows, including a delete of a
+    missing row and an unknown operation
+    THEN the valid operations are applied and each gets its own result
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+    rows = client.get('/datatable/data').json['data']
+    edited_id, deleted_id = rows[0][8], rows[1][8]
+    new_row = {
+        'RegionName': 'Batch Region',
+        'Year': 2025,
+        'Gender': 'Female',
+        'OccupationType': 'Batch Occupation',
+        'EmploymentPercentage': 1.0,
+        'MarginofErrorPercentage': 0.1,
+        'Longitude': 0.0,
+        'Latitude': 51.5
+    }
+
+    # ACT: Send one batch of changes
+    response = client.post('/datatable/batch', json={'operations': [
+        {'op': 'add', 'row': new_row},
+        {'op': 'edit', 'DataID': edited_id, 'values': {'Year': 1999}},
+        {'op': 'delete', 'DataID': deleted_id},
+        {'op': 'delete', 'DataID': 10 ** 9},
+        {'op': 'move'}
+    ]})
+
+    # ASSERT: One result per operation, and the table reflects the changes
+    results = response.json['results']
+    assert [result['status'] for result in results] == [
+        'success', 'success', 'success', 'error', 'error'
+    ]
+    with app.app_context():
+        added = db.session.get(EmploymentData, results[0]['DataID'])
+        assert added.to_array() == list(new_row.values())
+        assert db.session.get(EmploymentData, edited_id).Year == 1999
+        assert db.session.get(EmploymentData, deleted_id) is None
+
+
+def test_batch_is_rolled_back_on_duplicates(app, client, runner):
+    """
+    GIVEN a seeded employment table
+    WHEN a batch deletes a row and adds a copy of an existing row
+    THEN the batch is rejected and neither change is saved
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+    rows = client.get('/datatable/data').json['data']
+    columns = [
+        'RegionName', 'Year', 'Gender', 'OccupationType',
+        'EmploymentPercentage', 'MarginofErrorPercentage', 'Longitude',
+        'Latitude'
+    ]
+
+    # ACT: Delete one row and add a duplicate of another
+    response = client.post('/datatable/batch', json={'operations': [
+        {'op': 'delete', 'DataID': rows[0][8]},
+        {'op': 'add', 'row': dict(zip(columns, rows[1]))}
+    ]})
+
+    # ASSERT: Nothing was saved
+    assert response.status_code == 409
+    with app.app_context():
+        assert db.session.get(EmploymentData, rows[0][8]) is not None
+
+
+def test_changes_since_version(client, runner):
+    """
+    GIVEN a datatable page read at some data version
+    WHEN one row is edited and another deleted
+    THEN each change returns the new version and the changed row, and the
+    changes since the page's version list just those rows
+    """
+    # ARRANGE: Seed the table with the bundled dataset
+    runner.invoke(args=['seed-employment-data'])
+    page = client.get('/datatable/data').json
+    edited_id, deleted_id = page['data'][0][8], page['data'][1][8]
+
+    # ACT: Edit one row and delete another, then ask for the changes
+    edited = client.patch(
+        f'/datatable/rows/{edited_id}', json={'Year': 1999}
+    ).json
+    deleted = client.delete(f'/datatable/rows/{deleted_id}').json
+    changes = client.get(
+        '/datatable/changes', query_string={'since': page['version']}
+    ).json
+    seeded = client.get('/datatable/changes', query_string={'since': 0}).json
+
+    # ASSERT: The responses describe the changes, which sync in place
+    assert edited['version'] == page['version'] + 1
+    assert edited['rows'][0][1] == 1999
+    assert deleted['deleted'] == [deleted_id]
+    assert changes['version'] == deleted['version']
+    assert changes['reset'] is False
+    assert changes['rows'] == edited['rows']
+    assert changes['deleted'] == [deleted_id]
+    # The seeded rows were imported, so they can only be reloaded
+    assert seeded['reset'] is True
@@ -0,0 +1,56 @@
+from employment_flask_app import create_app, db
+
+
+def test_sqlite_pragmas_applied(tmp_path):
+    """
+    GIVEN an app using an SQLite database file
+    WHEN a connection is opened
+    THEN the database uses write-ahead logging and waits for locks
+    """
+    # ARRANGE: Create an app on a new database file
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.sqlite'}",
+        'SEED_EMPLOYMENT_DATA': False
+    })
+
+    # ACT: Read the pragmas through the app's engine
+    with app.app_context():
+        with db.engine.connect() as connection:
+            journal_mode = connection.exec_driver_sql(
+                'PRAGMA journal_mode'
+            ).scalar()
+            busy_timeout = connection.exec_driver_sql(
+                'PRAGMA busy_timeout'
+            ).scalar()
+        pool_size = db.engine.pool.size()
+        db.engine.dispose()
+
+    # ASSERT: The profile's settings are in place
+    assert journal_mode == 'wal'
+    assert busy_timeout == 5000
+    assert pool_size == 5
+
+
+def test_sqlite_pragmas_can_be_disabled(tmp_path):
+    """
+    GIVEN an app configured with no SQLite pragmas
+    WHEN a connection is opened
+    THEN the database keeps SQLite's default rollback journal
+    """
+    # ARRANGE: Create an app with the pragmas turned off
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.sqlite'}",
+        'SEED_EMPLOYMENT_DATA': False,
+        'SQLITE_PRAGMAS': {}
+    })
+
+    # ACT: Read the journal mode through the app's engine
+    with app.app_context():
+        with db.engine.connect() as connection:
+            journal_mode = connection.exec_driver_sql(
+                'PRAGMA journal_mode'
+            ).scalar()
+        db.engine.dispose()
+
+    # ASSERT: SQLite's default is kept
+    assert journal_mode == 'delete'